@@ -1,8 +1,13 @@
+import numpy as np
 import pandas as pd
-import random
 import networkx as nx
 import osmnx as ox
 import geopandas as gpd
+from region_graph import load_region_graph, load_region_landmarks, load_region_snapper, region_compact_graph
+from dijkstra_engine import get_engine
+from heuristics import make_heuristic
+from weight_profiles import apply_profile
+from route_metrics import summarize_route
 
 class RouteOptimizer:
     def __init__(self, data_file):
@@ -10,99 +15,92 @@ class RouteOptimizer:
         self.df.columns = self.df.columns.str.strip()
         ox.config(log_console=True, use_cache=True)
     
-    @staticmethod
-    def clean_speed(speed):
-        if isinstance(speed, str):
-            if 'mph' in speed:
-                return float(speed.split(' ')[0])  # Assuming format is 'XX mph'
-            elif 'kph' in speed:
-                return float(speed.split(' ')[0]) / 1.60934  # Convert km/h to mph
-        return None
-
     def generate_path(self, origin_point, target_point, perimeter, weight='length'):
-        ox.config(log_console=True, use_cache=True)
-        north = max(origin_point[0], target_point[0]) + perimeter
-        south = min(origin_point[0], target_point[0]) - perimeter
-        east = max(origin_point[1], target_point[1]) + perimeter
-        west = min(origin_point[1], target_point[1]) - perimeter
-        mode = 'drive'
-        roadgraph = ox.graph_from_bbox(north=north, south=south, east=east, west=west, network_type=mode, simplify=True)
+        roadgraph = load_region_graph(perimeter)
         
         # Add road type weights to edges
         self.add_road_type_weights(roadgraph)
         
-        origin_node = ox.nearest_nodes(roadgraph, origin_point[1], origin_point[0])
-        target_node = ox.nearest_nodes(roadgraph, target_point[1], target_point[0])
+        origin_node, target_node = load_region_snapper(perimeter).nearest_nodes([origin_point, target_point])
         route = nx.shortest_path(roadgraph, origin_node, target_node, weight=weight, method="dijkstra")
 
-        # Calculate total distance in meters
-        total_distance_m = sum(roadgraph[u][v][0]['length'] for u, v in zip(route[:-1], route[1:]))
-
-        # Clean and process speed data
-        total_travel_time_minutes = 0
-        for u, v in zip(route[:-1], route[1:]):
-            segment_length = roadgraph[u][v][0].get(weight, roadgraph[u][v][0]['length'])
-            print("f Segment Length: {segment_length}")
-            speed_limit = roadgraph[u][v][0].get('maxspeed', '30 mph')  # Default to 30 mph if no speed limit is specified
-            speed = self.clean_speed(speed_limit)
-            if speed:
-                segment_time_hours = segment_length / speed / 1609.34  # Convert length to miles and divide by speed
-                total_travel_time_minutes += segment_time_hours * 60  # Convert hours to minutes
-        
-        total_distance_mi = total_distance_m / 1609.34  # Convert meters to miles
-        average_speed_mph = total_distance_mi / (total_travel_time_minutes / 60) 
-      
-        
-        return total_distance_mi, total_travel_time_minutes, average_speed_mph
+        # Distance, time and speed from the edge arrays, taking the parallel edge the weight chose
+        summary = summarize_route(self.compact_graph(roadgraph, weight), route, weight)
+        return summary.distance_mi, summary.travel_time_min, summary.average_speed_mph
 
     def generate_graph(self, origin_point, target_point, perimeter, mode='drive'):
-        north, south, east, west = self._get_bbox(origin_point, target_point, perimeter)
-        roadgraph = ox.graph_from_bbox(north=north, south=south, east=east, west=west, network_type=mode, simplify=True)
-        return roadgraph, ox.nearest_nodes(roadgraph, origin_point[1], origin_point[0]), ox.nearest_nodes(roadgraph, target_point[1], target_point[0])
-
-    def _get_bbox(self, origin, target, perimeter):
-        return (max(origin[0], target[0]) + perimeter, min(origin[0], target[0]) - perimeter,
-                max(origin[1], target[1]) + perimeter, min(origin[1], target[1]) - perimeter)
+        roadgraph = load_region_graph(perimeter, mode=mode)
+        origin_node, target_node = load_region_snapper(perimeter, mode=mode).nearest_nodes([origin_point, target_point])
+        return roadgraph, origin_node, target_node
 
     def add_custom_weights(self, roadgraph, factor=1.5):
-        for u, v, d in roadgraph.edges(data=True):
-            base_weight = d.get('type_weight', d['length'])
-            congestion_multiplier = random.uniform(1, factor)
-            d['congestion_weight'] = base_weight * congestion_multiplier
-
-    @staticmethod
-    def chebyshev_distance(u, v, graph):
-        u_x, u_y = graph.nodes[u]['x'], graph.nodes[u]['y']
-        v_x, v_y = graph.nodes[v]['x'], graph.nodes[v]['y']
-        return max(abs(u_x - v_x), abs(u_y - v_y))
+        compact = self.compact_graph(roadgraph)
+        base_weight = compact.weights.get('type_weight', compact.weights['length'])
+        congestion_multiplier = np.random.uniform(1, factor, compact.edge_count)
+        compact.add_weight('congestion_weight', base_weight * congestion_multiplier)
+        compact.store_weight(roadgraph, 'congestion_weight')
+
+    # Edges tagged with several road types take the smallest weight among them
+    road_type_profile = {
+        'road_classes': {
+            'motorway': 1.0, 'trunk': 1.2, 'primary': 1.5, 'secondary': 1.8,
+            'tertiary': 2.0, 'unclassified': 2.5, 'residential': 3.0
+        },
+        'default': 4.0,
+    }
 
     def add_road_type_weights(self, roadgraph):
-        road_weight = {
-            ('motorway',): 1.0, ('trunk',): 1.2, ('primary',): 1.5,
-            ('secondary',): 1.8, ('tertiary',): 2.0, ('unclassified',): 2.5,
-            ('residential',): 3.0, 'other': 4.0
-        }
-        for u, v, d in roadgraph.edges(data=True):
-            road_type = d.get('highway', 'unclassified')
-            if isinstance(road_type, list):
-                road_type = tuple(sorted(road_type))  # Convert list to a sorted tuple
-            d['type_weight'] = road_weight.get(road_type, 4.0)
+        apply_profile(self.compact_graph(roadgraph), roadgraph, 'type_weight', self.road_type_profile)
 
     def add_traffic_weight(self, roadgraph, hour):
         traffic_factor = 1.8 if 7 <= hour < 9 or 16 <= hour < 19 else 1.0
-        for u, v, d in roadgraph.edges(data=True):
-            if 'type_weight' in d:
-                d['type_weight'] *= traffic_factor
-            else:
-                d['type_weight'] = traffic_factor * 2.5
-    def find_path(self, roadgraph, origin_node, target_node, algorithm='astar', weight='length', heuristic=None):
+        # Compiled from the road types again, so calling it twice does not compound the factor
+        profile = dict(self.road_type_profile, hour=traffic_factor)
+        apply_profile(self.compact_graph(roadgraph), roadgraph, 'type_weight', profile)
+
+    def compact_graph(self, roadgraph, weight=None):
+        # The region's CSR copy of the graph for the array-based engines, with length, speed and
+        # travel time. The add_*_weights helpers write their profiles into it directly, so a
+        # weight is only read from the edges the first time it is asked for.
+        compact = region_compact_graph(roadgraph)
+        if weight is not None and weight not in compact.weights:
+            compact.load_weight(roadgraph, weight)
+        return compact
+
+    def geodesic_heuristic(self, roadgraph, weight):
+        # Great-circle bound in the units of the weight profile, on compact node indices
+        return make_heuristic(self.compact_graph(roadgraph, weight), weight)
+
+    def find_path(self, roadgraph, origin_node, target_node, algorithm='astar', weight='length', heuristic=None,
+                  perimeter=0.10):
         if algorithm == 'astar':
-            
-            return nx.astar_path(roadgraph, origin_node, target_node, weight=weight, heuristic=chebyshev_distance if heuristic else None)
+            if heuristic == 'geodesic':
+                heuristic = self.geodesic_heuristic(roadgraph, weight).networkx_heuristic()
+            return nx.astar_path(roadgraph, origin_node, target_node, weight=weight, heuristic=heuristic)
         elif algorithm == 'dijkstra':
             return nx.dijkstra_path(roadgraph, origin_node, target_node, weight=weight)
         elif algorithm == 'bellman_ford':
             return nx.bellman_ford_path(roadgraph, origin_node, target_node, weight=weight)
+        elif algorithm in ('bidirectional_dijkstra', 'bidirectional_astar'):
+            compact = self.compact_graph(roadgraph, weight)
+            index_heuristic = None
+            if algorithm == 'bidirectional_astar':
+                if heuristic is None or heuristic == 'geodesic':
+                    index_heuristic = self.geodesic_heuristic(roadgraph, weight)
+                else:
+                    node_ids = compact.node_ids
+                    index_heuristic = lambda u, v: heuristic(node_ids[u], node_ids[v])
+            route = get_engine(compact).bidirectional(compact.index_of(origin_node), compact.index_of(target_node),
+                                                      weight=weight, heuristic=index_heuristic)
+            return compact.to_osm(route)
+        elif algorithm == 'alt':
+            # ALT brings its own landmark bound, rebuilt by the region cache when the profile changes
+            if heuristic is not None:
+                raise ValueError("ALT uses its own landmark heuristic")
+            compact = self.compact_graph(roadgraph, weight)
+            route = get_engine(compact).astar(compact.index_of(origin_node), compact.index_of(target_node),
+                                              weight=weight, heuristic=load_region_landmarks(weight, perimeter))
+            return compact.to_osm(route)
         else:
             raise ValueError("Unsupported algorithm")
 
@@ -111,13 +109,13 @@ class RouteOptimizer:
         origin_point = (self.df.at[0, 'Latitude'], self.df.at[0, 'Longitude'])
         target_points = [(lat, lon) for lat, lon in zip(self.df['Latitude'], self.df['Longitude']) if (lat, lon) != origin_point]
 
-        algorithms = ['astar', 'dijkstra', 'bellman_ford']  # All algorithms
+        algorithms = ['astar', 'dijkstra', 'bellman_ford', 'bidirectional_dijkstra', 'bidirectional_astar', 'alt']  # All algorithms
 
         # Specify the weight types you want to test
         weight_types = ['length', 'type_weight', 'congestion_weight']
 
         # Specify different heuristics if needed
-        heuristics = [None, lambda u, v: self.chebyshev_distance(u, v, roadgraph)]
+        heuristics = [None, 'geodesic']
 
         # Define roadgraph outside the loop
         roadgraph = None
@@ -129,8 +127,10 @@ class RouteOptimizer:
             for algorithm in algorithms:
                 for weight_type in weight_types:
                     for heuristic in heuristics:
+                        if algorithm == 'alt' and heuristic is not None:
+                            continue  # ALT only runs with its landmarks
                         try:
-                            route = self.find_path(roadgraph, origin_node, target_node, algorithm=algorithm, weight=weight_type, heuristic=heuristic)
+                            route = self.find_path(roadgraph, origin_node, target_node, algorithm=algorithm, weight=weight_type, heuristic=heuristic, perimeter=0.10)
                             total_distance_mi, total_travel_time_minutes, average_speed_mph = self.generate_path(origin_point, target_point, perimeter=0.10, weight=weight_type)
                             
                             print(f"Algorithm: {algorithm}, Weight: {weight_type}, Heuristic: {heuristic}, Origin: {origin_point}, Destination: {target_point}")
@@ -0,0 +1,150 @@
+import math
+import networkx as nx
+import numpy as np
+from dijkstra_engine import DijkstraEngine
+from dynamic_sssp import DynamicShortestPaths
+
+
+# Route as a list of CompactGraph edge indices from source to every node, read off a forward
+# shortest-path tree given as the edge used to reach each node
+def _tree_edges(compact, pred, node):
+    sources = compact.sources
+    edges = []
+    e = pred[node]
+    while e >= 0:
+        edges.append(int(e))
+        e = pred[sources[e]]
+    edges.reverse()
+    return edges
+
+
+def _edges_to_path(compact, source, edges):
+    return [int(source)] + compact.targets[np.asarray(edges, dtype=np.int64)].tolist()
+
+
+# Share of a route's cost (under the real weights) that runs over edges of routes already taken
+def _overlap(edges, weights, taken):
+    total = weights[edges].sum()
+    shared = sum(weights[e] for e in edges if e in taken)
+    return shared / total if total > 0 else 1.0
+
+
+# Whether a candidate route is a simple path, not too long and different enough from the
+# routes found so far
+def _admissible(compact, edges, weights, best, taken, max_stretch, max_overlap):
+    if not edges or weights[edges].sum() > max_stretch * best + 1e-9:
+        return False
+    if len(set(compact.sources[edges].tolist())) < len(edges):
+        return False
+    return all(_overlap(edges, weights, route) <= max_overlap for route in taken)
+
+
+# Plateau method. One forward search from source and one backward search from target, both
+# bounded by max_stretch times the shortest distance, give two shortest-path trees. Edges that
+# lie on both trees form plateaus: chains along which s -> a -> ... -> b -> t is a shortest
+# route on either side, so the route through a plateau of length l is locally optimal for every
+# detour shorter than l. Plateaus are tried in order of route cost minus plateau length and a
+# route is kept when it is no longer than max_stretch times the shortest one, shares at most
+# max_overlap of its cost with every route already kept, and its plateau covers at least
+# min_plateau of its cost. The first route is the shortest path.
+def plateau_alternatives(compact, source, target, k=3, weight='length', max_stretch=1.25, max_overlap=0.6,
+                         min_plateau=0.2):
+    weights = compact.weight(weight)
+    reverse = compact.reverse()
+    engine = DijkstraEngine(compact)
+    engine.search([(source, 0.0)], weight=weight, targets=[target])
+    best = float(engine.dist[target])
+    if best == math.inf:
+        raise nx.NetworkXNoPath(f"No path between {compact.node_ids[source]} and {compact.node_ids[target]}.")
+    limit = max_stretch * best
+    engine.search([(source, 0.0)], weight=weight, limit=limit)
+    dist_f, pred_f = engine.dist.copy(), engine.pred.copy()
+    engine.search([(target, 0.0)], weight=weight, limit=limit, graph=reverse)
+    dist_b, pred_b = engine.dist.copy(), engine.pred.copy()
+
+    # Forward edge index of the backward tree edge leaving every node towards target
+    next_edge = np.full(compact.node_count, -1, dtype=np.int64)
+    reached_b = pred_b >= 0
+    next_edge[reached_b] = reverse.edge_ids[pred_b[reached_b]]
+    on_forward = np.zeros(compact.edge_count, dtype=bool)
+    on_forward[pred_f[pred_f >= 0]] = True
+    plateau = np.zeros(compact.edge_count, dtype=bool)
+    shared = next_edge[next_edge >= 0]
+    plateau[shared[on_forward[shared]]] = True
+
+    # Walk every plateau from its first edge, one whose tail is not reached over a plateau edge
+    sources = compact.sources
+    heads = compact.targets
+    candidates = []
+    for e in np.flatnonzero(plateau).tolist():
+        a = int(sources[e])
+        if pred_f[a] >= 0 and plateau[pred_f[a]]:
+            continue
+        b = int(heads[e])
+        while next_edge[b] >= 0 and plateau[next_edge[b]]:
+            b = int(heads[next_edge[b]])
+        cost = dist_f[b] + dist_b[b]
+        if cost <= limit:
+            candidates.append((cost - (dist_f[b] - dist_f[a]), cost, dist_f[b] - dist_f[a], b))
+    candidates.sort()
+
+    routes, taken = [], []
+    for _, cost, length, b in candidates:
+        if len(routes) == k:
+            break
+        if cost > best + 1e-9 and length < min_plateau * cost:
+            continue
+        edges = _tree_edges(compact, pred_f, b)
+        node = b
+        while node != target:
+            edges.append(int(next_edge[node]))
+            node = int(heads[next_edge[node]])
+        if _admissible(compact, edges, weights, best, taken, max_stretch, max_overlap):
+            routes.append(_edges_to_path(compact, source, edges))
+            taken.append(set(edges))
+    return routes
+
+
+# Penalty method. After each route is found the weights of its edges are multiplied by penalty
+# and the next route is the shortest path under the penalized weights, kept if it passes the
+# same stretch and overlap limits (on the real weights) as the plateau method. Rather than
+# re-running a search per round, one shortest-path tree from source is repaired after every
+# penalty, which only revisits the part of the tree hanging below the penalized edges.
+# Gives up after max_rounds penalty rounds (3 * k by default).
+def penalty_alternatives(compact, source, target, k=3, weight='length', max_stretch=1.25, max_overlap=0.6,
+                         penalty=1.4, max_rounds=None):
+    weights = compact.weight(weight)
+    tree = DynamicShortestPaths(compact, source, weight)
+    best = float(tree.dist[target])
+    if best == math.inf:
+        raise nx.NetworkXNoPath(f"No path between {compact.node_ids[source]} and {compact.node_ids[target]}.")
+    max_rounds = 3 * k if max_rounds is None else max_rounds
+
+    routes, taken = [], []
+    for _ in range(max_rounds + 1):
+        edges = _tree_edges(compact, tree.pred, target)
+        if set(edges) not in taken and _admissible(compact, edges, weights, best, taken, max_stretch, max_overlap):
+            routes.append(_edges_to_path(compact, source, edges))
+            taken.append(set(edges))
+            if len(routes) == k:
+                break
+        edges = np.asarray(edges, dtype=np.int64)
+        tree.apply_traffic_updates(edges, tree.weights[edges] * penalty)
+    return routes
+
+
+# Up to k diverse routes between two OSM nodes as OSM node lists, the shortest one first.
+# method is 'plateau' (two bounded searches) or 'penalty' (one search plus tree repairs).
+def alternative_routes(compact, origin_node, target_node, k=3, weight='length', method='plateau', max_stretch=1.25,
+                       max_overlap=0.6):
+    source = compact.index_of(origin_node)
+    target = compact.index_of(target_node)
+    if source == target:
+        return [[origin_node]]
+    if method == 'plateau':
+        routes = plateau_alternatives(compact, source, target, k, weight, max_stretch, max_overlap)
+    elif method == 'penalty':
+        routes = penalty_alternatives(compact, source, target, k, weight, max_stretch, max_overlap)
+    else:
+        raise ValueError("Unsupported method")
+    return [compact.to_osm(route) for route in routes]
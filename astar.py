@@ -5,78 +5,41 @@ import osmnx as ox
 import pandas as pd
 import geopandas as gpd
 import time 
+from region_graph import load_region_graph, load_region_compact_graph, load_region_landmarks, load_region_snapper
+from heuristics import make_heuristic
+from weight_profiles import apply_profile
+from route_metrics import route_metrics
 # Load data
 df = pd.read_csv('testing_locations_4511.csv')
 df.columns = df.columns.str.strip()
-def chebyshev_distance(u, v, graph):
-    u_x, u_y = graph.nodes[u]['x'], graph.nodes[u]['y']
-    v_x, v_y = graph.nodes[v]['x'], graph.nodes[v]['y']
-    return max(abs(u_x - v_x), abs(u_y - v_y))
-def add_road_type_weights(roadgraph):
-    for u, v, d in roadgraph.edges(data=True):
-        road_type = d.get('highway', 'unclassified')
-        if road_type == 'motorway':
-            d['type_weight'] = 1.0
-        elif road_type == 'trunk':
-            d['type_weight'] = 1.2
-        elif road_type == 'primary':
-            d['type_weight'] = 1.5
-        elif road_type == 'secondary':
-            d['type_weight'] = 2.0
-        elif road_type == 'tertiary':
-            d['type_weight'] = 2.2
-        elif road_type == 'unclassified':
-            d['type_weight'] = 2.5
-        elif road_type == 'residential':
-            d['type_weight'] = 3.0
-        else:
-            d['type_weight'] = 1.5 
+road_type_profile = {
+    'road_classes': {
+        'motorway': 1.0, 'trunk': 1.2, 'primary': 1.5, 'secondary': 2.0,
+        'tertiary': 2.2, 'unclassified': 2.5, 'residential': 3.0
+    },
+    'default': 1.5,
+}
+def add_road_type_weights(roadgraph, compact):
+    return apply_profile(compact, roadgraph, 'type_weight', road_type_profile)
 
-def generate_path(origin_point, target_point, perimeter):
+# heuristic='geodesic' bounds A* with the great-circle distance scaled to the type_weight profile,
+# heuristic='landmarks' with ALT landmark distances, tighter but computed once per profile first
+def generate_path(origin_point, target_point, perimeter, heuristic='geodesic'):
     start_time = time.time()
-    ox.config(log_console=True, use_cache=True)
-    north = max(origin_point[0], target_point[0]) + perimeter
-    south = min(origin_point[0], target_point[0]) - perimeter
-    east = max(origin_point[1], target_point[1]) + perimeter
-    west = min(origin_point[1], target_point[1]) - perimeter
-    mode = 'drive'
-    roadgraph = ox.graph_from_bbox(north, south, east, west, network_type=mode, simplify=True)
-    origin_node = ox.nearest_nodes(roadgraph, origin_point[1], origin_point[0])
-    target_node = ox.nearest_nodes(roadgraph, target_point[1], target_point[0])
+    roadgraph = load_region_graph(perimeter)
+    origin_node, target_node = load_region_snapper(perimeter).nearest_nodes([origin_point, target_point])
 
-    # Using A* algorithm
-    route = nx.astar_path(roadgraph, origin_node, target_node, weight='type_weight',heuristic = lambda u,v, graph chebyshev_distance)
-
-    long = [roadgraph.nodes[n]['x'] for n in route]
-    lat = [roadgraph.nodes[n]['y'] for n in route]
-    
-    # Calculate total distance in meters
-    route_gdf = ox.routing.route_to_gdf(roadgraph, route)
-    total_distance_m = route_gdf['length'].sum()
-
-    def clean_speed(speed):
-        if isinstance(speed, str):
-            if 'mph' in speed:
-                return float(speed.split(' ')[0])  # Assuming format is 'XX mph'
-            elif 'kph' in speed:
-                return float(speed.split(' ')[0]) / 1.60934  # Convert km/h to mph
-        return None
-
-    speeds = route_gdf['maxspeed'].apply(clean_speed).dropna()
-    if not speeds.empty:
-        weighted_speeds = route_gdf[route_gdf['maxspeed'].notnull()]['length'] * speeds
-        average_speed_mph = weighted_speeds.sum() / route_gdf[route_gdf['maxspeed'].notnull()]['length'].sum()
+    compact = load_region_compact_graph(perimeter)
+    add_road_type_weights(roadgraph, compact)
+    if heuristic == 'geodesic':
+        heuristic = make_heuristic(compact, 'type_weight').networkx_heuristic()
+    elif heuristic == 'landmarks':
+        heuristic = load_region_landmarks('type_weight', perimeter).networkx_heuristic()
     else:
-        average_speed_mph = 30  # Fallback speed in mph if no valid speed data is available
+        raise ValueError("Unsupported heuristic")
+    route = nx.astar_path(roadgraph, origin_node, target_node, weight='type_weight', heuristic=heuristic)
 
-    # Convert distance to miles
-    total_distance_mi = total_distance_m / 1609.34  # meters to miles
-    
-    # Calculate travel time in hours
-    travel_time_h = total_distance_mi / average_speed_mph
-    
-    # Convert travel time to minutes
-    travel_time_min = travel_time_h * 60
+    long, lat, total_distance_mi, travel_time_min, average_speed_mph = route_metrics(compact, route, 'type_weight')
     end_time = time.time()
     execution_time = end_time - start_time
     return long, lat, total_distance_mi, travel_time_min, average_speed_mph, execution_time
@@ -5,6 +5,9 @@ import osmnx as ox
 import pandas as pd
 import math
 import time 
+from region_graph import load_region_graph, load_region_compact_graph, load_region_snapper
+from heuristics import make_heuristic
+from route_metrics import route_metrics
 # Load data
 df = pd.read_csv("testing_locations_4511.csv")
 df.columns = df.columns.str.strip()
@@ -12,56 +15,17 @@ df.columns = df.columns.str.strip()
 origin_point = (df.at[0, 'Latitude'], df.at[0, 'Longitude'])
 target_points = [(lat, lon) for lat, lon in zip(df['Latitude'], df['Longitude'])]
 
-# Chebyshev distance heuristic function
-def chebyshev_distance(u, v, graph):
-    u_x, u_y = graph.nodes[u]['x'], graph.nodes[u]['y']
-    v_x, v_y = graph.nodes[v]['x'], graph.nodes[v]['y']
-    return max(abs(u_x - v_x), abs(u_y - v_y))
-
 def generate_path(origin_point, target_point, perimeter, mode='drive'):
     start_time = time.time()
-    ox.config(log_console=True, use_cache=True)
-    north = max(origin_point[0], target_point[0]) + perimeter
-    south = min(origin_point[0], target_point[0]) - perimeter
-    east = max(origin_point[1], target_point[1]) + perimeter
-    west = min(origin_point[1], target_point[1]) - perimeter
-    mode = 'drive'
-    roadgraph = ox.graph_from_bbox(north, south, east, west, network_type=mode, simplify=True)
-    origin_node = ox.nearest_nodes(roadgraph, origin_point[1], origin_point[0])
-    target_node = ox.nearest_nodes(roadgraph, target_point[1], target_point[0])
-    route = nx.astar_path(roadgraph, origin_node, target_node,heuristic=lambda u, v: chebyshev_distance(u, v, roadgraph))
-
-    long = [roadgraph.nodes[n]['x'] for n in route]
-    lat = [roadgraph.nodes[n]['y'] for n in route]
-    
-    # Calculate total distance in meters
-    route_gdf = ox.routing.route_to_gdf(roadgraph, route)
-    total_distance_m = route_gdf['length'].sum()
-
-    # Clean and process speed data
-    def clean_speed(speed):
-        if isinstance(speed, str):
-            if 'mph' in speed:
-                return float(speed.split(' ')[0])  # Assuming format is 'XX mph'
-            elif 'kph' in speed:
-                return float(speed.split(' ')[0]) / 1.60934  # Convert km/h to mph
-        return None
+    roadgraph = load_region_graph(perimeter)
+    compact = load_region_compact_graph(perimeter)
+    origin_node, target_node = load_region_snapper(perimeter).nearest_nodes([origin_point, target_point])
+    # Great-circle distance in meters, a lower bound on the length weights (a Chebyshev distance in
+    # degrees is on another scale and, without weight=, A* counted every hop as 1)
+    geodesic_distance = make_heuristic(compact, 'length').networkx_heuristic()
+    route = nx.astar_path(roadgraph, origin_node, target_node, weight='length', heuristic=geodesic_distance)
 
-    speeds = route_gdf['maxspeed'].apply(clean_speed).dropna()
-    if not speeds.empty:
-        weighted_speeds = route_gdf[route_gdf['maxspeed'].notnull()]['length'] * speeds
-        average_speed_mph = weighted_speeds.sum() / route_gdf[route_gdf['maxspeed'].notnull()]['length'].sum()
-    else:
-        average_speed_mph = 30  # Fallback speed in mph if no valid speed data is available
-
-    # Convert distance to miles
-    total_distance_mi = total_distance_m / 1609.34  # meters to miles
-    
-    # Calculate travel time in hours
-    travel_time_h = total_distance_mi / average_speed_mph
-    
-    # Convert travel time to minutes
-    travel_time_min = travel_time_h * 60
+    long, lat, total_distance_mi, travel_time_min, average_speed_mph = route_metrics(compact, route)
     end_time = time.time()
     execution_time = end_time - start_time
     return long, lat, total_distance_mi, travel_time_min, average_speed_mph, execution_time
@@ -119,7 +83,7 @@ def plot_map(origin_point, target_points, long, lat, total_distance, total_trave
         mapbox=dict(center=dict(lat=origin_point[0], lon=origin_point[1]), zoom=10),
         width=800,
         height=600,
-        title="A* Chebyshev Distance Heuristic Visualization"
+        title="A* Geodesic Distance Heuristic Visualization"
     )
     fig.show()
 
@@ -5,56 +5,29 @@ import osmnx as ox
 import pandas as pd
 import geopandas
 import time 
+from region_graph import load_region_graph, load_region_compact_graph, load_region_snapper
+from bellman_ford_engine import bellman_ford_path
+from route_metrics import route_metrics
 # Ensure the drive is mounted correctly
 
 df = pd.read_csv('testing_locations_4511.csv')
 df.columns = df.columns.str.strip()
 
 # Define function to generate paths using OSMNX and NetworkX
-def generate_path(origin_point, target_point, perimeter):
+# backend='vectorized' or 'spfa' runs the array-based Bellman-Ford on the CSR copy of the graph instead of networkx
+def generate_path(origin_point, target_point, perimeter, backend='networkx'):
     start_time = time.time()
-    ox.config(log_console=True, use_cache=True)
-    north = max(origin_point[0], target_point[0]) + perimeter
-    south = min(origin_point[0], target_point[0]) - perimeter
-    east = max(origin_point[1], target_point[1]) + perimeter
-    west = min(origin_point[1], target_point[1]) - perimeter
-    mode = 'drive'
-    roadgraph = ox.graph_from_bbox(north, south, east, west, network_type=mode, simplify=True)
-    origin_node = ox.nearest_nodes(roadgraph, origin_point[1], origin_point[0])
-    target_node = ox.nearest_nodes(roadgraph, target_point[1], target_point[0])
-    route = nx.shortest_path(roadgraph, origin_node, target_node, weight='length', method='bellman-ford')
-
-    long = [roadgraph.nodes[n]['x'] for n in route]
-    lat = [roadgraph.nodes[n]['y'] for n in route]
-    
-    # Calculate total distance in meters
-    route_gdf = ox.routing.route_to_gdf(roadgraph, route)
-    total_distance_m = route_gdf['length'].sum()
-
-    # Clean and process speed data
-    def clean_speed(speed):
-        if isinstance(speed, str):
-            if 'mph' in speed:
-                return float(speed.split(' ')[0])  # Assuming format is 'XX mph'
-            elif 'kph' in speed:
-                return float(speed.split(' ')[0]) / 1.60934  # Convert km/h to mph
-        return None
-
-    speeds = route_gdf['maxspeed'].apply(clean_speed).dropna()
-    if not speeds.empty:
-        weighted_speeds = route_gdf[route_gdf['maxspeed'].notnull()]['length'] * speeds
-        average_speed_mph = weighted_speeds.sum() / route_gdf[route_gdf['maxspeed'].notnull()]['length'].sum()
+    roadgraph = load_region_graph(perimeter)
+    origin_node, target_node = load_region_snapper(perimeter).nearest_nodes([origin_point, target_point])
+    if backend in ('vectorized', 'spfa'):
+        compact = load_region_compact_graph(perimeter)
+        route = bellman_ford_path(compact, origin_node, target_node, weight='length', method=backend)
+    elif backend == 'networkx':
+        route = nx.shortest_path(roadgraph, origin_node, target_node, weight='length', method='bellman-ford')
     else:
-        average_speed_mph = 30  # Fallback speed in mph if no valid speed data is available
+        raise ValueError("Unsupported backend")
 
-    # Convert distance to miles
-    total_distance_mi = total_distance_m / 1609.34  # meters to miles
-    
-    # Calculate travel time in hours
-    travel_time_h = total_distance_mi / average_speed_mph
-    
-    # Convert travel time to minutes
-    travel_time_min = travel_time_h * 60
+    long, lat, total_distance_mi, travel_time_min, average_speed_mph = route_metrics(load_region_compact_graph(perimeter), route)
     end_time = time.time()
     execution_time = end_time - start_time
     return long, lat, total_distance_mi, travel_time_min, average_speed_mph, execution_time
@@ -0,0 +1,104 @@
+import math
+from collections import deque
+import networkx as nx
+import numpy as np
+from compact_graph import csr_ranges
+
+
+# Bellman-Ford over the CSR arrays of a CompactGraph, for weight profiles that may go negative.
+# Each round relaxes, in one set of NumPy operations, every edge leaving a node whose distance
+# changed in the previous round; the search ends as soon as a round changes nothing. A graph
+# still improving after node_count - 1 rounds has a negative cycle reachable from the source.
+def bellman_ford(compact, source, weight='length'):
+    n = compact.node_count
+    offsets = compact.offsets
+    heads = compact.targets.astype(np.int64)
+    weights = compact.weight(weight)
+    dist = np.full(n, np.inf)
+    pred = np.full(n, -1, dtype=np.int64)
+    dist[source] = 0.0
+    changed = np.array([source], dtype=np.int64)
+
+    for _ in range(n):
+        # Indices of all edges leaving the changed nodes
+        edges, counts = csr_ranges(offsets, changed)
+        if len(edges) == 0:
+            return dist, pred
+        cand = np.repeat(dist[changed], counts) + weights[edges]
+        heads_e = heads[edges]
+        best = dist.copy()
+        np.minimum.at(best, heads_e, cand)
+        improved = cand < dist[heads_e]
+        improved &= cand == best[heads_e]
+        if not improved.any():
+            return dist, pred
+        pred[heads_e[improved]] = edges[improved]
+        changed = np.unique(heads_e[improved])
+        dist = best
+    raise nx.NetworkXUnbounded("Negative cycle detected.")
+
+
+# Queue-based Bellman-Ford (SPFA): only nodes whose distance dropped are rescanned, in FIFO
+# order. A shortest path never has node_count edges, so a node whose tentative path reaches
+# that many edges proves a negative cycle.
+def spfa(compact, source, weight='length'):
+    n = compact.node_count
+    offsets = memoryview(compact.offsets)
+    heads = memoryview(compact.targets)
+    weights = memoryview(compact.weight(weight))
+    dist_array = np.full(n, np.inf)
+    pred_array = np.full(n, -1, dtype=np.int64)
+    dist = memoryview(dist_array)
+    pred = memoryview(pred_array)
+    hops = [0] * n
+    queued = [False] * n
+
+    dist[source] = 0.0
+    queue = deque([source])
+    queued[source] = True
+    while queue:
+        u = queue.popleft()
+        queued[u] = False
+        d = dist[u]
+        for e in range(offsets[u], offsets[u + 1]):
+            v = heads[e]
+            nd = d + weights[e]
+            if nd < dist[v]:
+                dist[v] = nd
+                pred[v] = e
+                hops[v] = hops[u] + 1
+                if hops[v] >= n:
+                    raise nx.NetworkXUnbounded("Negative cycle detected.")
+                if not queued[v]:
+                    queued[v] = True
+                    queue.append(v)
+    return dist_array, pred_array
+
+
+def path_from_pred(compact, pred, target):
+    sources = compact.sources
+    path = [int(target)]
+    e = pred[target]
+    while e >= 0:
+        u = int(sources[e])
+        path.append(u)
+        e = pred[u]
+    path.reverse()
+    return path
+
+
+# Drop-in replacement for nx.shortest_path(..., method='bellman-ford') that takes and returns
+# OSM node ids. method is 'vectorized' (round-based NumPy relaxation) or 'spfa'.
+def bellman_ford_path(compact, origin_node, target_node, weight='length', method='vectorized'):
+    if method == 'vectorized':
+        search = bellman_ford
+    elif method == 'spfa':
+        search = spfa
+    else:
+        raise ValueError("Unsupported method")
+    source = compact.index_of(origin_node)
+    target = compact.index_of(target_node)
+    dist, pred = search(compact, source, weight)
+    if dist[target] == math.inf:
+        raise nx.NetworkXNoPath(f"Node {target_node} not reachable from {origin_node}")
+    return compact.to_osm(path_from_pred(compact, pred, target))
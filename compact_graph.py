@@ -0,0 +1,168 @@
+import hashlib
+import numpy as np
+
+
+# Compressed sparse row (CSR) copy of an osmnx MultiDiGraph.
+# Nodes are renumbered to dense int32 indices in OSM id order, so node_ids maps an index
+# back to its OSM id and a sorted search maps OSM ids to indices. The outgoing edges of
+# node i are offsets[i]:offsets[i + 1] in targets/keys, every parallel edge keeps its own
+# slot, and each weight profile is one float64 array in that same edge order.
+class CompactGraph:
+    def __init__(self, node_ids, x, y, offsets, targets, keys, weights=None):
+        self.node_ids = node_ids
+        self.x = x
+        self.y = y
+        self.offsets = offsets
+        self.targets = targets
+        self.keys = keys
+        self.weights = weights if weights is not None else {}
+        self.edge_ids = None  # only set on reversed graphs, points at the forward edge
+        self._sources = None
+        self._reverse = None
+
+    @property
+    def node_count(self):
+        return len(self.node_ids)
+
+    @property
+    def edge_count(self):
+        return len(self.targets)
+
+    @property
+    def sources(self):
+        # Source index of every edge, expanded from the offsets on first use
+        if self._sources is None:
+            degrees = np.diff(self.offsets)
+            self._sources = np.repeat(np.arange(self.node_count, dtype=np.int32), degrees)
+        return self._sources
+
+    @property
+    def nbytes(self):
+        arrays = [self.node_ids, self.x, self.y, self.offsets, self.targets, self.keys]
+        arrays += list(self.weights.values())
+        if self.edge_ids is not None:
+            arrays.append(self.edge_ids)
+        return sum(a.nbytes for a in arrays)
+
+    def fingerprint(self, *weights):
+        # Hash of the nodes, the edges and the named weight profiles, to tell whether a structure
+        # saved to disk was built on this same graph
+        digest = hashlib.sha1()
+        for array in [self.node_ids, self.offsets, self.targets] + [self.weight(name) for name in weights]:
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+    def index_of(self, osm_id):
+        i = int(np.searchsorted(self.node_ids, osm_id))
+        if i == self.node_count or self.node_ids[i] != osm_id:
+            raise KeyError(f"Node {osm_id} is not in the graph")
+        return i
+
+    def indices_of(self, osm_ids):
+        osm_ids = np.asarray(osm_ids, dtype=np.int64)
+        indices = np.searchsorted(self.node_ids, osm_ids)
+        indices = np.minimum(indices, self.node_count - 1)
+        if not np.array_equal(self.node_ids[indices], osm_ids):
+            raise KeyError("Some nodes are not in the graph")
+        return indices.astype(np.int32)
+
+    def to_osm(self, path):
+        return self.node_ids[np.asarray(path, dtype=np.int64)].tolist()
+
+    def neighbors(self, i):
+        start, stop = self.offsets[i], self.offsets[i + 1]
+        return self.targets[start:stop]
+
+    def edges_between(self, u, v):
+        # Edge indices of all parallel u -> v edges
+        start, stop = self.offsets[u], self.offsets[u + 1]
+        return start + np.flatnonzero(self.targets[start:stop] == v)
+
+    def edge_index(self, u, v, key=0):
+        # CSR index of the road graph edge (u, v, key), given as OSM ids
+        edges = self.edges_between(self.index_of(u), self.index_of(v))
+        edges = edges[self.keys[edges] == key]
+        if len(edges) == 0:
+            raise KeyError(f"Edge ({u}, {v}, {key}) is not in the graph")
+        return int(edges[0])
+
+    def weight(self, name):
+        if name not in self.weights:
+            raise ValueError(f"Unknown weight profile: {name}")
+        return self.weights[name]
+
+    def add_weight(self, name, values):
+        values = np.asarray(values, dtype=np.float64)
+        if values.shape != (self.edge_count,):
+            raise ValueError(f"Expected {self.edge_count} edge weights, got {values.shape}")
+        self.weights[name] = values
+        self._reverse = None
+
+    def edge_values(self, roadgraph, name, default=None):
+        # Raw edge attribute values in CSR edge order
+        return [d.get(name, default) for _, _, _, d in _iter_edges(roadgraph, self.node_ids)]
+
+    def load_weight(self, roadgraph, name, default=1.0):
+        # Missing attributes fall back to 1 like networkx does for string weights
+        self.add_weight(name, self.edge_values(roadgraph, name, default))
+        return self.weights[name]
+
+    def store_weight(self, roadgraph, name):
+        # Write a weight profile back onto the road graph edges, for the networkx searches
+        for (_, _, _, d), value in zip(_iter_edges(roadgraph, self.node_ids), self.weights[name].tolist()):
+            d[name] = value
+
+    def reverse(self):
+        # Same graph with every edge flipped, weights follow their edges
+        if self._reverse is None:
+            order = np.argsort(self.targets, kind='stable')
+            counts = np.bincount(self.targets, minlength=self.node_count)
+            offsets = np.zeros(self.node_count + 1, dtype=np.int64)
+            np.cumsum(counts, out=offsets[1:])
+            reverse = CompactGraph(self.node_ids, self.x, self.y, offsets,
+                                   self.sources[order], self.keys[order],
+                                   {name: w[order] for name, w in self.weights.items()})
+            reverse.edge_ids = order.astype(np.int64)
+            reverse._reverse = self
+            self._reverse = reverse
+        return self._reverse
+
+
+def csr_ranges(offsets, nodes):
+    # Positions offsets[v]:offsets[v + 1] of every node in nodes, concatenated, and how many
+    # each node contributed
+    starts = offsets[nodes]
+    counts = offsets[np.asarray(nodes) + 1] - starts
+    positions = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(starts, counts)
+    return positions, counts
+
+
+def _iter_edges(roadgraph, node_ids):
+    for u in node_ids.tolist():
+        for v, keydict in roadgraph.adj[u].items():
+            for k, d in keydict.items():
+                yield u, v, k, d
+
+
+# Convert a loaded road graph into a CompactGraph with the given weight profiles
+def build_compact_graph(roadgraph, weights=('length',)):
+    node_ids = np.array(sorted(roadgraph.nodes), dtype=np.int64)
+    index = {osm_id: i for i, osm_id in enumerate(node_ids.tolist())}
+    x = np.array([roadgraph.nodes[n]['x'] for n in node_ids.tolist()], dtype=np.float64)
+    y = np.array([roadgraph.nodes[n]['y'] for n in node_ids.tolist()], dtype=np.float64)
+
+    offsets = np.zeros(len(node_ids) + 1, dtype=np.int64)
+    targets = []
+    keys = []
+    for i, u in enumerate(node_ids.tolist()):
+        for v, keydict in roadgraph.adj[u].items():
+            for k in keydict:
+                targets.append(index[v])
+                keys.append(k)
+        offsets[i + 1] = len(targets)
+
+    compact = CompactGraph(node_ids, x, y, offsets,
+                           np.array(targets, dtype=np.int32), np.array(keys, dtype=np.int32))
+    for name in weights:
+        compact.load_weight(roadgraph, name)
+    return compact
@@ -0,0 +1,414 @@
+import heapq
+import math
+import networkx as nx
+import numpy as np
+
+# Witness searches give up after settling this many nodes and keep the shortcut instead.
+# Priority estimates only need a rough shortcut count, so they search less than contraction.
+WITNESS_SETTLE_LIMIT = 500
+PRIORITY_SETTLE_LIMIT = 50
+
+
+# Contraction hierarchy over a CompactGraph.
+# Every arc (original edge or shortcut) lives in the flat arc_* arrays. A shortcut arc
+# remembers the two arcs it replaces in arc_first/arc_second, an original arc remembers its
+# CompactGraph edge in arc_edge. up_offsets/up_arcs list, for each node, the arcs leaving
+# it towards a higher-ranked node (used by the forward search); down_offsets/down_arcs list
+# the arcs entering it from a higher-ranked node (walked backwards by the target search).
+class ContractionHierarchy:
+    def __init__(self, node_ids, rank, arc_source, arc_target, arc_weight, arc_first, arc_second,
+                 arc_edge, weight='length', fingerprint=None):
+        self.node_ids = node_ids
+        self.rank = rank
+        self.arc_source = arc_source
+        self.arc_target = arc_target
+        self.arc_weight = arc_weight
+        self.arc_first = arc_first
+        self.arc_second = arc_second
+        self.arc_edge = arc_edge
+        self.weight = weight
+        self.fingerprint = fingerprint  # CompactGraph.fingerprint(weight) of the graph it was built on
+        self._build_search_graphs()
+
+    def _build_search_graphs(self):
+        n = len(self.node_ids)
+        upward = self.rank[self.arc_source] < self.rank[self.arc_target]
+        # Arcs without a finite weight (e.g. the missing direction of a one-way street in a
+        # customized hierarchy) can never be on a path and are left out of the searches
+        finite = np.isfinite(self.arc_weight)
+        arcs = np.arange(len(self.arc_source), dtype=np.int64)
+        up, down = upward & finite, ~upward & finite
+        self.up_offsets, self.up_arcs = _group_arcs(n, self.arc_source[up], arcs[up])
+        self.down_offsets, self.down_arcs = _group_arcs(n, self.arc_target[down], arcs[down])
+        self.dist_f = np.full(n, np.inf)
+        self.dist_b = np.full(n, np.inf)
+        self.pred_f = np.full(n, -1, dtype=np.int64)
+        self.pred_b = np.full(n, -1, dtype=np.int64)
+        self._touched = []
+        self.settled = 0
+
+    @property
+    def node_count(self):
+        return len(self.node_ids)
+
+    @property
+    def shortcut_count(self):
+        return int(np.count_nonzero(self.arc_edge < 0))
+
+    def _reset(self):
+        if self._touched:
+            touched = np.array(self._touched, dtype=np.int64)
+            self.dist_f[touched] = np.inf
+            self.dist_b[touched] = np.inf
+            self.pred_f[touched] = -1
+            self.pred_b[touched] = -1
+            self._touched = []
+
+    # Bidirectional Dijkstra where each side only climbs to higher-ranked nodes. A side stops
+    # once its smallest key reaches the best meeting distance; the query ends when both have.
+    # Stalled nodes can still be the meeting node, their tentative distance is a real path.
+    def query(self, source, target):
+        self._reset()
+        dists = (memoryview(self.dist_f), memoryview(self.dist_b))
+        preds = (memoryview(self.pred_f), memoryview(self.pred_b))
+        offsets = (memoryview(self.up_offsets), memoryview(self.down_offsets))
+        arc_lists = (memoryview(self.up_arcs), memoryview(self.down_arcs))
+        ends = (memoryview(self.arc_target), memoryview(self.arc_source))
+        arc_weight = memoryview(self.arc_weight)
+        touched = self._touched
+
+        dists[0][source] = 0.0
+        dists[1][target] = 0.0
+        touched.extend((source, target))
+        heaps = ([(0.0, source)], [(0.0, target)])
+        best = 0.0 if source == target else math.inf
+        meet = source if source == target else -1
+        settled = 0
+        side = 0
+        while heaps[0] or heaps[1]:
+            if not heaps[side]:
+                side = 1 - side
+            heap = heaps[side]
+            d, u = heapq.heappop(heap)
+            dist = dists[side]
+            if d > dist[u]:
+                side = 1 - side
+                continue
+            if d >= best:
+                heap.clear()
+                side = 1 - side
+                continue
+            other = dists[1 - side]
+            if other[u] != math.inf and d + other[u] < best:
+                best = d + other[u]
+                meet = u
+            # Stall-on-demand: a higher node that already reaches u more cheaply through an arc
+            # of the opposite direction proves d is not a shortest distance, so u is not expanded
+            stall_end = ends[1 - side]
+            stall_list = arc_lists[1 - side]
+            stalled = False
+            for i in range(offsets[1 - side][u], offsets[1 - side][u + 1]):
+                a = stall_list[i]
+                if dist[stall_end[a]] + arc_weight[a] < d:
+                    stalled = True
+                    break
+            if stalled:
+                side = 1 - side
+                continue
+            settled += 1
+            pred = preds[side]
+            end = ends[side]
+            arc_list = arc_lists[side]
+            for i in range(offsets[side][u], offsets[side][u + 1]):
+                a = arc_list[i]
+                v = end[a]
+                nd = d + arc_weight[a]
+                if nd < dist[v]:
+                    if dists[0][v] == math.inf and dists[1][v] == math.inf:
+                        touched.append(v)
+                    dist[v] = nd
+                    pred[v] = a
+                    heapq.heappush(heap, (nd, v))
+            side = 1 - side
+        self.settled = settled
+
+        if meet < 0:
+            raise nx.NetworkXNoPath(f"No path between {self.node_ids[source]} and {self.node_ids[target]}.")
+        arcs = []
+        node = meet
+        while self.pred_f[node] >= 0:
+            a = int(self.pred_f[node])
+            arcs.append(a)
+            node = int(self.arc_source[a])
+        arcs.reverse()
+        node = meet
+        while self.pred_b[node] >= 0:
+            a = int(self.pred_b[node])
+            arcs.append(a)
+            node = int(self.arc_target[a])
+        return best, arcs
+
+    # Full upward search from one node, forward over the up arcs or, for a target, backward
+    # over the down arcs, with stall-on-demand. Returns the settled nodes, their distances and,
+    # when arc_values is given, the sum of those values along each node's search path.
+    def upward_search(self, node, backward=False, arc_values=None):
+        side = 1 if backward else 0
+        offsets = (memoryview(self.up_offsets), memoryview(self.down_offsets))
+        arc_lists = (memoryview(self.up_arcs), memoryview(self.down_arcs))
+        ends = (memoryview(self.arc_target), memoryview(self.arc_source))
+        arc_weight = memoryview(self.arc_weight)
+        values = memoryview(arc_values) if arc_values is not None else None
+        offset, arc_list, end = offsets[side], arc_lists[side], ends[side]
+        stall_offset, stall_list, stall_end = offsets[1 - side], arc_lists[1 - side], ends[1 - side]
+
+        dist = {node: 0.0}
+        total = {node: 0.0}
+        heap = [(0.0, node)]
+        nodes, dists, totals = [], [], []
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            stalled = False
+            for i in range(stall_offset[u], stall_offset[u + 1]):
+                a = stall_list[i]
+                if dist.get(stall_end[a], math.inf) + arc_weight[a] < d:
+                    stalled = True
+                    break
+            if stalled:
+                continue
+            nodes.append(u)
+            dists.append(d)
+            totals.append(total[u])
+            for i in range(offset[u], offset[u + 1]):
+                a = arc_list[i]
+                v = end[a]
+                nd = d + arc_weight[a]
+                if nd < dist.get(v, math.inf):
+                    dist[v] = nd
+                    total[v] = total[u] + values[a] if values is not None else 0.0
+                    heapq.heappush(heap, (nd, v))
+        self.settled = len(nodes)
+        return np.array(nodes, dtype=np.int64), np.array(dists), np.array(totals)
+
+    # Per-arc sums of an original edge attribute (e.g. travel time on a length hierarchy):
+    # original arcs take the value of their edge and shortcuts add up the two arcs they replace
+    def arc_totals(self, edge_values):
+        totals = np.full(len(self.arc_edge), np.nan)
+        original = self.arc_edge >= 0
+        totals[original] = edge_values[self.arc_edge[original]]
+        pending = np.flatnonzero(~original & (self.arc_first >= 0))
+        while len(pending):
+            total = totals[self.arc_first[pending]] + totals[self.arc_second[pending]]
+            done = ~np.isnan(total)
+            if not done.any():
+                break
+            totals[pending[done]] = total[done]
+            pending = pending[~done]
+        return totals
+
+    def unpack_arcs(self, arcs):
+        # Expand shortcut arcs into the original arcs they stand for, in route order. With
+        # zero-weight edges an equally short route can come back to a node it already passed
+        # (up one zero edge, then down a shortcut through it); that loop costs nothing and is
+        # cut out so the route stays simple.
+        result = []
+        position = {}  # arcs in result when the route reached each node
+        stack = list(reversed(arcs))
+        while stack:
+            a = stack.pop()
+            if self.arc_edge[a] >= 0:
+                if not result:
+                    position[int(self.arc_source[a])] = 0
+                v = int(self.arc_target[a])
+                cut = position.get(v)
+                if cut is None:
+                    result.append(a)
+                    position[v] = len(result)
+                    continue
+                for b in result[cut:]:
+                    del position[int(self.arc_target[b])]
+                del result[cut:]
+            else:
+                stack.append(int(self.arc_second[a]))
+                stack.append(int(self.arc_first[a]))
+        return result
+
+    def unpack(self, arcs):
+        # CompactGraph edge indices of the route
+        return [int(self.arc_edge[a]) for a in self.unpack_arcs(arcs)]
+
+    def shortest_path(self, source, target):
+        _, arcs = self.query(source, target)
+        path = [int(source)]
+        for a in self.unpack_arcs(arcs):
+            path.append(int(self.arc_target[a]))
+        return path
+
+    def shortest_path_length(self, source, target):
+        best, _ = self.query(source, target)
+        return best
+
+    # OSM node route for plot_map / ox.routing.route_to_gdf
+    def route(self, origin_node, target_node):
+        source, target = np.searchsorted(self.node_ids, [origin_node, target_node])
+        if source >= self.node_count or self.node_ids[source] != origin_node:
+            raise KeyError(f"Node {origin_node} is not in the hierarchy")
+        if target >= self.node_count or self.node_ids[target] != target_node:
+            raise KeyError(f"Node {target_node} is not in the hierarchy")
+        return self.node_ids[self.shortest_path(int(source), int(target))].tolist()
+
+    def save(self, path):
+        np.savez_compressed(path, node_ids=self.node_ids, rank=self.rank, arc_source=self.arc_source,
+                            arc_target=self.arc_target, arc_weight=self.arc_weight,
+                            arc_first=self.arc_first, arc_second=self.arc_second,
+                            arc_edge=self.arc_edge, weight=np.array(self.weight),
+                            fingerprint=np.array(self.fingerprint or ''))
+
+
+def load_contraction_hierarchy(path):
+    data = np.load(path)
+    return ContractionHierarchy(data['node_ids'], data['rank'], data['arc_source'], data['arc_target'],
+                                data['arc_weight'], data['arc_first'], data['arc_second'],
+                                data['arc_edge'], weight=str(data['weight']),
+                                fingerprint=str(data['fingerprint']) if 'fingerprint' in data.files else None)
+
+
+def _group_arcs(n, owners, arcs):
+    order = np.argsort(owners, kind='stable')
+    counts = np.bincount(owners, minlength=n)
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets, arcs[order]
+
+
+class _Contractor:
+    def __init__(self, compact, weight):
+        n = compact.node_count
+        self.out_adj = [dict() for _ in range(n)]
+        self.in_adj = [dict() for _ in range(n)]
+        self.arc_source = []
+        self.arc_target = []
+        self.arc_weight = []
+        self.arc_first = []
+        self.arc_second = []
+        self.arc_edge = []
+        self.contracted = [False] * n
+        self.deleted_neighbors = [0] * n
+
+        # Parallel edges collapse to the cheapest one and self-loops never help a shortest path
+        weights = compact.weight(weight).tolist()
+        sources = compact.sources.tolist()
+        targets = compact.targets.tolist()
+        for e, (u, v) in enumerate(zip(sources, targets)):
+            if u == v:
+                continue
+            a = self.out_adj[u].get(v)
+            if a is None or weights[e] < self.arc_weight[a]:
+                self._add_arc(u, v, weights[e], -1, -1, e)
+
+    def _add_arc(self, u, v, weight, first, second, edge):
+        # A cheaper arc replaces an existing u -> v arc in the adjacency, but the old one stays
+        # in the arc arrays since earlier shortcuts may unpack through it
+        a = len(self.arc_weight)
+        self.arc_source.append(u)
+        self.arc_target.append(v)
+        self.arc_weight.append(weight)
+        self.arc_first.append(first)
+        self.arc_second.append(second)
+        self.arc_edge.append(edge)
+        self.out_adj[u][v] = a
+        self.in_adj[v][u] = a
+
+    def _witness_distances(self, start, skip, limit, targets, settle_limit):
+        dist = {start: 0.0}
+        heap = [(0.0, start)]
+        remaining = set(targets)
+        settled = 0
+        arc_weight = self.arc_weight
+        while heap and remaining and settled < settle_limit:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            if d > limit:
+                break
+            settled += 1
+            remaining.discard(u)
+            for v, a in self.out_adj[u].items():
+                if v == skip:
+                    continue
+                nd = d + arc_weight[a]
+                if nd < dist.get(v, math.inf):
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v))
+        return dist
+
+    def shortcuts(self, v, settle_limit=WITNESS_SETTLE_LIMIT):
+        arc_weight = self.arc_weight
+        ins = list(self.in_adj[v].items())
+        outs = list(self.out_adj[v].items())
+        needed = []
+        for u, a_in in ins:
+            via_out = [(w, a_out) for w, a_out in outs if w != u]
+            if not via_out:
+                continue
+            w_in = arc_weight[a_in]
+            limit = w_in + max(arc_weight[a_out] for _, a_out in via_out)
+            dist = self._witness_distances(u, v, limit, [w for w, _ in via_out], settle_limit)
+            for w, a_out in via_out:
+                via = w_in + arc_weight[a_out]
+                if dist.get(w, math.inf) > via:
+                    needed.append((u, w, via, a_in, a_out))
+        return needed
+
+    def priority(self, v):
+        # Edge difference plus the number of already contracted neighbours, which spreads
+        # contraction evenly over the graph instead of eating into one region
+        removed = len(self.in_adj[v]) + len(self.out_adj[v])
+        return len(self.shortcuts(v, PRIORITY_SETTLE_LIMIT)) - removed + self.deleted_neighbors[v]
+
+    def contract(self, v):
+        for u, w, via, a_in, a_out in self.shortcuts(v):
+            a = self.out_adj[u].get(w)
+            if a is None or via < self.arc_weight[a]:
+                self._add_arc(u, w, via, a_in, a_out, -1)
+        neighbors = set(self.in_adj[v]) | set(self.out_adj[v])
+        for u in self.in_adj[v]:
+            del self.out_adj[u][v]
+        for w in self.out_adj[v]:
+            del self.in_adj[w][v]
+        self.contracted[v] = True
+        for u in neighbors:
+            self.deleted_neighbors[u] += 1
+
+
+# Offline preprocessing: contract nodes in order of importance and return the hierarchy for
+# one weight profile. Priorities are refreshed lazily: a popped node is re-evaluated and goes
+# back on the heap if it is no longer the least important one.
+def build_contraction_hierarchy(compact, weight='length'):
+    contractor = _Contractor(compact, weight)
+    n = compact.node_count
+    heap = [(contractor.priority(v), v) for v in range(n)]
+    heapq.heapify(heap)
+    rank = np.zeros(n, dtype=np.int32)
+    next_rank = 0
+    while heap:
+        _, v = heapq.heappop(heap)
+        if contractor.contracted[v]:
+            continue
+        priority = contractor.priority(v)
+        if heap and priority > heap[0][0]:
+            heapq.heappush(heap, (priority, v))
+            continue
+        rank[v] = next_rank
+        next_rank += 1
+        contractor.contract(v)
+
+    return ContractionHierarchy(compact.node_ids, rank,
+                                np.array(contractor.arc_source, dtype=np.int32),
+                                np.array(contractor.arc_target, dtype=np.int32),
+                                np.array(contractor.arc_weight, dtype=np.float64),
+                                np.array(contractor.arc_first, dtype=np.int64),
+                                np.array(contractor.arc_second, dtype=np.int64),
+                                np.array(contractor.arc_edge, dtype=np.int64),
+                                weight=weight, fingerprint=compact.fingerprint(weight))
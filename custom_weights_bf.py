@@ -1,10 +1,12 @@
 import os
-import random
 import networkx as nx
+import numpy as np
 import plotly.graph_objects as go
 import osmnx as ox
 import pandas as pd
 import geopandas as gpd
+from region_graph import load_region_graph, load_region_compact_graph, load_region_snapper
+from bellman_ford_engine import bellman_ford_path
 
 
 
@@ -17,28 +19,31 @@ df.columns = df.columns.str.strip()
 
 ## Custom Weigths for Bellman-Ford
 
-def add_custom_weights(roadgraph, factor=1.5):
-    for u, v, key, data in roadgraph.edges(data=True, keys=True):
-        # Assume the original weight is based on length (this is typical in OSMnx)
-        original_weight = data['length']
-        # Add a congestion factor that randomly increases the weight
-        congestion_multiplier = random.uniform(1, factor)
-        data['congestion_weight'] = original_weight * congestion_multiplier
-def generate_path(origin_point, target_point, perimeter, weight='congestition_weight'):
-    ox.config(log_console=True, use_cache=True)
-    north = max(origin_point[0], target_point[0]) + perimeter
-    south = min(origin_point[0], target_point[0]) - perimeter
-    east = max(origin_point[1], target_point[1]) + perimeter
-    west = min(origin_point[1], target_point[1]) - perimeter
-    mode = 'drive'
-    roadgraph = ox.graph_from_bbox(north, south, east, west, network_type=mode,simplify=True, truncate_by_edge=True, clean_periphery=True)
+def add_custom_weights(compact, roadgraph, factor=1.5, store=True):
+    # Assume the original weight is based on length (this is typical in OSMnx) and add a
+    # congestion factor that randomly increases it, drawn for every edge in one call
+    congestion_multiplier = np.random.uniform(1, factor, compact.edge_count)
+    compact.add_weight('congestion_weight', compact.weights['length'] * congestion_multiplier)
+    # Only the networkx search reads the weights off the edges
+    if store:
+        compact.store_weight(roadgraph, 'congestion_weight')
+# backend='vectorized' or 'spfa' runs the array-based Bellman-Ford on the CSR copy of the graph instead of networkx
+def generate_path(origin_point, target_point, perimeter, weight='congestition_weight', backend='networkx'):
+    roadgraph = load_region_graph(perimeter)
+    compact = load_region_compact_graph(perimeter)
 
     # Add custom weights
-    add_custom_weights(roadgraph, factor=1.5)  # Adjust factor as needed
+    add_custom_weights(compact, roadgraph, factor=1.5, store=backend == 'networkx')  # Adjust factor as needed
 
-    origin_node = ox.nearest_nodes(roadgraph, origin_point[1], origin_point[0])
-    target_node = ox.nearest_nodes(roadgraph, target_point[1], target_point[0])
-    route = nx.shortest_path(roadgraph, origin_node, target_node, weight=weight, method='bellman-ford')
+    origin_node, target_node = load_region_snapper(perimeter).nearest_nodes([origin_point, target_point])
+    if backend in ('vectorized', 'spfa'):
+        if weight not in compact.weights:
+            compact.load_weight(roadgraph, weight)
+        route = bellman_ford_path(compact, origin_node, target_node, weight=weight, method=backend)
+    elif backend == 'networkx':
+        route = nx.shortest_path(roadgraph, origin_node, target_node, weight=weight, method='bellman-ford')
+    else:
+        raise ValueError("Unsupported backend")
     long = [roadgraph.nodes[n]['x'] for n in route]
     lat = [roadgraph.nodes[n]['y'] for n in route]
     return long, lat, roadgraph, origin_node, target_node
@@ -0,0 +1,232 @@
+import math
+import numpy as np
+from contraction_hierarchy import ContractionHierarchy
+
+# Parts of the nested dissection at or below this size are ordered by degree
+LEAF_SIZE = 64
+
+
+# Customizable contraction hierarchy (CCH).
+# The node order and the chordal supergraph it induces depend only on topology, so they are
+# computed once per road graph. Each undirected CCH edge e joins lower[e] to upper[e] (by rank)
+# and every lower triangle (v; a, b) is stored as three edge ids. A weight profile is then
+# applied by customize(), which only does array work over those triangles and returns a
+# ContractionHierarchy that answers queries like a regular one.
+class CustomizableHierarchy:
+    def __init__(self, node_ids, rank, lower, upper, edge_slot, edge_is_up,
+                 tri_low_a, tri_low_b, tri_top, level_offsets, fingerprint=None):
+        self.node_ids = node_ids
+        self.rank = rank
+        self.lower = lower
+        self.upper = upper
+        self.edge_slot = edge_slot  # CCH edge of every CompactGraph edge, -1 for self-loops
+        self.edge_is_up = edge_is_up  # whether that edge runs from the lower to the upper rank
+        self.tri_low_a = tri_low_a  # edge (v, a) of each triangle, a ranked below b
+        self.tri_low_b = tri_low_b  # edge (v, b)
+        self.tri_top = tri_top  # edge (a, b)
+        self.level_offsets = level_offsets  # triangles of one elimination tree level are contiguous
+        self.fingerprint = fingerprint  # CompactGraph.fingerprint() of the graph it was built on
+
+    @property
+    def edge_count(self):
+        return len(self.lower)
+
+    @property
+    def triangle_count(self):
+        return len(self.tri_top)
+
+    # Apply one weight profile: seed every CCH edge with the cheapest original edge in each
+    # direction, then relax lower triangles bottom-up. Triangles in the same level never read
+    # an edge that another triangle of that level writes, so each level is one NumPy pass.
+    def customize(self, compact, weight):
+        if not np.array_equal(compact.node_ids, self.node_ids):
+            raise ValueError("The hierarchy was built for a different graph")
+        weights = compact.weight(weight)
+        m = self.edge_count
+        up = np.full(m, np.inf)
+        down = np.full(m, np.inf)
+        up_edge = np.full(m, -1, dtype=np.int64)
+        down_edge = np.full(m, -1, dtype=np.int64)
+        edges = np.flatnonzero(self.edge_slot >= 0)
+        edges = edges[np.argsort(-weights[edges], kind='stable')]  # cheapest edge is written last
+        for is_up, values, chosen in ((True, up, up_edge), (False, down, down_edge)):
+            selected = edges[self.edge_is_up[edges] == is_up]
+            values[self.edge_slot[selected]] = weights[selected]
+            chosen[self.edge_slot[selected]] = selected
+
+        up_tri = np.full(m, -1, dtype=np.int64)
+        down_tri = np.full(m, -1, dtype=np.int64)
+        for level in range(len(self.level_offsets) - 1):
+            start, stop = self.level_offsets[level], self.level_offsets[level + 1]
+            low_a = self.tri_low_a[start:stop]
+            low_b = self.tri_low_b[start:stop]
+            top = self.tri_top[start:stop]
+            triangles = np.arange(start, stop, dtype=np.int64)
+            # a -> v -> b improves the upward arc a -> b, b -> v -> a the downward arc b -> a
+            for values, tri, chosen, cand in ((up, up_tri, up_edge, down[low_a] + up[low_b]),
+                                              (down, down_tri, down_edge, down[low_b] + up[low_a])):
+                before = values[top]
+                np.minimum.at(values, top, cand)
+                improved = (cand < before) & (cand == values[top])
+                tri[top[improved]] = triangles[improved]
+                chosen[top[improved]] = -1
+
+        # Arc 2e is the upward arc of CCH edge e, arc 2e + 1 its downward arc
+        arc_source = np.empty(2 * m, dtype=np.int32)
+        arc_target = np.empty(2 * m, dtype=np.int32)
+        arc_source[0::2], arc_target[0::2] = self.lower, self.upper
+        arc_source[1::2], arc_target[1::2] = self.upper, self.lower
+        arc_weight = np.empty(2 * m)
+        arc_weight[0::2], arc_weight[1::2] = up, down
+        arc_edge = np.empty(2 * m, dtype=np.int64)
+        arc_edge[0::2], arc_edge[1::2] = up_edge, down_edge
+        arc_first = np.full(2 * m, -1, dtype=np.int64)
+        arc_second = np.full(2 * m, -1, dtype=np.int64)
+        has = up_tri >= 0
+        arc_first[0::2][has] = 2 * self.tri_low_a[up_tri[has]] + 1
+        arc_second[0::2][has] = 2 * self.tri_low_b[up_tri[has]]
+        has = down_tri >= 0
+        arc_first[1::2][has] = 2 * self.tri_low_b[down_tri[has]] + 1
+        arc_second[1::2][has] = 2 * self.tri_low_a[down_tri[has]]
+        return ContractionHierarchy(self.node_ids, self.rank, arc_source, arc_target, arc_weight,
+                                    arc_first, arc_second, arc_edge, weight=weight)
+
+    def save(self, path):
+        np.savez_compressed(path, node_ids=self.node_ids, rank=self.rank, lower=self.lower,
+                            upper=self.upper, edge_slot=self.edge_slot, edge_is_up=self.edge_is_up,
+                            tri_low_a=self.tri_low_a, tri_low_b=self.tri_low_b, tri_top=self.tri_top,
+                            level_offsets=self.level_offsets, fingerprint=np.array(self.fingerprint or ''))
+
+
+def load_customizable_hierarchy(path):
+    data = np.load(path)
+    return CustomizableHierarchy(data['node_ids'], data['rank'], data['lower'], data['upper'],
+                                 data['edge_slot'], data['edge_is_up'], data['tri_low_a'],
+                                 data['tri_low_b'], data['tri_top'], data['level_offsets'],
+                                 str(data['fingerprint']) if 'fingerprint' in data.files else None)
+
+
+def _undirected_edges(compact):
+    n = compact.node_count
+    u = compact.sources.astype(np.int64)
+    v = compact.targets.astype(np.int64)
+    keep = u != v
+    keys = np.unique(np.minimum(u[keep], v[keep]) * n + np.maximum(u[keep], v[keep]))
+    return keys // n, keys % n
+
+
+# Geometric nested dissection: split each part at the median of its wider coordinate, take
+# the smaller side of the cut as separator and rank separators above both halves
+def nested_dissection_order(compact, leaf_size=LEAF_SIZE):
+    n = compact.node_count
+    eu, ev = _undirected_edges(compact)
+    x = compact.x * math.cos(math.radians(float(np.mean(compact.y)))) if n else compact.x
+    y = compact.y
+    side = np.zeros(n, dtype=np.int8)
+    order = []
+    stack = [(np.arange(n, dtype=np.int64), eu, ev, None)]
+    # A separator is pushed below its two halves, so it is emitted after both of them
+    while stack:
+        nodes, su, sv, separator = stack.pop()
+        if separator is not None:
+            order.append(separator)
+            continue
+        if len(nodes) <= leaf_size:
+            degree = np.bincount(np.concatenate([su, sv]), minlength=n)[nodes]
+            order.append(nodes[np.argsort(degree, kind='stable')])
+            continue
+        coords = x[nodes] if np.ptp(x[nodes]) >= np.ptp(y[nodes]) else y[nodes]
+        median = np.median(coords)
+        side[nodes] = coords > median
+        if side[nodes].all() or not side[nodes].any():
+            side[nodes] = np.arange(len(nodes)) >= len(nodes) // 2
+        cross = side[su] != side[sv]
+        cut_a = np.unique(np.where(side[su[cross]] == 0, su[cross], sv[cross]))
+        cut_b = np.unique(np.where(side[su[cross]] == 1, su[cross], sv[cross]))
+        separator = cut_a if len(cut_a) <= len(cut_b) else cut_b
+        side[separator] = 2
+        parts = []
+        for label in (0, 1):
+            inside = (side[su] == label) & (side[sv] == label)
+            parts.append((nodes[side[nodes] == label], su[inside], sv[inside], None))
+        stack.append((None, None, None, separator))
+        stack.extend(parts)
+    return np.concatenate(order) if order else np.zeros(0, dtype=np.int64)
+
+
+# Metric-independent preprocessing: order the nodes, complete the graph to its chordal
+# supergraph along that order and list every lower triangle by elimination tree level
+def build_customizable_hierarchy(compact, order=None):
+    n = compact.node_count
+    if order is None:
+        order = nested_dissection_order(compact)
+    rank = np.empty(n, dtype=np.int32)
+    rank[order] = np.arange(n, dtype=np.int32)
+
+    eu, ev = _undirected_edges(compact)
+    swap = rank[eu] > rank[ev]
+    lo = np.where(swap, ev, eu).tolist()
+    hi = np.where(swap, eu, ev).tolist()
+    up_sets = [set() for _ in range(n)]
+    for a, b in zip(lo, hi):
+        up_sets[a].add(b)
+    # Eliminating v makes its upper neighbours a clique; merging them into the lowest one
+    # (v's elimination tree parent) is enough, the rest follows when the parent is eliminated
+    rank_list = rank.tolist()
+    level = [0] * n
+    for v in order.tolist():
+        ups = up_sets[v]
+        if ups:
+            parent = min(ups, key=rank_list.__getitem__)
+            up_sets[parent] |= ups
+            up_sets[parent].discard(parent)
+            for w in ups:
+                if level[w] < level[v] + 1:
+                    level[w] = level[v] + 1
+
+    lower = np.repeat(np.arange(n, dtype=np.int64), [len(s) for s in up_sets])
+    upper = np.array([w for s in up_sets for w in sorted(s)], dtype=np.int64)
+    keys = lower * n + upper  # sorted, so edge ids can be found with searchsorted
+
+    def edge_id(a, b):
+        return np.searchsorted(keys, a * n + b)
+
+    # Map every original edge onto its CCH edge
+    src = compact.sources.astype(np.int64)
+    dst = compact.targets.astype(np.int64)
+    edge_is_up = rank[src] < rank[dst]
+    edge_slot = edge_id(np.where(edge_is_up, src, dst), np.where(edge_is_up, dst, src))
+    edge_slot[src == dst] = -1
+
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum([len(s) for s in up_sets], out=offsets[1:])
+    tri_low_a, tri_low_b, tri_top, tri_level = [], [], [], []
+    for v in range(n):
+        start, stop = offsets[v], offsets[v + 1]
+        if stop - start < 2:
+            continue
+        ups = upper[start:stop]
+        by_rank = np.argsort(rank[ups])
+        i, j = np.triu_indices(stop - start, 1)
+        ia, ib = by_rank[i], by_rank[j]
+        tri_low_a.append((start + ia).astype(np.int32))
+        tri_low_b.append((start + ib).astype(np.int32))
+        tri_top.append(edge_id(ups[ia], ups[ib]).astype(np.int32))
+        tri_level.append(np.full(len(i), level[v], dtype=np.int32))
+
+    if tri_top:
+        tri_level = np.concatenate(tri_level)
+        by_level = np.argsort(tri_level, kind='stable')
+        tri_low_a = np.concatenate(tri_low_a)[by_level]
+        tri_low_b = np.concatenate(tri_low_b)[by_level]
+        tri_top = np.concatenate(tri_top)[by_level]
+        counts = np.bincount(tri_level, minlength=1)
+    else:
+        tri_low_a = tri_low_b = tri_top = np.zeros(0, dtype=np.int32)
+        counts = np.zeros(1, dtype=np.int64)
+    level_offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=level_offsets[1:])
+
+    return CustomizableHierarchy(compact.node_ids, rank, lower.astype(np.int32), upper.astype(np.int32),
+                                 edge_slot, edge_is_up, tri_low_a, tri_low_b, tri_top, level_offsets,
+                                 compact.fingerprint())
@@ -0,0 +1,328 @@
+import heapq
+import math
+import networkx as nx
+import numpy as np
+
+# Engines that have already been built, keyed by id() of their CompactGraph
+_engines = {}
+
+
+# Dijkstra over the flat CSR arrays of a CompactGraph.
+# Distance and predecessor-edge buffers are allocated once per graph and only the nodes
+# touched by the previous query are reset, so a query costs nothing proportional to the
+# graph size. Array reads go through memoryviews, which hand back plain Python ints and
+# floats without the per-element overhead of NumPy scalar indexing.
+class DijkstraEngine:
+    def __init__(self, compact):
+        self.graph = compact
+        self.dist = np.full(compact.node_count, np.inf)
+        self.pred = np.full(compact.node_count, -1, dtype=np.int64)  # edge used to reach each node
+        self._touched = []
+        self.dist_b = None  # backward buffers, allocated on the first bidirectional query
+        self.pred_b = None
+        self._touched_b = []
+        self.settled = 0
+
+    def _reset(self):
+        if self._touched:
+            touched = np.array(self._touched, dtype=np.int64)
+            self.dist[touched] = np.inf
+            self.pred[touched] = -1
+            self._touched = []
+        if self._touched_b:
+            touched = np.array(self._touched_b, dtype=np.int64)
+            self.dist_b[touched] = np.inf
+            self.pred_b[touched] = -1
+            self._touched_b = []
+        self.settled = 0
+
+    # Run a search from seeds, a list of (node, start_distance) pairs. The search stops
+    # once every node in targets is settled or the next distance exceeds limit.
+    def search(self, seeds, weight='length', targets=None, limit=math.inf, graph=None):
+        graph = graph if graph is not None else self.graph
+        self._reset()
+        offsets = memoryview(graph.offsets)
+        heads = memoryview(graph.targets)
+        weights = memoryview(graph.weight(weight))
+        dist = memoryview(self.dist)
+        pred = memoryview(self.pred)
+        touched = self._touched
+        remaining = set(targets) if targets is not None else None
+
+        heap = []
+        for node, start in seeds:
+            if start < dist[node]:
+                if dist[node] == math.inf:
+                    touched.append(node)
+                dist[node] = start
+                heap.append((start, node))
+        heapq.heapify(heap)
+
+        settled = 0
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            if d > limit:
+                break
+            settled += 1
+            if remaining is not None:
+                remaining.discard(u)
+                if not remaining:
+                    break
+            for e in range(offsets[u], offsets[u + 1]):
+                v = heads[e]
+                nd = d + weights[e]
+                if nd < dist[v]:
+                    if dist[v] == math.inf:
+                        touched.append(v)
+                    dist[v] = nd
+                    pred[v] = e
+                    heapq.heappush(heap, (nd, v))
+        self.settled = settled
+        return self.dist
+
+    # Sum of per-edge values (e.g. travel time on a length search) along the tree path of the
+    # last search to each of nodes, nan where a node was not reached. Parents are followed by
+    # pointer jumping, so the whole tree takes a few vectorized passes instead of a walk per node.
+    def path_totals(self, values, nodes):
+        graph = self.graph
+        touched = np.array(self._touched, dtype=np.int64)
+        edges = self.pred[touched]
+        reached = edges >= 0
+        parent = np.full(graph.node_count, -1, dtype=np.int64)
+        total = np.full(graph.node_count, np.nan)
+        total[touched] = 0.0
+        active = touched[reached]
+        parent[active] = graph.sources[edges[reached]]
+        total[active] = values[edges[reached]]
+        while len(active):
+            up = parent[active]
+            total[active] += total[up]
+            parent[active] = parent[up]
+            active = active[parent[active] >= 0]
+        return total[nodes]
+
+    def path_to(self, target, graph=None):
+        graph = graph if graph is not None else self.graph
+        if self.dist[target] == math.inf:
+            raise nx.NetworkXNoPath(f"No path to {graph.node_ids[target]}.")
+        sources = graph.sources
+        path = [int(target)]
+        e = self.pred[target]
+        while e >= 0:
+            u = int(sources[e])
+            path.append(u)
+            e = self.pred[u]
+        path.reverse()
+        return path
+
+    # Point-to-point search from both ends: forward from source on the graph and backward
+    # from target on the reversed graph, always expanding the side with the smaller key.
+    # With a heuristic h(u, v) on node indices this is bidirectional A* using the average
+    # potential p(v) = (h(v, target) - h(source, v)) / 2, which stays consistent for both
+    # directions. The search stops once the two smallest keys add up to the best s-t
+    # distance found so far, which is exact for both plain and potential-reduced keys.
+    def bidirectional(self, source, target, weight='length', heuristic=None):
+        graph = self.graph
+        reverse = graph.reverse()
+        if self.dist_b is None:
+            self.dist_b = np.full(graph.node_count, np.inf)
+            self.pred_b = np.full(graph.node_count, -1, dtype=np.int64)
+        self._reset()
+        if source == target:
+            return [int(source)]
+
+        if heuristic is None:
+            def potential(v):
+                return 0.0
+        else:
+            # Bound heuristics cache the bounds of both ends so each potential is two lookups
+            if hasattr(heuristic, 'prepare'):
+                heuristic.prepare(source, target)
+
+            def potential(v):
+                return 0.5 * (heuristic(v, target) - heuristic(source, v))
+
+        offsets = (memoryview(graph.offsets), memoryview(reverse.offsets))
+        heads = (memoryview(graph.targets), memoryview(reverse.targets))
+        weights = (memoryview(graph.weight(weight)), memoryview(reverse.weight(weight)))
+        dists = (memoryview(self.dist), memoryview(self.dist_b))
+        preds = (memoryview(self.pred), memoryview(self.pred_b))
+        touched = (self._touched, self._touched_b)
+        signs = (1.0, -1.0)
+
+        dists[0][source] = 0.0
+        dists[1][target] = 0.0
+        touched[0].append(source)
+        touched[1].append(target)
+        heaps = ([(potential(source), 0.0, source)], [(-potential(target), 0.0, target)])
+
+        best = math.inf
+        meet = -1
+        settled = 0
+        while heaps[0] and heaps[1]:
+            if heaps[0][0][0] + heaps[1][0][0] >= best:
+                break
+            side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+            heap = heaps[side]
+            dist = dists[side]
+            other = dists[1 - side]
+            pred = preds[side]
+            head = heads[side]
+            weight_view = weights[side]
+            sign = signs[side]
+            _, d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            settled += 1
+            for e in range(offsets[side][u], offsets[side][u + 1]):
+                v = head[e]
+                nd = d + weight_view[e]
+                if nd < dist[v]:
+                    if dist[v] == math.inf:
+                        touched[side].append(v)
+                    dist[v] = nd
+                    pred[v] = e
+                    heapq.heappush(heap, (nd + sign * potential(v), nd, v))
+                    if other[v] != math.inf and nd + other[v] < best:
+                        best = nd + other[v]
+                        meet = v
+        self.settled = settled
+
+        if meet < 0:
+            raise nx.NetworkXNoPath(f"No path between {graph.node_ids[source]} and {graph.node_ids[target]}.")
+        path = self.path_to(meet)
+        reverse_sources = reverse.sources
+        node = meet
+        e = self.pred_b[node]
+        while e >= 0:
+            node = int(reverse_sources[e])
+            path.append(node)
+            e = self.pred_b[node]
+        return path
+
+    # Goal-directed search: nodes are expanded in order of distance plus heuristic(v, target),
+    # which must be a consistent lower bound on the remaining cost in the same weight units
+    def astar(self, source, target, weight='length', heuristic=None):
+        if heuristic is None:
+            return self.shortest_path(source, target, weight)
+        graph = self.graph
+        self._reset()
+        offsets = memoryview(graph.offsets)
+        heads = memoryview(graph.targets)
+        weights = memoryview(graph.weight(weight))
+        dist = memoryview(self.dist)
+        pred = memoryview(self.pred)
+        touched = self._touched
+
+        dist[source] = 0.0
+        touched.append(source)
+        heap = [(heuristic(source, target), 0.0, source)]
+        settled = 0
+        while heap:
+            _, d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            settled += 1
+            if u == target:
+                break
+            for e in range(offsets[u], offsets[u + 1]):
+                v = heads[e]
+                nd = d + weights[e]
+                if nd < dist[v]:
+                    if dist[v] == math.inf:
+                        touched.append(v)
+                    dist[v] = nd
+                    pred[v] = e
+                    heapq.heappush(heap, (nd + heuristic(v, target), nd, v))
+        self.settled = settled
+        return self.path_to(target)
+
+    # Time-dependent search on a (hours, edge_count) table of edge travel times in minutes at
+    # each full hour. Between two hours an edge's travel time is interpolated linearly (wrapping
+    # at midnight), labels are arrival times in minutes after midnight starting at departure.
+    # With a heuristic that bounds the travel time at every hour this is time-dependent A*.
+    # Exact as long as a later departure never arrives earlier on an edge, which holds while
+    # an edge's travel time changes by less than an hour per hour.
+    def time_dependent(self, source, target, table, departure, heuristic=None):
+        graph = self.graph
+        self._reset()
+        hours = len(table)
+        rows = [memoryview(table[h]) for h in range(hours)]
+        offsets = memoryview(graph.offsets)
+        heads = memoryview(graph.targets)
+        dist = memoryview(self.dist)
+        pred = memoryview(self.pred)
+        touched = self._touched
+
+        dist[source] = departure
+        touched.append(source)
+        heap = [(departure + (heuristic(source, target) if heuristic else 0.0), departure, source)]
+        settled = 0
+        while heap:
+            _, t, u = heapq.heappop(heap)
+            if t > dist[u]:
+                continue
+            settled += 1
+            if u == target:
+                break
+            clock = (t / 60.0) % hours
+            hour = int(clock)
+            share = clock - hour
+            now, later = rows[hour], rows[(hour + 1) % hours]
+            for e in range(offsets[u], offsets[u + 1]):
+                v = heads[e]
+                nt = t + (1.0 - share) * now[e] + share * later[e]
+                if nt < dist[v]:
+                    if dist[v] == math.inf:
+                        touched.append(v)
+                    dist[v] = nt
+                    pred[v] = e
+                    heapq.heappush(heap, (nt + (heuristic(v, target) if heuristic else 0.0), nt, v))
+        self.settled = settled
+        return self.path_to(target)
+
+    def shortest_path(self, source, target, weight='length'):
+        self.search([(source, 0.0)], weight=weight, targets=[target])
+        return self.path_to(target)
+
+    # One search from source that stops once every target is settled; every route is then
+    # read back from the same shortest-path tree. Unreachable targets are left out.
+    def one_to_many(self, source, targets, weight='length'):
+        self.search([(source, 0.0)], weight=weight, targets=targets)
+        return {int(t): self.path_to(t) for t in targets if self.dist[t] != math.inf}
+
+    def shortest_path_length(self, source, target, weight='length'):
+        self.search([(source, 0.0)], weight=weight, targets=[target])
+        if self.dist[target] == math.inf:
+            raise nx.NetworkXNoPath(f"No path to {self.graph.node_ids[target]}.")
+        return float(self.dist[target])
+
+
+def get_engine(compact):
+    entry = _engines.get(id(compact))
+    if entry is None or entry[0] is not compact:
+        entry = (compact, DijkstraEngine(compact))
+        _engines[id(compact)] = entry
+    return entry[1]
+
+
+def clear_engines():
+    _engines.clear()
+
+
+# Drop-in replacement for nx.shortest_path(..., method='dijkstra') that takes and returns
+# OSM node ids but searches the compact graph
+def dijkstra_path(compact, origin_node, target_node, weight='length'):
+    engine = get_engine(compact)
+    path = engine.shortest_path(compact.index_of(origin_node), compact.index_of(target_node), weight)
+    return compact.to_osm(path)
+
+
+# One-to-many version of dijkstra_path: a dict mapping each reachable target OSM id to its route
+def dijkstra_paths(compact, origin_node, target_nodes, weight='length'):
+    engine = get_engine(compact)
+    targets = compact.indices_of(target_nodes).tolist()
+    paths = engine.one_to_many(compact.index_of(origin_node), targets, weight)
+    return {int(compact.node_ids[t]): compact.to_osm(path) for t, path in paths.items()}
@@ -5,6 +5,11 @@ import osmnx as ox
 import pandas as pd
 import geopandas
 import time 
+from region_graph import load_region_graph, load_region_compact_graph, load_region_hierarchy, load_region_snapper, load_region_edge_snapper
+from dijkstra_engine import dijkstra_path, dijkstra_paths, get_engine
+from snapping import edge_route
+from route_metrics import route_metrics, summarize_edges, summarize_route, summary_metrics
+from k_shortest import k_shortest_routes
 
 # Ensure the drive is mounted correctly
 
@@ -12,54 +17,62 @@ df = pd.read_csv('testing_locations_4511.csv')
 df.columns = df.columns.str.strip()
 
 # Define function to generate paths using OSMNX and NetworkX
-def generate_path(origin_point, target_point, perimeter):
+# backend='compact' runs the array-based engine on the CSR copy of the graph instead of networkx,
+# backend='ch' answers the query from the region's contraction hierarchy, backend='edge' snaps both
+# points onto the nearest road instead of the nearest node and searches from the partial edges
+def generate_path(origin_point, target_point, perimeter, backend='networkx'):
     start_time = time.time()
-    ox.config(log_console=True, use_cache=True)
-    north = max(origin_point[0], target_point[0]) + perimeter
-    south = min(origin_point[0], target_point[0]) - perimeter
-    east = max(origin_point[1], target_point[1]) + perimeter
-    west = min(origin_point[1], target_point[1]) - perimeter
-    mode = 'drive'
-    roadgraph = ox.graph_from_bbox(north, south, east, west, network_type=mode, simplify=True)
-    origin_node = ox.nearest_nodes(roadgraph, origin_point[1], origin_point[0])
-    target_node = ox.nearest_nodes(roadgraph, target_point[1], target_point[0])
-    route = nx.shortest_path(roadgraph, origin_node, target_node, weight='length', method='dijkstra')
-
-    long = [roadgraph.nodes[n]['x'] for n in route]
-    lat = [roadgraph.nodes[n]['y'] for n in route]
-    
-    # Calculate total distance in meters
-    route_gdf = ox.routing.route_to_gdf(roadgraph, route)
-    total_distance_m = route_gdf['length'].sum()
-
-    # Clean and process speed data
-    def clean_speed(speed):
-        if isinstance(speed, str):
-            if 'mph' in speed:
-                return float(speed.split(' ')[0])  # Assuming format is 'XX mph'
-            elif 'kph' in speed:
-                return float(speed.split(' ')[0]) / 1.60934  # Convert km/h to mph
-        return None
-
-    speeds = route_gdf['maxspeed'].apply(clean_speed).dropna()
-    if not speeds.empty:
-        weighted_speeds = route_gdf[route_gdf['maxspeed'].notnull()]['length'] * speeds
-        average_speed_mph = weighted_speeds.sum() / route_gdf[route_gdf['maxspeed'].notnull()]['length'].sum()
+    roadgraph = load_region_graph(perimeter)
+    compact = load_region_compact_graph(perimeter)
+    origin_node, target_node = load_region_snapper(perimeter).nearest_nodes([origin_point, target_point])
+    summary = None
+    if backend == 'compact':
+        route = dijkstra_path(compact, origin_node, target_node, weight='length')
+    elif backend == 'ch':
+        route = load_region_hierarchy(perimeter).route(origin_node, target_node)
+    elif backend == 'edge':
+        path, _, edges, starts, ends = edge_route(get_engine(compact), load_region_edge_snapper(perimeter),
+                                                  origin_point, target_point)
+        # Only the driven part of the first and last roads counts
+        summary = summarize_edges(compact, path, edges, starts, ends)
+    elif backend == 'networkx':
+        route = nx.shortest_path(roadgraph, origin_node, target_node, weight='length', method='dijkstra')
     else:
-        average_speed_mph = 30  # Fallback speed in mph if no valid speed data is available
+        raise ValueError("Unsupported backend")
 
-    # Convert distance to miles
-    total_distance_mi = total_distance_m / 1609.34  # meters to miles
-    
-    # Calculate travel time in hours
-    travel_time_h = total_distance_mi / average_speed_mph
-    
-    # Convert travel time to minutes
-    travel_time_min = travel_time_h * 60
+    if summary is None:
+        summary = summarize_route(compact, route)
+    long, lat, total_distance_mi, travel_time_min, average_speed_mph = summary_metrics(compact, summary)
     end_time = time.time()
     execution_time = end_time - start_time
     
     return long, lat, total_distance_mi, travel_time_min, average_speed_mph, execution_time
+
+# One-to-many version of generate_path: a single Dijkstra from the origin, stopped once every
+# target is settled, gives the routes to all targets. Returns the metrics of each route (None
+# for targets that cannot be reached) and the execution time of the whole batch.
+def generate_paths(origin_point, target_points, perimeter):
+    start_time = time.time()
+    compact = load_region_compact_graph(perimeter)
+    snapper = load_region_snapper(perimeter)
+    origin_node = snapper.nearest_nodes([origin_point])[0]
+    target_nodes = snapper.nearest_nodes(target_points)
+    routes = dijkstra_paths(compact, origin_node, target_nodes, weight='length')
+    results = [route_metrics(compact, routes[node]) if node in routes else None for node in target_nodes]
+    execution_time = time.time() - start_time
+    return results, execution_time
+
+# Exact k shortest loopless routes between two points (Yen's algorithm on the compact graph),
+# each with the same metrics generate_path reports, shortest first
+def generate_k_paths(origin_point, target_point, perimeter, k=3):
+    start_time = time.time()
+    compact = load_region_compact_graph(perimeter)
+    origin_node, target_node = load_region_snapper(perimeter).nearest_nodes([origin_point, target_point])
+    routes = k_shortest_routes(compact, origin_node, target_node, k, weight='length')
+    results = [route_metrics(compact, route) for route in routes]
+    execution_time = time.time() - start_time
+    return results, execution_time
+
 # Define function to plot results on a map using Plotly
 def plot_map(origin_point, target_points, long, lat, total_distance, total_travel_time, average_speed):
     fig = go.Figure(go.Scattermapbox(
@@ -122,16 +135,20 @@ def plot_map(origin_point, target_points, long, lat, total_distance, total_trave
 origin_point = (df.at[0, 'Latitude'], df.at[0, 'Longitude'])
 target_points = [(lat, lon) for lat, lon in zip(df['Latitude'], df['Longitude'])]
 
-for target_point in target_points[1:]:
-    perimeter = 0.10
-    lng, lati, distance, travel_time, speed, execution_time = generate_path(origin_point, target_point, perimeter)
+perimeter = 0.10
+results, execution_time = generate_paths(origin_point, target_points[1:], perimeter)
+print("Execution Time (seconds):", execution_time)
+
+for target_point, result in zip(target_points[1:], results):
+    if result is None:
+        print("No route to", target_point)
+        continue
+    lng, lati, distance, travel_time, speed = result
     
     # Print the metrics for each route
     print("Route Distance (miles):", distance)
     print("Route Travel Time (minutes):", travel_time)
     print("Route Average Speed (mph):", speed)
-    print("Execution Time (seconds):", execution_time)
 
     # Plot the map for each route
     plot_map(origin_point, [target_point], [lng], [lati], distance, travel_time, speed)
-
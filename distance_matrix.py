@@ -0,0 +1,115 @@
+import multiprocessing
+import numpy as np
+from compact_graph import csr_ranges
+from dijkstra_engine import DijkstraEngine
+from region_graph import load_region_compact_graph, load_region_hierarchy
+from snapping import get_snapper
+
+# Per-process state of the one-to-many workers
+_worker_state = None
+
+
+# Snap (lat, lon) points to compact node indices in one vectorized call
+def snap_points(compact, points):
+    return get_snapper(compact).snap([point[0] for point in points], [point[1] for point in points])
+
+
+# Rows of the matrix for some sources: one Dijkstra per source that stops when every target
+# is settled, with the other weight summed along the same shortest-path tree
+def _one_to_many_rows(compact, sources, targets, weight, other):
+    engine = DijkstraEngine(compact)
+    other_values = compact.weight(other)
+    primary = np.full((len(sources), len(targets)), np.inf)
+    secondary = np.full((len(sources), len(targets)), np.inf)
+    for i, source in enumerate(sources):
+        dist = engine.search([(int(source), 0.0)], weight=weight, targets=targets)
+        primary[i] = dist[targets]
+        reached = np.isfinite(primary[i])
+        secondary[i, reached] = engine.path_totals(other_values, targets[reached])
+    return primary, secondary
+
+
+def _init_worker(compact, targets, weight, other):
+    global _worker_state
+    _worker_state = (compact, targets, weight, other)
+
+
+def _worker_rows(sources):
+    compact, targets, weight, other = _worker_state
+    return _one_to_many_rows(compact, sources, targets, weight, other)
+
+
+# Repeated one-to-many search. With processes > 1 the sources are split over a process pool,
+# each worker keeping its own copy of the graph and search buffers.
+def one_to_many_matrix(compact, sources, targets, weight='length', other='travel_time_min', processes=None):
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    if not processes or processes < 2 or len(sources) < 2:
+        return _one_to_many_rows(compact, sources, targets, weight, other)
+    chunks = np.array_split(sources, min(len(sources), processes * 4))
+    with multiprocessing.Pool(processes, _init_worker, (compact, targets, weight, other)) as pool:
+        rows = pool.map(_worker_rows, chunks)
+    return np.vstack([r[0] for r in rows]), np.vstack([r[1] for r in rows])
+
+
+# Bucket-based many-to-many on a contraction hierarchy. A backward upward search from every
+# target leaves (target, distance) entries in a bucket at each node it settles; the forward
+# upward search from a source then scans the buckets of its settled nodes, and the cheapest
+# entry per target is the shortest distance. arc_values (see ContractionHierarchy.arc_totals)
+# is summed along the same routes for the secondary matrix.
+def bucket_matrix(hierarchy, sources, targets, arc_values=None):
+    n = hierarchy.node_count
+    primary = np.full((len(sources), len(targets)), np.inf)
+    secondary = np.full((len(sources), len(targets)), np.inf)
+    if len(sources) == 0 or len(targets) == 0:
+        return primary, secondary
+
+    entries = [hierarchy.upward_search(int(t), backward=True, arc_values=arc_values) for t in targets]
+    bucket_node = np.concatenate([nodes for nodes, _, _ in entries])
+    bucket_target = np.repeat(np.arange(len(targets)), [len(nodes) for nodes, _, _ in entries])
+    bucket_dist = np.concatenate([dists for _, dists, _ in entries])
+    bucket_total = np.concatenate([totals for _, _, totals in entries])
+    order = np.argsort(bucket_node, kind='stable')
+    bucket_target, bucket_dist, bucket_total = bucket_target[order], bucket_dist[order], bucket_total[order]
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(bucket_node, minlength=n), out=offsets[1:])
+
+    for i, source in enumerate(sources):
+        nodes, dists, totals = hierarchy.upward_search(int(source), arc_values=arc_values)
+        # Indices of all bucket entries at the settled nodes, node by node
+        entry, counts = csr_ranges(offsets, nodes)
+        if len(entry) == 0:
+            continue
+        cand = np.repeat(dists, counts) + bucket_dist[entry]
+        target = bucket_target[entry]
+        # The first entry of each target after sorting by (target, distance) is its best one
+        by_target = np.lexsort((cand, target))
+        target = target[by_target]
+        best = by_target[np.r_[True, target[1:] != target[:-1]]]
+        primary[i, bucket_target[entry[best]]] = cand[best]
+        secondary[i, bucket_target[entry[best]]] = np.repeat(totals, counts)[best] + bucket_total[entry[best]]
+    return primary, secondary
+
+
+# Full origin x destination tables of road distance (meters) and travel time (minutes) over
+# the region graph. Routes minimize weight ('length' or 'travel_time_min') and the other table is
+# measured along those same routes. method='ch' uses bucket many-to-many on the region's
+# contraction hierarchy, method='dijkstra' repeated one-to-many searches (in parallel with
+# processes > 1). Unreachable pairs are inf.
+def distance_matrix(origins, destinations=None, perimeter=0.10, weight='length', method='ch', processes=None,
+                    data_file='testing_locations_4511.csv', mode='drive'):
+    if weight not in ('length', 'travel_time_min'):
+        raise ValueError("Unsupported weight")
+    other = 'travel_time_min' if weight == 'length' else 'length'
+    compact = load_region_compact_graph(perimeter, data_file, mode)
+    sources = snap_points(compact, origins)
+    targets = sources if destinations is None else snap_points(compact, destinations)
+
+    if method == 'ch':
+        hierarchy = load_region_hierarchy(perimeter, weight, data_file, mode)
+        primary, secondary = bucket_matrix(hierarchy, sources, targets, hierarchy.arc_totals(compact.weight(other)))
+    elif method == 'dijkstra':
+        primary, secondary = one_to_many_matrix(compact, sources, targets, weight, other, processes)
+    else:
+        raise ValueError("Unsupported method")
+    return (primary, secondary) if weight == 'length' else (secondary, primary)
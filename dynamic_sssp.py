@@ -0,0 +1,141 @@
+import heapq
+import math
+import networkx as nx
+import numpy as np
+from compact_graph import csr_ranges
+
+
+# Shortest-path tree from one origin that is repaired in place when edge weights change,
+# following Ramalingam and Reps. Only the nodes whose distance can actually change are
+# touched: the subtrees hanging below edges that got more expensive, and whatever an edge that
+# got cheaper now reaches faster. The tree is stored as the edge used to reach every node, so
+# the children of u are the heads of the out-edges e of u with pred[head] == e.
+class DynamicShortestPaths:
+    def __init__(self, compact, source, weight='length'):
+        self.graph = compact
+        self.source = source
+        self.weight = weight
+        self.weights = compact.weight(weight).copy()  # updates are applied to this copy
+        self.dist = np.full(compact.node_count, np.inf)
+        self.pred = np.full(compact.node_count, -1, dtype=np.int64)
+        self.dist[source] = 0.0
+        self.changed = 0
+        self._run([(0.0, source)])
+
+    # Dijkstra from a heap of (distance, node) entries whose distances are already set. With
+    # before given, the previous distance of every node it lowers is recorded there.
+    def _run(self, heap, before=None):
+        offsets = memoryview(self.graph.offsets)
+        heads = memoryview(self.graph.targets)
+        weights = memoryview(self.weights)
+        dist = memoryview(self.dist)
+        pred = memoryview(self.pred)
+        heapq.heapify(heap)
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for e in range(offsets[u], offsets[u + 1]):
+                v = heads[e]
+                nd = d + weights[e]
+                if nd < dist[v]:
+                    if before is not None and v not in before:
+                        before[v] = dist[v]
+                    dist[v] = nd
+                    pred[v] = e
+                    heapq.heappush(heap, (nd, v))
+
+    def _subtree(self, roots):
+        offsets = memoryview(self.graph.offsets)
+        heads = memoryview(self.graph.targets)
+        pred = memoryview(self.pred)
+        nodes = []
+        seen = set(roots)
+        stack = list(roots)
+        while stack:
+            u = stack.pop()
+            nodes.append(u)
+            for e in range(offsets[u], offsets[u + 1]):
+                v = heads[e]
+                if pred[v] == e and v not in seen:
+                    seen.add(v)
+                    stack.append(v)
+        return nodes
+
+    # Set new weights for a batch of edges (CompactGraph edge indices) and repair the tree.
+    # Returns the nodes whose distance changed.
+    def apply_traffic_updates(self, edges, new_weights):
+        edges = np.asarray(edges, dtype=np.int64)
+        new_weights = np.asarray(new_weights, dtype=np.float64)
+        if np.any(new_weights < 0):
+            raise ValueError("Negative edge weights are not supported")
+        graph = self.graph
+        heads = graph.targets
+        old_weights = self.weights[edges]
+        self.weights[edges] = new_weights
+
+        # Edges of the tree that got more expensive cut off their whole subtree: forget those
+        # distances and restart each node from its best neighbour outside the cut
+        raised = edges[(new_weights > old_weights) & (self.pred[heads[edges]] == edges)]
+        affected = self._subtree(np.unique(heads[raised]).tolist()) if len(raised) else []
+        before = {}
+        heap = []
+        if affected:
+            affected = np.array(affected, dtype=np.int64)
+            before.update(zip(affected.tolist(), self.dist[affected].tolist()))
+            self.dist[affected] = np.inf
+            self.pred[affected] = -1
+            reverse = graph.reverse()
+            positions, counts = csr_ranges(reverse.offsets, affected)
+            in_edges = reverse.edge_ids[positions]
+            owner = np.repeat(affected, counts)
+            cand = self.dist[graph.sources[in_edges]] + self.weights[in_edges]
+            # Cheapest way in for every affected node: the first entry per node after sorting by
+            # (node, cost), kept if it comes from outside the cut
+            order = np.lexsort((cand, owner))
+            first = order[np.r_[True, owner[order][1:] != owner[order][:-1]]] if len(order) else order
+            first = first[np.isfinite(cand[first])]
+            self.dist[owner[first]] = cand[first]
+            self.pred[owner[first]] = in_edges[first]
+            heap.extend(zip(cand[first].tolist(), owner[first].tolist()))
+
+        # Edges that got cheaper may give their head a shorter distance
+        sources = graph.sources[edges]
+        cand = self.dist[sources] + new_weights
+        for e, v, d in zip(edges.tolist(), heads[edges].tolist(), cand.tolist()):
+            if d < self.dist[v]:
+                before.setdefault(v, float(self.dist[v]))
+                self.dist[v] = d
+                self.pred[v] = e
+                heap.append((d, v))
+
+        # Propagate, recording the previous distance of every node the repair reaches
+        self._run(heap, before)
+        changed = np.array([v for v, d in before.items() if d != self.dist[v]], dtype=np.int64)
+        self.changed = len(changed)
+        return changed
+
+    def path_to(self, target):
+        if self.dist[target] == math.inf:
+            raise nx.NetworkXNoPath(f"No path to {self.graph.node_ids[target]}.")
+        sources = self.graph.sources
+        path = [int(target)]
+        e = self.pred[target]
+        while e >= 0:
+            u = int(sources[e])
+            path.append(u)
+            e = self.pred[u]
+        path.reverse()
+        return path
+
+    # OSM node route from the origin to target_node
+    def route(self, target_node):
+        return self.graph.to_osm(self.path_to(self.graph.index_of(target_node)))
+
+
+# CompactGraph edge indices and current weights of road graph edges given as (u, v, key), for
+# updates made on the road graph itself
+def traffic_updates(compact, roadgraph, changed_edges, weight):
+    edges = [compact.edge_index(u, v, k) for u, v, k in changed_edges]
+    new_weights = [roadgraph[u][v][k].get(weight, 1.0) for u, v, k in changed_edges]
+    return edges, new_weights
@@ -5,7 +5,10 @@ import osmnx as ox
 import pandas as pd
 import geopandas
 import random 
-import math 
+from region_graph import load_region_graph, load_region_compact_graph, load_region_snapper
+from heuristics import make_heuristic
+from alternatives import alternative_routes
+from route_metrics import route_metrics
 
 
 
@@ -15,75 +18,18 @@ df = pd.read_csv('testing_locations_4511.csv')
 df.columns = df.columns.str.strip()
 
 
-def euclidean_distance(u, v, graph):
-    u_x, u_y = graph.nodes[u]['x'], graph.nodes[u]['y']
-    v_x, v_y = graph.nodes[v]['x'], graph.nodes[v]['y']
-    return math.sqrt((u_x - v_x) ** 2 + (u_y - v_y) ** 2)
-
-# Global dictionary to store edge usage counts
-edge_usage_count = {}
-
-def penalized_euclidean_distance(u, v, graph):
-    base_distance = euclidean_distance(u, v, graph)
-    edge_key = tuple(sorted([u, v]))  # Create a sortable key for the edge regardless of direction
-    penalty = edge_usage_count.get(edge_key, 0) * 0.5 * base_distance  # Apply a penalty based on usage
-    return base_distance + penalty
-
-def update_edge_usage(route):
-    for u, v in zip(route[:-1], route[1:]):
-        edge_key = tuple(sorted([u, v]))
-        if edge_key in edge_usage_count:
-            edge_usage_count[edge_key] += 1
-        else:
-            edge_usage_count[edge_key] = 1
-
-
-def generate_path(origin_point, target_point, perimeter, mode='drive'):
-    ox.config(log_console=True, use_cache=True)
-    north = max(origin_point[0], target_point[0]) + perimeter
-    south = min(origin_point[0], target_point[0]) - perimeter
-    east = max(origin_point[1], target_point[1]) + perimeter
-    west = min(origin_point[1], target_point[1]) - perimeter
-    mode = 'drive'
-    roadgraph = ox.graph_from_bbox(north, south, east, west, network_type=mode, simplify=True)
-    origin_node = ox.nearest_nodes(roadgraph, origin_point[1], origin_point[0])
-    target_node = ox.nearest_nodes(roadgraph, target_point[1], target_point[0])
-    route = nx.astar_path(roadgraph, origin_node, target_node,heuristic=lambda u, v: euclidean_distance(u, v, roadgraph))
-    route = nx.astar_path(roadgraph, origin_node, target_node,heuristic=lambda u, v: penalized_euclidean_distance(u, v, roadgraph))
-
-    long = [roadgraph.nodes[n]['x'] for n in route]
-    lat = [roadgraph.nodes[n]['y'] for n in route]
-    
-    # Calculate total distance in meters
-    route_gdf = ox.routing.route_to_gdf(roadgraph, route)
-    total_distance_m = route_gdf['length'].sum()
-
-    # Clean and process speed data
-    def clean_speed(speed):
-        if isinstance(speed, str):
-            if 'mph' in speed:
-                return float(speed.split(' ')[0])  # Assuming format is 'XX mph'
-            elif 'kph' in speed:
-                return float(speed.split(' ')[0]) / 1.60934  # Convert km/h to mph
-        return None
-
-    speeds = route_gdf['maxspeed'].apply(clean_speed).dropna()
-    if not speeds.empty:
-        weighted_speeds = route_gdf[route_gdf['maxspeed'].notnull()]['length'] * speeds
-        average_speed_mph = weighted_speeds.sum() / route_gdf[route_gdf['maxspeed'].notnull()]['length'].sum()
-    else:
-        average_speed_mph = 30  # Fallback speed in mph if no valid speed data is available
-
-    # Convert distance to miles
-    total_distance_mi = total_distance_m / 1609.34  # meters to miles
-    
-    # Calculate travel time in hours
-    travel_time_h = total_distance_mi / average_speed_mph
-    
-    # Convert travel time to minutes
-    travel_time_min = travel_time_h * 60
-    
-    return long, lat, total_distance_mi, travel_time_min, average_speed_mph
+# Shortest route plus up to k - 1 alternatives from the plateau method. Returns the
+# coordinates and metrics of every route, the A* route first.
+def generate_path(origin_point, target_point, perimeter, mode='drive', k=3):
+    roadgraph = load_region_graph(perimeter)
+    compact = load_region_compact_graph(perimeter)
+    origin_node, target_node = load_region_snapper(perimeter).nearest_nodes([origin_point, target_point])
+    # Straight-line distance in meters, the same units as the length weights
+    euclidean_distance = make_heuristic(compact, 'length').networkx_heuristic()
+    route = nx.astar_path(roadgraph, origin_node, target_node, weight='length', heuristic=euclidean_distance)
+    alternatives = alternative_routes(compact, origin_node, target_node, k, weight='length', method='plateau')
+    routes = [route] + [r for r in alternatives if r != route][:k - 1]
+    return [route_metrics(compact, r) for r in routes]
 
 def plot_map(origin_point, target_points, long, lat, total_distance, total_travel_time, average_speed):
     fig = go.Figure(go.Scattermapbox(
@@ -150,12 +96,15 @@ for target_point in target_points[1:]:
     perimeter = 0.10
     # Generate the road graph
     
-    lng, lati, distance, travel_time, speed = generate_path(origin_point, target_point, perimeter)
+    routes = generate_path(origin_point, target_point, perimeter)
+    lng, lati, distance, travel_time, speed = routes[0]
     
     # Print the metrics for each route
     print("Route Distance (miles):", distance)
     print("Route Travel Time (minutes):", travel_time)
     print("Route Average Speed (mph):", speed)
+    for alt_distance, alt_travel_time in [(r[2], r[3]) for r in routes[1:]]:
+        print("Alternative Route Distance (miles):", alt_distance, "Travel Time (minutes):", alt_travel_time)
 
-    # Plot the map for each route
-    plot_map(origin_point, [target_point], [lng], [lati], distance, travel_time, speed)
+    # Plot the map for each route, alternatives included
+    plot_map(origin_point, [target_point], [r[0] for r in routes], [r[1] for r in routes], distance, travel_time, speed)
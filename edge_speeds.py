@@ -0,0 +1,77 @@
+import math
+import re
+import numpy as np
+from weight_profiles import highway_codes
+
+METERS_PER_MILE = 1609.34
+KPH_PER_MPH = 1.60934
+DEFAULT_SPEED_MPH = 30  # Fallback speed in mph if no valid speed data is available
+
+# A posted speed: a number with an optional unit, km/h when there is none as in OSM
+_SPEED = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*(mph|km/h|kmh|kph)?\s*$')
+
+
+# Posted speed in mph of one maxspeed value, nan where it is missing or not a number ('none',
+# 'signals', 'walk', ...). Lists and 'a;b' values give the mean of the speeds that parse.
+def parse_maxspeed(value):
+    if isinstance(value, (list, tuple)) or (isinstance(value, str) and ';' in value):
+        parts = value if isinstance(value, (list, tuple)) else value.split(';')
+        speeds = [speed for speed in map(parse_maxspeed, parts) if not math.isnan(speed)]
+        return sum(speeds) / len(speeds) if speeds else math.nan
+    if isinstance(value, (int, float)):
+        return float(value) / KPH_PER_MPH if value > 0 else math.nan
+    if not isinstance(value, str):
+        return math.nan
+    match = _SPEED.match(value.lower())
+    if match is None:
+        return math.nan
+    speed = float(match.group(1))
+    if speed <= 0:
+        return math.nan
+    return speed if match.group(2) == 'mph' else speed / KPH_PER_MPH
+
+
+# Posted speed of every edge in CSR edge order, nan where the edge has none. Each distinct
+# maxspeed value is parsed once, a region graph only has a few dozen of them.
+def posted_speeds(compact, roadgraph):
+    parsed = {}
+    speeds = np.empty(compact.edge_count, dtype=np.float64)
+    for e, value in enumerate(compact.edge_values(roadgraph, 'maxspeed')):
+        key = tuple(value) if isinstance(value, list) else value
+        if key not in parsed:
+            parsed[key] = parse_maxspeed(value)
+        speeds[e] = parsed[key]
+    return speeds
+
+
+# Fill the missing speeds with the mean posted speed of the edge's highway type. A combination
+# of road types with no posted speeds of its own takes the mean over its road types, and a type
+# without any posted speed on the whole graph the default.
+def impute_speeds(compact, roadgraph, speeds, default=DEFAULT_SPEED_MPH):
+    codes, categories = highway_codes(compact, roadgraph)
+    known = ~np.isnan(speeds)
+    counts = np.bincount(codes[known], minlength=len(categories))
+    totals = np.bincount(codes[known], weights=speeds[known], minlength=len(categories))
+    means = np.divide(totals, counts, out=np.full(len(categories), np.nan), where=counts > 0)
+    by_type = {category: mean for category, mean in zip(categories, means.tolist()) if not math.isnan(mean)}
+    for c, category in enumerate(categories):
+        if math.isnan(means[c]):
+            members = [by_type[road_type] for road_type in category if road_type in by_type] \
+                if isinstance(category, tuple) else []
+            means[c] = sum(members) / len(members) if members else default
+    return np.where(known, speeds, means[codes])
+
+
+# Speed (mph) and travel time (minutes) of every edge as the 'speed_mph' and 'travel_time_min'
+# weight profiles of the compact graph. With store=True both are written onto the road graph
+# edges too, so networkx can route on travel_time_min like on length. The minutes get a name of
+# their own: osmnx's 'travel_time' edge attribute (ox.add_edge_travel_times) is in seconds.
+def add_speed_weights(compact, roadgraph, default=DEFAULT_SPEED_MPH, store=True):
+    speeds = impute_speeds(compact, roadgraph, posted_speeds(compact, roadgraph), default)
+    lengths = compact.weights['length'] if 'length' in compact.weights else compact.load_weight(roadgraph, 'length', 0.0)
+    compact.add_weight('speed_mph', speeds)
+    compact.add_weight('travel_time_min', lengths / METERS_PER_MILE / speeds * 60)
+    if store:
+        compact.store_weight(roadgraph, 'speed_mph')
+        compact.store_weight(roadgraph, 'travel_time_min')
+    return compact.weights['travel_time_min']
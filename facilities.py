@@ -0,0 +1,67 @@
+import numpy as np
+from dijkstra_engine import DijkstraEngine
+from distance_matrix import snap_points
+from region_graph import load_region_compact_graph
+from snapping import get_snapper
+
+
+# Network Voronoi partition of a road graph: every node labelled with its nearest facility and
+# the cost between the two. Point queries are one snap plus an array lookup.
+class FacilityPartition:
+    def __init__(self, facilities, owner, cost, snap=None):
+        self.facilities = facilities  # compact node index of every facility
+        self.owner = owner  # facility index of every node, -1 where no facility is reachable
+        self.cost = cost  # cost between every node and its facility, inf where unreachable
+        self.snap = snap  # (lats, lons) -> compact node indices, used by assign
+
+    def assign_nodes(self, nodes):
+        nodes = np.asarray(nodes, dtype=np.int64)
+        return self.owner[nodes], self.cost[nodes]
+
+    # Nearest facility index and cost for arrays of (lat, lon) points
+    def assign(self, lats, lons):
+        if self.snap is None:
+            raise ValueError("No snapping function, use assign_nodes")
+        return self.assign_nodes(self.snap(np.atleast_1d(lats), np.atleast_1d(lons)))
+
+
+# One Dijkstra seeded at all facilities at once. direction='from' measures facility -> node
+# (deliveries out of a depot), direction='to' node -> facility, by searching the reversed graph.
+# Which facility a node belongs to is read off the shortest-path forest afterwards: every node
+# takes the owner of its parent, resolved for all nodes together by pointer jumping.
+def facility_partition(compact, facilities, weight='travel_time_min', direction='from', snap=None):
+    if direction == 'from':
+        graph = compact
+    elif direction == 'to':
+        graph = compact.reverse()
+    else:
+        raise ValueError("Unsupported direction")
+    facilities = np.asarray(facilities, dtype=np.int64)
+    engine = DijkstraEngine(compact)
+    dist = engine.search([(int(f), 0.0) for f in facilities], weight=weight, graph=graph).copy()
+    pred = engine.pred
+
+    n = compact.node_count
+    parent = np.full(n, -1, dtype=np.int64)
+    reached = np.flatnonzero(pred >= 0)
+    parent[reached] = graph.sources[pred[reached]]
+    owner = np.full(n, -1, dtype=np.int64)
+    # A node shared by several facilities belongs to the first of them
+    owner[facilities[::-1]] = np.arange(len(facilities))[::-1]
+    active = reached
+    while len(active):
+        up = parent[active]
+        settled = owner[up] >= 0
+        owner[active[settled]] = owner[up[settled]]
+        active = active[~settled]
+        parent[active] = parent[parent[active]]
+    return FacilityPartition(facilities, owner, dist, snap)
+
+
+# Nearest-facility partition of the region graph for facilities given as (lat, lon) points,
+# by drive time in minutes unless another weight is given
+def region_facility_partition(facility_points, perimeter=0.10, weight='travel_time_min', direction='from',
+                              data_file='testing_locations_4511.csv', mode='drive'):
+    compact = load_region_compact_graph(perimeter, data_file, mode)
+    snapper = get_snapper(compact)
+    return facility_partition(compact, snap_points(compact, facility_points), weight, direction, snapper.snap)
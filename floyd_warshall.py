@@ -0,0 +1,165 @@
+import networkx as nx
+import numpy as np
+from distance_matrix import snap_points
+from region_graph import load_locations, load_region_compact_graph
+
+# Rows per tile and pivots per round of the blocked kernel. A 64-row tile of a few thousand
+# columns stays in cache while all pivots of a block are applied to it.
+BLOCK_SIZE = 64
+
+
+# All-pairs shortest paths on a dense (n, n) cost matrix, in place. Pivots are taken a block at
+# a time: the pivot rows are closed first (diagonal and row phases), then every other tile of
+# rows is relaxed against the whole block while it is hot in cache. Each pivot is one NumPy
+# min-plus update of a tile into a reused buffer, so the kernel allocates nothing per pivot
+# and runs without a Python loop over matrix entries.
+def blocked_floyd_warshall(dist, block=BLOCK_SIZE):
+    n = len(dist)
+    buffer = np.empty((min(block, n), n), dtype=dist.dtype)
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        # The pivot rows go first, the other tiles then read the closed pivot rows
+        for row in [start] + [row for row in range(0, n, block) if row != start]:
+            tile = dist[row:row + block]
+            candidate = buffer[:len(tile)]
+            for k in range(start, stop):
+                np.add(tile[:, k, None], dist[k], out=candidate)
+                np.minimum(tile, candidate, out=tile)
+    if n and np.diagonal(dist).min() < 0:
+        raise nx.NetworkXUnbounded("Negative cycle detected.")
+    return dist
+
+
+# Reduced graphs beyond this many nodes are refused: the dense matrix takes n^2 floats and the
+# kernel n^3 steps, about ten seconds at this size
+MAX_REDUCED_NODES = 3000
+
+
+# Road graph reduced around a set of points of interest without changing any POI-to-POI cost,
+# whatever the weight profile: dead ends that lead to no POI are dropped, and chains of nodes
+# with exactly two neighbours become single edges. Each reduced edge stands for a chain of road
+# edges, kept as flat edge ids with offsets so any weight profile can be summed onto it.
+class PoiSubgraph:
+    def __init__(self, nodes, pois, edge_source, edge_target, chain_edges, chain_offsets):
+        self.nodes = nodes  # compact node index of every reduced node
+        self.pois = pois  # reduced node of every POI, in the order they were given
+        self.edge_source = edge_source
+        self.edge_target = edge_target
+        self.chain_edges = chain_edges
+        self.chain_offsets = chain_offsets
+
+    @property
+    def node_count(self):
+        return len(self.nodes)
+
+    # Dense cost matrix of the reduced graph under a weight profile, parallel chains
+    # collapsed to the cheapest
+    def cost_matrix(self, compact, weight='length'):
+        k = self.node_count
+        dist = np.full((k, k), np.inf)
+        if len(self.chain_edges):
+            costs = np.add.reduceat(compact.weight(weight)[self.chain_edges], self.chain_offsets[:-1])
+            np.minimum.at(dist, (self.edge_source, self.edge_target), costs)
+        np.fill_diagonal(dist, np.minimum(np.diagonal(dist), 0.0))
+        return dist
+
+    # All-pairs costs between every reduced node, exact for every weight profile since the
+    # reduction keeps every route between them
+    def all_pairs(self, compact, weight='length', block=BLOCK_SIZE):
+        return blocked_floyd_warshall(self.cost_matrix(compact, weight), block)
+
+    def poi_matrix(self, compact, weight='length', block=BLOCK_SIZE):
+        return self.all_pairs(compact, weight, block)[np.ix_(self.pois, self.pois)]
+
+
+# Reduce the graph around the POIs from its topology alone, with no search. Only what connects
+# to a POI is kept, then dead ends are peeled off (a route into a non-POI node with a single
+# neighbour has to come back the same way, so it is never part of a shortest route). Of what is
+# left, the POIs, junctions and nodes with parallel out-edges stay; chains of nodes with exactly
+# two neighbours (in either direction, so two-way streets contract too) become one edge per
+# direction. Raises ValueError when the result is too large for the dense kernel.
+def build_poi_subgraph(compact, pois, max_nodes=MAX_REDUCED_NODES):
+    pois = np.asarray(pois, dtype=np.int64)
+    n = compact.node_count
+    sources = compact.sources.astype(np.int64)
+    heads = compact.targets.astype(np.int64)
+    loops = sources == heads
+    pairs = np.unique(np.minimum(sources, heads)[~loops] * n + np.maximum(sources, heads)[~loops])
+    neighbors = [set() for _ in range(n)]
+    for a, b in zip((pairs // n).tolist(), (pairs % n).tolist()):
+        neighbors[a].add(b)
+        neighbors[b].add(a)
+
+    # Nodes connected to a POI, ignoring edge directions
+    alive = np.zeros(n, dtype=bool)
+    alive[pois] = True
+    stack = pois.tolist()
+    while stack:
+        for b in neighbors[stack.pop()]:
+            if not alive[b]:
+                alive[b] = True
+                stack.append(b)
+    is_poi = np.zeros(n, dtype=bool)
+    is_poi[pois] = True
+    degree = [len(neighbors[a]) for a in range(n)]
+    stack = [a for a in np.flatnonzero(alive & ~is_poi).tolist() if degree[a] <= 1]
+    while stack:
+        a = stack.pop()
+        alive[a] = False
+        for b in neighbors[a]:
+            if alive[b]:
+                degree[b] -= 1
+                if degree[b] == 1 and not is_poi[b]:
+                    stack.append(b)
+
+    edges = np.flatnonzero(alive[sources] & alive[heads] & ~loops)  # sorted by source, like the CSR edges
+    u, v = sources[edges], heads[edges]
+    degree = np.array(degree)
+    hops, counts = np.unique(u * n + v, return_counts=True)
+    parallel = np.zeros(n, dtype=bool)
+    parallel[hops[counts > 1] // n] = True
+    key = alive & ((degree != 2) | is_poi | parallel)
+    nodes = np.flatnonzero(key)
+    if len(nodes) > max_nodes:
+        raise ValueError(f"The reduced graph has {len(nodes)} nodes, more than the {max_nodes} the dense "
+                         "kernel takes; use distance_matrix instead")
+    position = np.full(n, -1, dtype=np.int64)
+    position[nodes] = np.arange(len(nodes))
+    out_start = np.searchsorted(u, np.arange(n + 1)).tolist()
+    key_list = key.tolist()
+    u_list, v_list, edge_list = u.tolist(), v.tolist(), edges.tolist()
+
+    edge_source, edge_target, chain_edges, chain_offsets = [], [], [], [0]
+    for i in np.flatnonzero(key[u]).tolist():
+        chain = [edge_list[i]]
+        prev, node = u_list[i], v_list[i]
+        while not key_list[node]:
+            # A chain node has two neighbours, carry on towards the one we did not come from
+            step = next((j for j in range(out_start[node], out_start[node + 1]) if v_list[j] != prev), None)
+            if step is None:
+                chain = None
+                break
+            chain.append(edge_list[step])
+            prev, node = node, v_list[step]
+        if chain is None:
+            continue
+        chain_edges.extend(chain)
+        chain_offsets.append(len(chain_edges))
+        edge_source.append(position[u_list[i]])
+        edge_target.append(position[node])
+
+    return PoiSubgraph(nodes, position[pois], np.array(edge_source, dtype=np.int64),
+                       np.array(edge_target, dtype=np.int64), np.array(chain_edges, dtype=np.int64),
+                       np.array(chain_offsets, dtype=np.int64))
+
+
+# All-pairs costs between the locations in the data file, in file order. The reduced graph only
+# depends on the topology, so keep the subgraph from build_poi_subgraph and call poi_matrix on it
+# to price several weight profiles.
+def poi_distance_matrix(perimeter=0.10, weight='length', data_file='testing_locations_4511.csv', mode='drive',
+                        block=BLOCK_SIZE, max_nodes=MAX_REDUCED_NODES):
+    compact = load_region_compact_graph(perimeter, data_file, mode)
+    df = load_locations(data_file)
+    pois = snap_points(compact, list(zip(df['Latitude'], df['Longitude'])))
+    subgraph = build_poi_subgraph(compact, pois, max_nodes)
+    return subgraph.poi_matrix(compact, weight, block)
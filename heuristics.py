@@ -0,0 +1,96 @@
+from abc import ABC, abstractmethod
+import numpy as np
+
+# Same mean earth radius osmnx uses for edge lengths, so great-circle distances between two
+# nodes never exceed the length of a road joining them
+EARTH_RADIUS_M = 6371009
+
+
+# Base for heuristics that can bound the remaining cost of every node at once.
+# Subclasses provide bounds_to(target) and bounds_from(source) as arrays over node indices.
+# Calls for the current target (or, after prepare(), from the current source) are plain
+# list lookups, so A* pays one vectorized pass per query instead of work per node.
+class BoundHeuristic(ABC):
+    def __init__(self, compact):
+        self.graph = compact
+        self._target = None
+        self._to_target = None
+        self._source = None
+        self._from_source = None
+        self._index = None
+
+    @abstractmethod
+    def bounds_to(self, target):
+        # Lower bound on d(v, target) for every node v
+        ...
+
+    @abstractmethod
+    def bounds_from(self, source):
+        # Lower bound on d(source, v) for every node v
+        ...
+
+    # heuristic(u, v) on node indices, a lower bound on the cost from u to v
+    def __call__(self, u, v):
+        if v == self._target:
+            return self._to_target[u]
+        if u == self._source:
+            return self._from_source[v]
+        self._target = v
+        self._to_target = self.bounds_to(v).tolist()
+        return self._to_target[u]
+
+    # Bidirectional search also asks for bounds from the source, cache both ends up front
+    def prepare(self, source, target):
+        self._source = source
+        self._from_source = self.bounds_from(source).tolist()
+        self._target = target
+        self._to_target = self.bounds_to(target).tolist()
+
+    # Heuristic on OSM node ids for nx.astar_path(roadgraph, ..., heuristic=...)
+    def networkx_heuristic(self):
+        if self._index is None:
+            self._index = {osm_id: i for i, osm_id in enumerate(self.graph.node_ids.tolist())}
+        index = self._index
+        return lambda u, v: self(index[u], index[v])
+
+
+def great_circle_distances(lat, lon, lat0, lon0):
+    # Haversine distance in meters from one point to arrays of points, all in radians
+    a = np.sin((lat - lat0) / 2) ** 2 + np.cos(lat) * np.cos(lat0) * np.sin((lon - lon0) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+# Cheapest cost per meter of road under a weight profile. Multiplying a great-circle
+# distance by it gives a bound in the profile's own units (meters, type multipliers,
+# traffic factors), so the heuristic stays admissible whatever the weight means.
+def min_cost_per_meter(compact, weight, length='length'):
+    weights = compact.weight(weight)
+    lengths = compact.weight(length)
+    roads = lengths > 0
+    if not roads.any():
+        return 0.0
+    return max(float(np.min(weights[roads] / lengths[roads])), 0.0)
+
+
+# Great-circle meters times the profile's minimum cost per meter, with node coordinates
+# kept as radian arrays so the bound for every node is one NumPy expression. A known scale
+# (cost per meter) can be passed instead of a weight profile.
+class GeodesicHeuristic(BoundHeuristic):
+    def __init__(self, compact, weight='length', length='length', scale=None):
+        super().__init__(compact)
+        self.weight = weight
+        self.scale = scale if scale is not None else min_cost_per_meter(compact, weight, length)
+        self.lat = np.radians(compact.y)
+        self.lon = np.radians(compact.x)
+
+    def bounds_to(self, target):
+        return self.scale * great_circle_distances(self.lat, self.lon, self.lat[target], self.lon[target])
+
+    def bounds_from(self, source):
+        return self.bounds_to(source)
+
+
+def make_heuristic(compact, weight='length', length='length'):
+    if length not in compact.weights:
+        raise ValueError(f"The geodesic heuristic needs the '{length}' edge weights")
+    return GeodesicHeuristic(compact, weight, length)
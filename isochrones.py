@@ -0,0 +1,47 @@
+import numpy as np
+import shapely
+from dijkstra_engine import DijkstraEngine
+from region_graph import load_region_compact_graph
+from snapping import get_snapper
+
+DEFAULT_BANDS = (15, 30, 45)  # minutes
+
+
+# Travel time from the sources (compact node indices) to every node reachable within limit, by
+# one Dijkstra that stops at the limit. Returns the reached nodes and their times, nearest first.
+def reachable_nodes(compact, sources, limit, weight='travel_time_min'):
+    engine = DijkstraEngine(compact)
+    dist = engine.search([(int(source), 0.0) for source in np.atleast_1d(sources)], weight=weight, limit=limit)
+    nodes = np.flatnonzero(dist <= limit)
+    nodes = nodes[np.argsort(dist[nodes], kind='stable')]
+    return nodes, dist[nodes]
+
+
+# Nodes reachable within each time band, all bands from one search bounded by the largest. Every
+# band is a prefix of the nodes sorted by travel time, so it is cut with a single searchsorted.
+def isochrones(compact, sources, bands=DEFAULT_BANDS, weight='travel_time_min'):
+    bands = sorted(bands)
+    nodes, times = reachable_nodes(compact, sources, bands[-1], weight)
+    cuts = np.searchsorted(times, bands, side='right')
+    return {band: nodes[:cut] for band, cut in zip(bands, cuts)}
+
+
+# Polygon around the nodes of a band in lon/lat: the convex hull, or with concavity between 0
+# and 1 a concave hull that follows the reached roads more closely (smaller is tighter)
+def isochrone_polygon(compact, nodes, concavity=None):
+    points = shapely.multipoints(np.column_stack([compact.x[nodes], compact.y[nodes]]))
+    if concavity is None:
+        return shapely.convex_hull(points)
+    return shapely.concave_hull(points, ratio=concavity)
+
+
+# Service areas around a (lat, lon) point over the region graph: the OSM ids of the nodes
+# reachable within each band (minutes of travel time at the posted speeds) and a polygon per band
+def service_areas(origin_point, perimeter=0.10, bands=DEFAULT_BANDS, concavity=None,
+                  data_file='testing_locations_4511.csv', mode='drive'):
+    compact = load_region_compact_graph(perimeter, data_file, mode)
+    source = get_snapper(compact).snap(origin_point[0], origin_point[1])[0]
+    areas = isochrones(compact, source, bands)
+    reachable = {band: compact.to_osm(nodes) for band, nodes in areas.items()}
+    polygons = {band: isochrone_polygon(compact, nodes, concavity) for band, nodes in areas.items()}
+    return reachable, polygons
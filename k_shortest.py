@@ -0,0 +1,131 @@
+import heapq
+import math
+import networkx as nx
+from dijkstra_engine import DijkstraEngine
+
+
+# Shortest spur from spur to target that avoids the nodes in blocked and does not step from
+# spur to any node in banned. Searched with A* on the exact unrestricted distances to target
+# (dist_b), which stay a consistent lower bound when nodes and edges are taken away. Returns the
+# node path or None.
+def _spur_search(compact, weights, dist_b, spur, target, blocked, banned):
+    offsets = memoryview(compact.offsets)
+    heads = memoryview(compact.targets)
+    weight_view = memoryview(weights)
+    bound = memoryview(dist_b)
+    dist = {spur: 0.0}
+    parent = {spur: -1}
+    done = set()
+    heap = [(bound[spur], 0.0, spur)]
+    while heap:
+        _, d, u = heapq.heappop(heap)
+        if u in done:
+            continue
+        done.add(u)
+        if u == target:
+            path = [u]
+            while parent[u] >= 0:
+                u = parent[u]
+                path.append(u)
+            path.reverse()
+            return path
+        for e in range(offsets[u], offsets[u + 1]):
+            v = heads[e]
+            if v in blocked or v in done or bound[v] == math.inf or (u == spur and v in banned):
+                continue
+            nd = d + weight_view[e]
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                parent[v] = u
+                heapq.heappush(heap, (nd + bound[v], nd, v))
+    return None
+
+
+# Exact k shortest loopless paths (Yen's algorithm) between two compact node indices, as a list
+# of (cost, node path) in increasing cost. Two things keep it far cheaper than starting every
+# spur search from scratch:
+#  - one reverse shortest-path tree from target gives the exact distance to target of every
+#    node. A spur whose tree path to target avoids the root and the banned first hops is taken
+#    straight from the tree, every other spur is an A* search guided by those distances.
+#  - candidates are generated lazily. Each spur node is queued with the lower bound root cost
+#    + distance to target, and its spur path is only computed when that bound reaches the top
+#    of the queue; it is then queued again with its real cost. Most spur nodes of long routes
+#    never get that far.
+def k_shortest_paths(compact, source, target, k=3, weight='length'):
+    weights = compact.weight(weight)
+    reverse = compact.reverse()
+    engine = DijkstraEngine(compact)
+    engine.search([(target, 0.0)], weight=weight, graph=reverse)
+    dist_b = engine.dist.copy()
+    next_edge = engine.pred.copy()  # reverse edge reaching each node, its tail is the next node
+    if dist_b[source] == math.inf:
+        raise nx.NetworkXNoPath(f"No path between {compact.node_ids[source]} and {compact.node_ids[target]}.")
+
+    def tree_path(node):
+        path = [node]
+        while node != target:
+            node = int(reverse.sources[next_edge[node]])
+            path.append(node)
+        return path
+
+    def hop(u, v):
+        return float(weights[compact.edges_between(u, v)].min())
+
+    found = []
+    seen = set()
+    queue = []  # (cost or bound, tie breaker, path index, spur position, resolved path)
+    counter = 0
+
+    def push_spurs(path):
+        nonlocal counter
+        root_cost = 0.0
+        for i, node in enumerate(path[:-1]):
+            heapq.heappush(queue, (root_cost + dist_b[node], counter, len(found) - 1, i, None))
+            counter += 1
+            root_cost += hop(node, path[i + 1])
+
+    first = tree_path(source)
+    found.append((float(dist_b[source]), first))
+    seen.add(tuple(first))
+    push_spurs(first)
+
+    while queue and len(found) < k:
+        cost, _, index, i, path = heapq.heappop(queue)
+        if path is not None:
+            if tuple(path) in seen:
+                continue
+            seen.add(tuple(path))
+            found.append((cost, path))
+            push_spurs(path)
+            continue
+
+        # Resolve the spur at position i of found path index
+        base = found[index][1]
+        root = base[:i + 1]
+        spur = root[-1]
+        banned = {p[i + 1] for _, p in found if len(p) > i + 1 and p[:i + 1] == root}
+        blocked = set(root[:-1])
+        direct = tree_path(spur)
+        if direct[1] not in banned and not blocked.intersection(direct):
+            spur_path = direct
+        else:
+            spur_path = _spur_search(compact, weights, dist_b, spur, target, blocked, banned)
+        if spur_path is None:
+            continue
+        path = root[:-1] + spur_path
+        if tuple(path) in seen:
+            continue
+        root_cost = sum(hop(u, v) for u, v in zip(root[:-1], root[1:]))
+        spur_cost = sum(hop(u, v) for u, v in zip(spur_path[:-1], spur_path[1:]))
+        heapq.heappush(queue, (root_cost + spur_cost, counter, index, i, path))
+        counter += 1
+    return found
+
+
+# k shortest loopless routes between two OSM nodes, as OSM node lists in increasing cost
+def k_shortest_routes(compact, origin_node, target_node, k=3, weight='length'):
+    source = compact.index_of(origin_node)
+    target = compact.index_of(target_node)
+    if source == target:
+        return [[origin_node]]
+    return [compact.to_osm(path) for _, path in k_shortest_paths(compact, source, target, k, weight)]
@@ -0,0 +1,56 @@
+import numpy as np
+from dijkstra_engine import DijkstraEngine
+from heuristics import BoundHeuristic
+
+
+# Pick landmarks by farthest selection: each new landmark is the reachable node whose
+# distance to the closest landmark chosen so far is largest, which spreads them over the
+# edge of the region where they give the tightest bounds
+def select_landmarks(compact, count=16, weight='length', start=0):
+    engine = DijkstraEngine(compact)
+    dist = engine.search([(start, 0.0)], weight=weight)
+    reachable = np.isfinite(dist)
+    closest = np.where(reachable, dist, -np.inf)
+    landmarks = []
+    for _ in range(min(count, int(reachable.sum()))):
+        landmark = int(np.argmax(closest))
+        landmarks.append(landmark)
+        dist = engine.search([(landmark, 0.0)], weight=weight)
+        closest = np.minimum(closest, np.where(np.isfinite(dist), dist, np.inf))
+        closest[landmark] = -np.inf
+    return landmarks
+
+
+# ALT lower bounds (A*, Landmarks, Triangle inequality). For every landmark L the
+# distances d(L, v) and d(v, L) are stored per weight profile, and by the triangle
+# inequality d(u, t) >= max(d(L, t) - d(L, u), d(u, L) - d(t, L)). The bound is consistent,
+# so it works both for nx.astar_path and for DijkstraEngine.astar / bidirectional.
+class LandmarkHeuristic(BoundHeuristic):
+    def __init__(self, compact, landmarks=None, weight='length', count=16):
+        super().__init__(compact)
+        self.weight = weight
+        self.landmarks = landmarks if landmarks is not None else select_landmarks(compact, count, weight)
+        forward = DijkstraEngine(compact)
+        backward = DijkstraEngine(compact.reverse())
+        k, n = len(self.landmarks), compact.node_count
+        self.from_landmark = np.empty((k, n))
+        self.to_landmark = np.empty((k, n))
+        for i, landmark in enumerate(self.landmarks):
+            self.from_landmark[i] = forward.search([(landmark, 0.0)], weight=weight)
+            self.to_landmark[i] = backward.search([(landmark, 0.0)], weight=weight)
+
+    def bounds_to(self, target):
+        # Lower bound on d(v, target) for every node v, in one vectorized pass
+        with np.errstate(invalid='ignore'):
+            forward = self.from_landmark[:, [target]] - self.from_landmark
+            backward = self.to_landmark - self.to_landmark[:, [target]]
+            bound = np.fmax.reduce(np.fmax(forward, backward), axis=0)
+        return np.nan_to_num(np.maximum(bound, 0.0), nan=0.0, posinf=np.inf)
+
+    def bounds_from(self, source):
+        # Lower bound on d(source, v) for every node v
+        with np.errstate(invalid='ignore'):
+            forward = self.from_landmark - self.from_landmark[:, [source]]
+            backward = self.to_landmark[:, [source]] - self.to_landmark
+            bound = np.fmax.reduce(np.fmax(forward, backward), axis=0)
+        return np.nan_to_num(np.maximum(bound, 0.0), nan=0.0, posinf=np.inf)
@@ -0,0 +1,143 @@
+import time
+import numpy as np
+from dijkstra_engine import dijkstra_path
+from distance_matrix import distance_matrix, snap_points
+from region_graph import load_locations, load_region_compact_graph, load_region_hierarchy
+
+
+# Visiting order by always driving to the cheapest stop not visited yet
+def nearest_neighbour_order(cost, start=0):
+    n = len(cost)
+    visited = np.zeros(n, dtype=bool)
+    visited[start] = True
+    order = [start]
+    for _ in range(n - 1):
+        row = np.where(visited, np.inf, cost[order[-1]])
+        order.append(int(np.argmin(row)))
+        visited[order[-1]] = True
+    return order
+
+
+def sequence_cost(cost, seq):
+    seq = np.asarray(seq)
+    return float(cost[seq[:-1], seq[1:]].sum())
+
+
+# 2-opt on a sequence whose first and last stops are fixed. Reversing seq[i+1..j] swaps two
+# connections and flips the direction of the segment, which on an asymmetric matrix changes its
+# cost too, so the segment cost is taken from prefix sums in both directions. All j for one i
+# are scored in one vectorized expression and the best improving move is applied.
+def two_opt(cost, seq, deadline=None):
+    seq = np.asarray(seq, dtype=np.int64)
+    m = len(seq)
+    improved = True
+    while improved:
+        improved = False
+        fwd = np.r_[0.0, np.cumsum(cost[seq[:-1], seq[1:]])]
+        bwd = np.r_[0.0, np.cumsum(cost[seq[1:], seq[:-1]])]
+        for i in range(m - 3):
+            if deadline is not None and time.perf_counter() > deadline:
+                return seq.tolist()
+            j = np.arange(i + 2, m - 1)
+            a, b, c, d = seq[i], seq[i + 1], seq[j], seq[j + 1]
+            delta = (cost[a, c] + cost[b, d] - cost[a, b] - cost[c, d]
+                     + (bwd[j] - bwd[i + 1]) - (fwd[j] - fwd[i + 1]))
+            best = int(np.argmin(delta))
+            if delta[best] < -1e-9:
+                seq[i + 1:j[best] + 1] = seq[i + 1:j[best] + 1][::-1].copy()
+                improved = True
+                break
+    return seq.tolist()
+
+
+# Or-opt on a sequence whose first and last stops are fixed: move a run of 1 to max_run
+# consecutive stops, in the same direction, to the cheapest other gap in the sequence
+def or_opt(cost, seq, max_run=3, deadline=None):
+    seq = list(seq)
+    improved = True
+    while improved:
+        improved = False
+        for run in range(1, max_run + 1):
+            for i in range(1, len(seq) - run):
+                if deadline is not None and time.perf_counter() > deadline:
+                    return seq
+                first, last = seq[i], seq[i + run - 1]
+                prev, nxt = seq[i - 1], seq[i + run]
+                gain = cost[prev, first] + cost[last, nxt] - cost[prev, nxt]
+                rest = np.array(seq[:i] + seq[i + run:])
+                added = cost[rest[:-1], first] + cost[last, rest[1:]] - cost[rest[:-1], rest[1:]]
+                added[i - 1] = np.inf  # putting it back where it was
+                p = int(np.argmin(added))
+                if added[p] < gain - 1e-9:
+                    seq = rest[:p + 1].tolist() + seq[i:i + run] + rest[p + 1:].tolist()
+                    improved = True
+                    break
+            if improved:
+                break
+    return seq
+
+
+# Visiting order of all stops of a cost matrix: nearest neighbour, then 2-opt and Or-opt in turn
+# until neither improves or time_limit (seconds) runs out. The tour starts at start and returns
+# there when closed, otherwise it ends at whichever stop is cheapest. Only the matrix is used.
+# Returns the order (without repeating start at the end) and its total cost.
+def solve_tour(cost, start=0, closed=True, time_limit=None):
+    cost = np.array(cost, dtype=np.float64)
+    n = len(cost)
+    if n < 2:
+        return list(range(n)), 0.0
+    # Unreachable pairs get a cost no real tour can pay, so the moves can still compare them
+    finite = cost[np.isfinite(cost)]
+    cost[~np.isfinite(cost)] = (finite.max() if len(finite) else 1.0) * n * 10
+    deadline = time.perf_counter() + time_limit if time_limit is not None else None
+
+    order = nearest_neighbour_order(cost, start)
+    if closed:
+        end = start
+    else:
+        # An open tour ends at a free stop, modelled as a dummy stop that is free to reach
+        end = n
+        cost = np.pad(cost, ((0, 1), (0, 1)))
+    seq = order + [end]
+    total = sequence_cost(cost, seq)
+    while deadline is None or time.perf_counter() < deadline:
+        seq = or_opt(cost, two_opt(cost, seq, deadline), deadline=deadline)
+        new_total = sequence_cost(cost, seq)
+        if new_total >= total - 1e-9:
+            break
+        total = new_total
+    return seq[:-1], sequence_cost(cost, seq)
+
+
+# One road route through every stop of a tour, leg by leg
+def stitch_route(legs):
+    route = []
+    for leg in legs:
+        route.extend(leg[1:] if route else leg)
+    return route
+
+
+# Tour over (lat, lon) points (all locations in the data file by default) on the region graph,
+# starting at the first point. The stop-to-stop matrix is built once (method 'ch' or
+# 'dijkstra', see distance_matrix) and the order is optimized on weight ('length' in meters or
+# 'travel_time_min' in minutes). Returns the visiting order as indices into points, the stitched
+# road route as OSM ids and the total cost.
+def plan_tour(points=None, perimeter=0.10, weight='length', closed=True, time_limit=None, method='ch',
+              data_file='testing_locations_4511.csv', mode='drive'):
+    if points is None:
+        df = load_locations(data_file)
+        points = list(zip(df['Latitude'], df['Longitude']))
+    distance_m, travel_time_min = distance_matrix(points, perimeter=perimeter, weight=weight, method=method,
+                                                  data_file=data_file, mode=mode)
+    cost = distance_m if weight == 'length' else travel_time_min
+    order, total = solve_tour(cost, 0, closed, time_limit)
+
+    compact = load_region_compact_graph(perimeter, data_file, mode)
+    nodes = compact.node_ids[snap_points(compact, points)].tolist()
+    stops = [nodes[i] for i in order] + ([nodes[order[0]]] if closed else [])
+    if method == 'ch':
+        hierarchy = load_region_hierarchy(perimeter, weight, data_file, mode)
+        legs = [hierarchy.route(u, v) for u, v in zip(stops[:-1], stops[1:])]
+    else:
+        legs = [dijkstra_path(compact, u, v, weight=weight) for u, v in zip(stops[:-1], stops[1:])]
+    return order, stitch_route(legs), total
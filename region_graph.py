@@ -0,0 +1,184 @@
+import os
+import osmnx as ox
+import pandas as pd
+from compact_graph import build_compact_graph
+from contraction_hierarchy import build_contraction_hierarchy, load_contraction_hierarchy
+from customizable_hierarchy import build_customizable_hierarchy, load_customizable_hierarchy
+from edge_speeds import add_speed_weights
+from landmarks import LandmarkHeuristic
+from dijkstra_engine import clear_engines
+from snapping import clear_snappers, get_edge_snapper, get_snapper
+from time_dependent import build_time_table, time_dependent_heuristic
+from weight_profiles import clear_profiles
+
+# Road graphs that have already been built, keyed by (data_file, perimeter, mode)
+_region_graphs = {}
+_compact_graphs = {}
+_hierarchies = {}
+_customizable_hierarchies = {}
+_customized_hierarchies = {}
+_landmark_heuristics = {}
+_time_tables = {}
+
+
+def load_locations(data_file='testing_locations_4511.csv'):
+    df = pd.read_csv(data_file)
+    df.columns = df.columns.str.strip()
+    return df
+
+
+def region_bbox(points, perimeter):
+    lats = [point[0] for point in points]
+    lons = [point[1] for point in points]
+    north = max(lats) + perimeter
+    south = min(lats) - perimeter
+    east = max(lons) + perimeter
+    west = min(lons) - perimeter
+    return north, south, east, west
+
+
+# Build one road graph covering every location in the data file (plus the perimeter)
+# and keep it in memory so each origin/target query reuses it instead of downloading
+# and simplifying an overlapping graph of its own
+def load_region_graph(perimeter=0.10, data_file='testing_locations_4511.csv', mode='drive'):
+    key = (data_file, perimeter, mode)
+    if key not in _region_graphs:
+        ox.config(log_console=True, use_cache=True)
+        df = load_locations(data_file)
+        points = list(zip(df['Latitude'], df['Longitude']))
+        north, south, east, west = region_bbox(points, perimeter)
+        _region_graphs[key] = ox.graph_from_bbox(north, south, east, west, network_type=mode, simplify=True)
+    return _region_graphs[key]
+
+
+# CSR copy of the region graph for the array-based search engines, with the 'length' and
+# 'travel_time_min' (minutes) weight profiles loaded
+def load_region_compact_graph(perimeter=0.10, data_file='testing_locations_4511.csv', mode='drive'):
+    key = (data_file, perimeter, mode)
+    if key not in _compact_graphs:
+        roadgraph = load_region_graph(perimeter, data_file, mode)
+        compact = build_compact_graph(roadgraph, weights=('length',))
+        add_speed_weights(compact, roadgraph)
+        _compact_graphs[key] = compact
+    return _compact_graphs[key]
+
+
+# CSR copy of a road graph that came from load_region_graph, for code that is handed the road
+# graph rather than the region it covers
+def region_compact_graph(roadgraph):
+    for (data_file, perimeter, mode), graph in _region_graphs.items():
+        if graph is roadgraph:
+            return load_region_compact_graph(perimeter, data_file, mode)
+    raise ValueError("Not a region graph, load it with load_region_graph")
+
+
+# Nearest-node index of the region graph, built once and shared by every query on it
+def load_region_snapper(perimeter=0.10, data_file='testing_locations_4511.csv', mode='drive'):
+    return get_snapper(load_region_compact_graph(perimeter, data_file, mode))
+
+
+# Nearest-road index of the region graph, built from the osmnx edge geometries
+def load_region_edge_snapper(perimeter=0.10, data_file='testing_locations_4511.csv', mode='drive'):
+    return get_edge_snapper(load_region_compact_graph(perimeter, data_file, mode),
+                            load_region_graph(perimeter, data_file, mode))
+
+
+# Contraction hierarchy of the region graph. Preprocessing is slow, so the result is saved
+# next to the data file and reloaded on later runs as long as the graph and its weights have
+# not changed.
+def load_region_hierarchy(perimeter=0.10, weight='length', data_file='testing_locations_4511.csv', mode='drive'):
+    key = (data_file, perimeter, mode, weight)
+    if key not in _hierarchies:
+        compact = load_region_compact_graph(perimeter, data_file, mode)
+        path = f"{os.path.splitext(data_file)[0]}_{mode}_{perimeter}_{weight}_ch.npz"
+        if weight not in compact.weights:
+            compact.load_weight(load_region_graph(perimeter, data_file, mode), weight)
+        hierarchy = None
+        if os.path.exists(path):
+            hierarchy = load_contraction_hierarchy(path)
+            # Rebuilt when the edges or their weights changed, not only the nodes
+            if hierarchy.fingerprint != compact.fingerprint(weight):
+                hierarchy = None
+        if hierarchy is None:
+            hierarchy = build_contraction_hierarchy(compact, weight)
+            hierarchy.save(path)
+        _hierarchies[key] = hierarchy
+    return _hierarchies[key]
+
+
+# Metric-independent hierarchy of the region graph, also cached on disk. Call
+# customize(compact, weight) on it for each weight profile (type_weight, traffic_weight, ...),
+# or load_region_customized_hierarchy to keep the customized ones.
+def load_region_customizable_hierarchy(perimeter=0.10, data_file='testing_locations_4511.csv', mode='drive'):
+    key = (data_file, perimeter, mode)
+    if key not in _customizable_hierarchies:
+        compact = load_region_compact_graph(perimeter, data_file, mode)
+        path = f"{os.path.splitext(data_file)[0]}_{mode}_{perimeter}_cch.npz"
+        hierarchy = None
+        if os.path.exists(path):
+            hierarchy = load_customizable_hierarchy(path)
+            # Only the topology matters here, the weights come in with customize()
+            if hierarchy.fingerprint != compact.fingerprint():
+                hierarchy = None
+        if hierarchy is None:
+            hierarchy = build_customizable_hierarchy(compact)
+            hierarchy.save(path)
+        _customizable_hierarchies[key] = hierarchy
+    return _customizable_hierarchies[key]
+
+
+# The region's customizable hierarchy customized for one weight profile of the compact graph.
+# The customization is kept for as long as the profile array stays the same: compiling the
+# profile again through apply_profile (another hour, new jams) gives a new array and the next
+# call customizes again, while repeated queries on the same profile reuse it.
+def load_region_customized_hierarchy(weight, perimeter=0.10, data_file='testing_locations_4511.csv', mode='drive'):
+    key = (data_file, perimeter, mode, weight)
+    compact = load_region_compact_graph(perimeter, data_file, mode)
+    if weight not in compact.weights:
+        compact.load_weight(load_region_graph(perimeter, data_file, mode), weight)
+    entry = _customized_hierarchies.get(key)
+    if entry is None or entry[0] is not compact.weights[weight]:
+        hierarchy = load_region_customizable_hierarchy(perimeter, data_file, mode)
+        entry = (compact.weights[weight], hierarchy.customize(compact, weight))
+        _customized_hierarchies[key] = entry
+    return entry[1]
+
+
+# ALT landmark heuristic of the region graph for one weight profile. The landmark searches are
+# run again only when the profile array changes, like the customized hierarchies above.
+def load_region_landmarks(weight, perimeter=0.10, data_file='testing_locations_4511.csv', mode='drive'):
+    key = (data_file, perimeter, mode, weight)
+    compact = load_region_compact_graph(perimeter, data_file, mode)
+    if weight not in compact.weights:
+        compact.load_weight(load_region_graph(perimeter, data_file, mode), weight)
+    entry = _landmark_heuristics.get(key)
+    if entry is None or entry[0] is not compact.weights[weight]:
+        entry = (compact.weights[weight], LandmarkHeuristic(compact, weight=weight))
+        _landmark_heuristics[key] = entry
+    return entry[1]
+
+
+# Hourly travel time table of the region graph for one hour factor function and road class
+# table, built once with its heuristic and shared by every departure time and query
+def load_region_time_table(hour_factor, class_factors, perimeter=0.10, data_file='testing_locations_4511.csv',
+                           mode='drive'):
+    key = (data_file, perimeter, mode, hour_factor, tuple(sorted(class_factors.items())))
+    if key not in _time_tables:
+        compact = load_region_compact_graph(perimeter, data_file, mode)
+        table = build_time_table(compact, load_region_graph(perimeter, data_file, mode), hour_factor, class_factors)
+        _time_tables[key] = (table, time_dependent_heuristic(compact, table))
+    return _time_tables[key]
+
+
+# Also drops the engines, snappers and compiled profiles that hold on to the compact graphs
+def clear_region_graphs():
+    _region_graphs.clear()
+    _compact_graphs.clear()
+    _hierarchies.clear()
+    _customizable_hierarchies.clear()
+    _customized_hierarchies.clear()
+    _landmark_heuristics.clear()
+    _time_tables.clear()
+    clear_engines()
+    clear_snappers()
+    clear_profiles()
@@ -5,79 +5,52 @@ import osmnx as ox
 import pandas as pd
 import geopandas
 import time 
+from region_graph import load_region_graph, load_region_compact_graph, load_region_customized_hierarchy, load_region_snapper
+from bellman_ford_engine import bellman_ford_path
+from weight_profiles import apply_profile
+from route_metrics import route_metrics
 # Ensure the drive is mounted correctly
 
 df = pd.read_csv('testing_locations_4511.csv')
 df.columns = df.columns.str.strip()
-def add_road_type_weights(roadgraph):
-    for u, v, d in roadgraph.edges(data=True):
-        road_type = d.get('highway', 'unclassified')
-        if road_type == 'motorway':
-            d['type_weight'] = 1.0
-        elif road_type == 'trunk':
-            d['type_weight'] = 1.2
-        elif road_type == 'primary':
-            d['type_weight'] = 1.5
-        elif road_type == 'secondary':
-            d['type_weight'] = 2.0
-        elif road_type == 'tertiary':
-            d['type_weight'] = 2.2
-        elif road_type == 'unclassified':
-            d['type_weight'] = 2.5
-        elif road_type == 'residential':
-            d['type_weight'] = 3.0
-        else:
-            d['type_weight'] = 1.5 
+road_type_profile = {
+    'road_classes': {
+        'motorway': 1.0, 'trunk': 1.2, 'primary': 1.5, 'secondary': 2.0,
+        'tertiary': 2.2, 'unclassified': 2.5, 'residential': 3.0
+    },
+    'default': 1.5,
+}
+def add_road_type_weights(roadgraph, compact, store=True):
+    return apply_profile(compact, roadgraph, 'type_weight', road_type_profile, store)
 
 # Define function to generate paths using OSMNX and NetworkX
-def generate_path(origin_point, target_point, perimeter, weight='length'):
+# backend='vectorized' or 'spfa' runs the array-based Bellman-Ford on the CSR copy of the graph instead of networkx,
+# backend='cch' queries the region's customizable hierarchy customized once for the weight
+def generate_path(origin_point, target_point, perimeter, weight='length', backend='networkx'):
     start_time = time.time()
-    ox.config(log_console=True, use_cache=True)
-    north = max(origin_point[0], target_point[0]) + perimeter
-    south = min(origin_point[0], target_point[0]) - perimeter
-    east = max(origin_point[1], target_point[1]) + perimeter
-    west = min(origin_point[1], target_point[1]) - perimeter
-    mode = 'drive'
-    roadgraph = ox.graph_from_bbox(north, south, east, west, network_type=mode, simplify=True)
+    roadgraph = load_region_graph(perimeter)
     
     # Add road type weights to edges
-    add_road_type_weights(roadgraph)
+    compact = load_region_compact_graph(perimeter)
+    add_road_type_weights(roadgraph, compact, store=backend == 'networkx')  # only networkx reads the edges
+    if weight not in compact.weights:
+        compact.load_weight(roadgraph, weight)
     
-    origin_node = ox.nearest_nodes(roadgraph, origin_point[1], origin_point[0])
-    target_node = ox.nearest_nodes(roadgraph, target_point[1], target_point[0])
-    route = nx.shortest_path(roadgraph, origin_node, target_node, weight=weight, method="bellman-ford")
-
-    long = [roadgraph.nodes[n]['x'] for n in route]
-    lat = [roadgraph.nodes[n]['y'] for n in route]
-    
-    # Calculate total distance in meters
-    route_gdf = ox.routing.route_to_gdf(roadgraph, route)
-    total_distance_m = route_gdf['length'].sum()
-
-    # Clean and process speed data
-    def clean_speed(speed):
-        if isinstance(speed, str):
-            if 'mph' in speed:
-                return float(speed.split(' ')[0])  # Assuming format is 'XX mph'
-            elif 'kph' in speed:
-                return float(speed.split(' ')[0]) / 1.60934  # Convert km/h to mph
-        return None
-
-    speeds = route_gdf['maxspeed'].apply(clean_speed).dropna()
-    if not speeds.empty:
-        weighted_speeds = route_gdf[route_gdf['maxspeed'].notnull()]['length'] * speeds
-        average_speed_mph = weighted_speeds.sum() / route_gdf[route_gdf['maxspeed'].notnull()]['length'].sum()
+    origin_node, target_node = load_region_snapper(perimeter).nearest_nodes([origin_point, target_point])
+    if backend in ('vectorized', 'spfa'):
+        route = bellman_ford_path(compact, origin_node, target_node, weight=weight, method=backend)
+    elif backend == 'cch':
+        # The hierarchy's searches are Dijkstra, which settles nodes too early on negative edges;
+        # those profiles need one of the Bellman-Ford backends
+        if compact.weight(weight).min() < 0:
+            raise ValueError("Negative edge weights are not supported by the cch backend")
+        route = load_region_customized_hierarchy(weight, perimeter).route(origin_node, target_node)
+    elif backend == 'networkx':
+        route = nx.shortest_path(roadgraph, origin_node, target_node, weight=weight, method="bellman-ford")
     else:
-        average_speed_mph = 30  # Fallback speed in mph if no valid speed data is available
+        raise ValueError("Unsupported backend")
 
-    # Convert distance to miles
-    total_distance_mi = total_distance_m / 1609.34  # meters to miles
-    
-    # Calculate travel time in hours
-    travel_time_h = total_distance_mi / average_speed_mph
-    
-    # Convert travel time to minutes
-    travel_time_min = travel_time_h * 60
+    long, lat, total_distance_mi, travel_time_min, average_speed_mph = route_metrics(compact, route, weight)
     end_time = time.time()
     execution_time = end_time - start_time
     return long, lat, total_distance_mi, travel_time_min, average_speed_mph, execution_time 
@@ -0,0 +1,94 @@
+import numpy as np
+import shapely
+import shapely.ops
+from compact_graph import csr_ranges
+from edge_speeds import DEFAULT_SPEED_MPH, METERS_PER_MILE
+
+
+# Edge index of every hop of a route given as compact node indices: among parallel edges the
+# one the weight profile prefers, which is the edge a search on that weight went through
+def route_edges(compact, path, weight='length'):
+    path = np.asarray(path, dtype=np.int64)
+    weights = compact.weight(weight)
+    positions, counts = csr_ranges(compact.offsets, path[:-1])
+    hops = np.repeat(np.arange(len(path) - 1), counts)
+    match = compact.targets[positions] == path[1:][hops]
+    positions, hops = positions[match], hops[match]
+    order = np.lexsort((weights[positions], hops))
+    positions, hops = positions[order], hops[order]
+    first = np.r_[True, hops[1:] != hops[:-1]] if len(hops) else np.zeros(0, dtype=bool)
+    if first.sum() != len(path) - 1:
+        raise ValueError("Route has a hop without an edge")
+    return positions[first]
+
+
+# Distance (miles), travel time (minutes) and length-weighted average posted speed (mph) of a
+# route, and its geometry when asked for
+class RouteSummary:
+    def __init__(self, path, edges, distance_mi, travel_time_min, average_speed_mph, geometry=None):
+        self.path = path  # compact node indices
+        self.edges = edges  # compact edge index of every hop
+        self.distance_mi = distance_mi
+        self.travel_time_min = travel_time_min
+        self.average_speed_mph = average_speed_mph
+        self.geometry = geometry  # shapely LineString in lon/lat, None unless requested
+
+
+# Summary of a route of OSM ids from the per-edge length, travel_time_min and speed_mph arrays; no
+# GeoDataFrame is built. weight is the profile the route was searched on and decides between
+# parallel edges. geometry=True also returns the line of the route, following the osmnx edge
+# geometries when the road graph is given and straight between the nodes otherwise.
+def summarize_route(compact, route, weight='length', geometry=False, roadgraph=None):
+    path = compact.indices_of(route)
+    if len(path) < 2:
+        line = shapely.points(compact.x[path], compact.y[path])[0] if geometry and len(path) else None
+        return RouteSummary(path, np.zeros(0, dtype=np.int64), 0.0, 0.0, DEFAULT_SPEED_MPH, line)
+    return summarize_edges(compact, path, route_edges(compact, path, weight), geometry=geometry, roadgraph=roadgraph)
+
+
+# Summary of a route of compact node indices over known edges. starts and ends are the stretch
+# of each edge driven, as fractions from its tail, for routes that begin or end part way along a
+# road (see snapping.edge_route); whole edges when they are not given.
+def summarize_edges(compact, path, edges, starts=None, ends=None, geometry=False, roadgraph=None):
+    path = np.asarray(path, dtype=np.int64)
+    edges = np.asarray(edges, dtype=np.int64)
+    shares = np.ones(len(edges)) if starts is None else np.asarray(ends) - np.asarray(starts)
+    lengths = compact.weight('length')[edges] * shares
+    distance_mi = float(lengths.sum()) / METERS_PER_MILE
+    travel_time_min = float(np.dot(compact.weight('travel_time_min')[edges], shares))
+    if lengths.sum() > 0:
+        average_speed_mph = float(np.dot(lengths, compact.weight('speed_mph')[edges]) / lengths.sum())
+    else:
+        average_speed_mph = DEFAULT_SPEED_MPH
+    line = route_geometry(compact, path, edges, roadgraph, starts, ends) if geometry else None
+    return RouteSummary(path, edges, distance_mi, travel_time_min, average_speed_mph, line)
+
+
+# Line through a route in lon/lat, joining the edge geometries end to end and cutting the
+# partly driven ones down to the stretch given by starts and ends
+def route_geometry(compact, path, edges, roadgraph=None, starts=None, ends=None):
+    osm = compact.node_ids[path].tolist()
+    lines = []
+    for i, key in enumerate(compact.keys[edges].tolist()):
+        line = roadgraph[osm[i]][osm[i + 1]][key].get('geometry') if roadgraph is not None else None
+        if line is None:
+            line = shapely.linestrings(compact.x[path[i:i + 2]], compact.y[path[i:i + 2]])
+        if starts is not None and (starts[i] > 0 or ends[i] < 1):
+            line = shapely.ops.substring(line, starts[i], ends[i], normalized=True)
+        lines.append(np.asarray(line.coords)[:, :2])
+    coords = [lines[0]] + [part[1:] for part in lines[1:]]
+    return shapely.linestrings(np.concatenate(coords))
+
+
+# Coordinates, distance (miles), travel time (minutes) and average speed (mph) of a summary,
+# the tuple the scripts return from generate_path
+def summary_metrics(compact, summary):
+    long = compact.x[summary.path].tolist()
+    lat = compact.y[summary.path].tolist()
+    return long, lat, summary.distance_mi, summary.travel_time_min, summary.average_speed_mph
+
+
+# Coordinates, distance (miles), travel time (minutes) and average speed (mph) of a route of OSM
+# ids, the tuple the scripts return from generate_path
+def route_metrics(compact, route, weight='length'):
+    return summary_metrics(compact, summarize_route(compact, route, weight))
@@ -4,8 +4,15 @@ import plotly.graph_objects as go
 import osmnx as ox
 import pandas as pd
 import geopandas
-import random 
+import numpy as np
 import time 
+from region_graph import (load_region_graph, load_region_compact_graph, load_region_customized_hierarchy,
+                          load_region_snapper, load_region_time_table)
+from bellman_ford_engine import bellman_ford_path
+from weight_profiles import apply_profile
+from dynamic_sssp import DynamicShortestPaths
+from time_dependent import time_dependent_path
+from route_metrics import route_metrics
 # Ensure the drive is mounted correctly
 
 df = pd.read_csv('testing_locations_4511.csv')
@@ -25,83 +32,118 @@ def add_road_type_weights(hour):
         return 3.0
     else:
         return 1.5
-def adjust_weights_by_road_type(roadgraph, hour):
-    road_congestion_factor = {
-        'motorway': 1.5,
-        'trunk': 1.3,
-        'primary': 1.2,
-        'secondary': 1.1,
-        'tertiary': 1.05,
-        'unclassified': 1.0,
-        'residential': 0.9,
-    }
+road_congestion_factor = {
+    'motorway': 1.5,
+    'trunk': 1.3,
+    'primary': 1.2,
+    'secondary': 1.1,
+    'tertiary': 1.05,
+    'unclassified': 1.0,
+    'residential': 0.9,
+}
+def adjust_weights_by_road_type(roadgraph, compact, hour, store=True, incidents=None):
     rush_hour_factor = add_road_type_weights(hour)
-    for u, v, d in roadgraph.edges(data=True):
-        road_type = d.get('highway', 'unclassified')
-        congestion_level = road_congestion_factor.get(road_type, 1.0) * rush_hour_factor
-        d['traffic_weight'] = congestion_level
-
-
-def simulate_traffic_events(roadgraph, probability_of_jam=0.05, impact_factor=3.0):
-    for u, v, d in roadgraph.edges(data=True):
-        if random.random() < probability_of_jam:
-            d['traffic_weight'] *= impact_factor
-
-
-
-
-
-def generate_path(origin_point, target_point, perimeter, weight='traffic_weight'): 
+    congestion = {'road_classes': road_congestion_factor, 'default': 1.0, 'hour': rush_hour_factor}
+    if incidents:
+        congestion['incidents'] = incidents
+    return apply_profile(compact, roadgraph, 'traffic_weight', congestion, store)
+
+
+# Jams per region so far, {CSR edge index: factor on its traffic_weight}, keyed by perimeter.
+# They are compiled into the congestion profile rather than written onto the shared road graph.
+_incidents = {}
+
+
+def region_incidents(perimeter):
+    compact = load_region_compact_graph(perimeter)
+    entry = _incidents.get(perimeter)
+    if entry is None or entry[0] is not compact:
+        entry = (compact, {})
+        _incidents[perimeter] = entry
+    return entry[1]
+
+
+# Jam a random share of the region's edges, a jam on an already jammed edge adds up. The origin
+# trees of backend='dynamic' are repaired with the new weights rather than rebuilt. Returns the
+# CSR edge indices that got jammed.
+def simulate_traffic_events(perimeter, probability_of_jam=0.05, impact_factor=3.0):
+    compact = load_region_compact_graph(perimeter)
+    incidents = region_incidents(perimeter)
+    jammed = np.flatnonzero(np.random.random(compact.edge_count) < probability_of_jam)
+    for e in jammed.tolist():
+        incidents[e] = incidents.get(e, 1.0) * impact_factor
+    for (region, _, _), (graph, tree) in _trees.items():
+        if region == perimeter and graph is compact:
+            tree.apply_traffic_updates(jammed, tree.weights[jammed] * impact_factor)
+    return jammed
+
+
+# Shortest-path trees on traffic_weight of the origins routed from with backend='dynamic', keyed
+# by (perimeter, origin node, hour). Jams are fed into them as they happen, so a repeated origin
+# gets its routes from the repaired tree instead of a new search. The oldest tree is dropped
+# once there are more than MAX_TREES.
+_trees = {}
+MAX_TREES = 16
+
+
+# Tree of origin_node on the hour's traffic_weight with the jams so far, built on first use
+def region_tree(roadgraph, compact, perimeter, origin_node, hour):
+    key = (perimeter, origin_node, hour)
+    entry = _trees.get(key)
+    if entry is None or entry[0] is not compact:
+        adjust_weights_by_road_type(roadgraph, compact, hour, False, region_incidents(perimeter))
+        entry = (compact, DynamicShortestPaths(compact, compact.index_of(origin_node), 'traffic_weight'))
+        _trees.pop(key, None)
+        _trees[key] = entry
+        if len(_trees) > MAX_TREES:
+            del _trees[next(iter(_trees))]
+    return entry[1]
+
+
+
+
+
+# backend='vectorized' or 'spfa' runs the array-based Bellman-Ford on the CSR copy of the graph instead of networkx,
+# backend='time_dependent' routes on hourly travel time profiles leaving at departure_hour (17.5 is 5:30 PM),
+# backend='dynamic' answers from a shortest-path tree of the origin that is repaired as jams happen,
+# backend='cch' from the region's customizable hierarchy customized once per compiled traffic_weight
+def generate_path(origin_point, target_point, perimeter, weight='traffic_weight', departure_hour=17, backend='networkx'): 
     start_time = time.time()
-    ox.config(log_console=True, use_cache=True)
-    north = max(origin_point[0], target_point[0]) + perimeter
-    south = min(origin_point[0], target_point[0]) - perimeter
-    east = max(origin_point[1], target_point[1]) + perimeter
-    west = min(origin_point[1], target_point[1]) - perimeter
-    mode = 'drive'
-    roadgraph = ox.graph_from_bbox(north, south, east, west, network_type=mode, simplify=True)
+    roadgraph = load_region_graph(perimeter)
     
-    # Add road type weights to edges
-    hour = 17 # 5:00 PM
+    # Congestion of the departure hour with the jams reported so far, compiled once per hour and
+    # written to the edges only when networkx routes on it. Every backend routes on traffic_weight
+    # (or the time table), which already carries the hour's factor.
+    hour = int(departure_hour) % 24
     print(f"Current hour: {hour}")
-    for u, v, d in roadgraph.edges(data=True):
-        d['weight'] = d.get(weight, 1.0) * add_road_type_weights(hour)
-    
-    origin_node = ox.nearest_nodes(roadgraph, origin_point[1], origin_point[0])
-    target_node = ox.nearest_nodes(roadgraph, target_point[1], target_point[0])
-    route = nx.shortest_path(roadgraph, origin_node, target_node, weight='traffic_weight', method='bellman-ford')
-
-    long = [roadgraph.nodes[n]['x'] for n in route]
-    lat = [roadgraph.nodes[n]['y'] for n in route]
-    
-    # Calculate total distance in meters
-    route_gdf = ox.routing.route_to_gdf(roadgraph, route)
-    total_distance_m = route_gdf['length'].sum()
-
-    # Clean and process speed data
-    def clean_speed(speed):
-        if isinstance(speed, str):
-            if 'mph' in speed:
-                return float(speed.split(' ')[0])  # Assuming format is 'XX mph'
-            elif 'kph' in speed:
-                return float(speed.split(' ')[0]) / 1.60934  # Convert km/h to mph
-        return None
-
-    speeds = route_gdf['maxspeed'].apply(clean_speed).dropna()
-    if not speeds.empty:
-        weighted_speeds = route_gdf[route_gdf['maxspeed'].notnull()]['length'] * speeds
-        average_speed_mph = weighted_speeds.sum() / route_gdf[route_gdf['maxspeed'].notnull()]['length'].sum()
+    compact = load_region_compact_graph(perimeter)
+    store = backend == 'networkx'
+    adjust_weights_by_road_type(roadgraph, compact, hour, store, region_incidents(perimeter))
+    # The parallel edge the search took: the cheapest under the weight it routed on
+    metrics_weight = 'travel_time_min' if backend == 'time_dependent' else 'traffic_weight'
+
+    origin_node, target_node = load_region_snapper(perimeter).nearest_nodes([origin_point, target_point])
+    if backend == 'time_dependent':
+        # Edge travel times follow the clock as the trip goes on instead of one factor for the hour
+        table, heuristic = load_region_time_table(add_road_type_weights, road_congestion_factor, perimeter)
+        route, arrival = time_dependent_path(compact, table, origin_node, target_node, departure_hour * 60, heuristic)
+    elif backend == 'cch':
+        # The region's hierarchy customized for this hour's compiled traffic_weight. Its searches are
+        # Dijkstra, which settles nodes too early on negative edges; those need a Bellman-Ford backend
+        if compact.weight('traffic_weight').min() < 0:
+            raise ValueError("Negative edge weights are not supported by the cch backend")
+        route = load_region_customized_hierarchy('traffic_weight', perimeter).route(origin_node, target_node)
+    elif backend == 'dynamic':
+        # The origin's tree, kept up to date with the jams by simulate_traffic_events
+        route = region_tree(roadgraph, compact, perimeter, origin_node, hour).route(target_node)
+    elif backend in ('vectorized', 'spfa'):
+        route = bellman_ford_path(compact, origin_node, target_node, weight='traffic_weight', method=backend)
+    elif backend == 'networkx':
+        route = nx.shortest_path(roadgraph, origin_node, target_node, weight='traffic_weight', method='bellman-ford')
     else:
-        average_speed_mph = 30  # Fallback speed in mph if no valid speed data is available
+        raise ValueError("Unsupported backend")
 
-    # Convert distance to miles
-    total_distance_mi = total_distance_m / 1609.34  # meters to miles
-    
-    # Calculate travel time in hours
-    travel_time_h = total_distance_mi / average_speed_mph
-    
-    # Convert travel time to minutes
-    travel_time_min = travel_time_h * 60
+    long, lat, total_distance_mi, travel_time_min, average_speed_mph = route_metrics(compact, route, metrics_weight)
     end_time = time.time()
     execution_time = end_time - start_time
     return long, lat, total_distance_mi, travel_time_min, average_speed_mph, execution_time
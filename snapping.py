@@ -0,0 +1,243 @@
+import math
+import networkx as nx
+import numpy as np
+import shapely
+from scipy.spatial import cKDTree
+from heuristics import EARTH_RADIUS_M
+
+# Snappers that have already been built, keyed by id() of their CompactGraph
+_snappers = {}
+_edge_snappers = {}
+
+SNAP_CHUNK = 100000  # points per R-tree query when snapping onto edges
+MAX_SNAP_DISTANCE_M = 2000  # farther from every road than this, a point is outside the graph
+
+
+# The region graph only covers the bounding box of the data file, a point outside it would
+# silently snap to a border node and get a wrong route, so it is an error instead
+def _check_snap_distance(lats, lons, dist, max_dist):
+    if max_dist is None:
+        return
+    far = np.flatnonzero(dist > max_dist)
+    if len(far):
+        i = far[0]
+        raise ValueError(f"Point ({lats[i]}, {lons[i]}) is {dist[i]:.0f} m from the road graph, "
+                         f"outside the region it covers")
+
+
+# Points on the unit sphere. Chord length between them grows with great-circle distance, so a
+# nearest-neighbour query in these coordinates finds the nearest node on the earth's surface
+# without a map projection, anywhere on the globe.
+def unit_vectors(lats, lons):
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+# Nearest-node index for a CompactGraph: a KD-tree over its node coordinates, built once and
+# queried with whole arrays of points at a time
+class NodeSnapper:
+    def __init__(self, compact):
+        self.graph = compact
+        self.tree = cKDTree(unit_vectors(compact.y, compact.x))
+
+    # Compact node index nearest to every (lat, lon), with the distance in meters if asked.
+    # Raises ValueError for points farther than max_dist meters from every node (None to allow).
+    def snap(self, lats, lons, return_dist=False, max_dist=MAX_SNAP_DISTANCE_M):
+        lats, lons = np.atleast_1d(lats), np.atleast_1d(lons)
+        chord, nodes = self.tree.query(unit_vectors(lats, lons))
+        nodes = nodes.astype(np.int32)
+        dist = 2 * EARTH_RADIUS_M * np.arcsin(np.minimum(chord / 2, 1.0))
+        _check_snap_distance(lats, lons, dist, max_dist)
+        if return_dist:
+            return nodes, dist
+        return nodes
+
+    # Same as snap but returns OSM node ids
+    def snap_nodes(self, lats, lons):
+        return self.graph.node_ids[self.snap(lats, lons)].tolist()
+
+    # OSM node ids nearest to a list of (lat, lon) points, like ox.nearest_nodes
+    def nearest_nodes(self, points):
+        return self.snap_nodes([point[0] for point in points], [point[1] for point in points])
+
+
+def get_snapper(compact):
+    entry = _snappers.get(id(compact))
+    if entry is None or entry[0] is not compact:
+        entry = (compact, NodeSnapper(compact))
+        _snappers[id(compact)] = entry
+    return entry[1]
+
+
+# Nearest-road index for a CompactGraph: an R-tree (shapely STRtree) over the straight pieces of
+# every edge geometry, in a local equirectangular projection in meters around the graph's mean
+# latitude. A point is projected onto the nearest piece and reported as the edge plus the
+# fraction of the edge's length from its tail to the projected point. Edges without a geometry
+# are the straight line between their end nodes.
+class EdgeSnapper:
+    def __init__(self, compact, roadgraph=None):
+        self.graph = compact
+        self.lat0 = float(np.radians(compact.y.mean())) if compact.node_count else 0.0
+        geometries = compact.edge_values(roadgraph, 'geometry') if roadgraph is not None else [None] * compact.edge_count
+        sources = compact.sources.tolist()
+        heads = compact.targets.tolist()
+        lines = []
+        for e, geometry in enumerate(geometries):
+            if geometry is not None:
+                lines.append(np.asarray(geometry.coords)[:, :2])
+            else:
+                u, v = sources[e], heads[e]
+                lines.append(np.array([[compact.x[u], compact.y[u]], [compact.x[v], compact.y[v]]]))
+        counts = np.array([len(line) - 1 for line in lines], dtype=np.int64)
+        points = self.project(*np.concatenate(lines).T[::-1]) if lines else np.empty((0, 2))
+        # Every piece runs from a coordinate to the next one of the same edge
+        last = np.cumsum(counts + 1) - 1
+        start = np.setdiff1d(np.arange(len(points) - 1), last)
+        self.seg_start = points[start]
+        self.seg_end = points[start + 1]
+        self.seg_edge = np.repeat(np.arange(compact.edge_count), counts)
+        seg_length = np.linalg.norm(self.seg_end - self.seg_start, axis=1)
+        # Length of the edge geometry before every piece, and of the whole geometry
+        edge_first = np.cumsum(counts) - counts
+        before = np.cumsum(seg_length) - seg_length
+        self.seg_before = before - np.repeat(before[np.minimum(edge_first, max(len(before) - 1, 0))], counts)
+        self.edge_length = np.bincount(self.seg_edge, weights=seg_length, minlength=compact.edge_count)
+        self.tree = shapely.STRtree(shapely.linestrings(np.stack([self.seg_start, self.seg_end], axis=1)))
+        self.vertices = cKDTree(points)
+
+    # (lat, lon) arrays in degrees to projected (x, y) meters
+    def project(self, lats, lons):
+        lat = np.radians(np.asarray(lats, dtype=np.float64))
+        lon = np.radians(np.asarray(lons, dtype=np.float64))
+        return np.column_stack([lon * math.cos(self.lat0) * EARTH_RADIUS_M, lat * EARTH_RADIUS_M])
+
+    # Nearest edge to every (lat, lon) and the fraction along it, with the distance in meters
+    # from the point to the road if asked. The nearest geometry vertex bounds the distance to the
+    # nearest road, so only pieces whose bounding box meets the square of that radius around a
+    # point are candidates: one envelope query on the R-tree, then every candidate is projected
+    # exactly with NumPy. Points go through in chunks to bound the memory of the candidate pairs.
+    # Raises ValueError for points farther than max_dist meters from every road (None to allow).
+    def snap(self, lats, lons, return_dist=False, max_dist=MAX_SNAP_DISTANCE_M):
+        lats, lons = np.atleast_1d(lats), np.atleast_1d(lons)
+        points = self.project(lats, lons)
+        seg = np.empty(len(points), dtype=np.int64)
+        t = np.empty(len(points))
+        dist = np.empty(len(points))
+        for start in range(0, len(points), SNAP_CHUNK):
+            chunk = points[start:start + SNAP_CHUNK]
+            radius, _ = self.vertices.query(chunk)
+            boxes = shapely.box(chunk[:, 0] - radius, chunk[:, 1] - radius, chunk[:, 0] + radius, chunk[:, 1] + radius)
+            point, candidate = self.tree.query(boxes)  # sorted by point
+            share, d = self._project(chunk[point], candidate)
+            # Closest candidate of every point: the first one that equals the minimum of its point
+            first = np.flatnonzero(np.r_[True, point[1:] != point[:-1]])
+            closest = np.flatnonzero(d == np.repeat(np.minimum.reduceat(d, first), np.diff(np.r_[first, len(d)])))
+            closest = closest[np.r_[True, point[closest][1:] != point[closest][:-1]]]
+            seg[start:start + len(chunk)] = candidate[closest]
+            t[start:start + len(chunk)] = share[closest]
+            dist[start:start + len(chunk)] = d[closest]
+        _check_snap_distance(lats, lons, dist, max_dist)
+
+        edges = self.seg_edge[seg]
+        length = self.edge_length[edges]
+        along = self.seg_before[seg] + t * np.linalg.norm(self.seg_end[seg] - self.seg_start[seg], axis=1)
+        fractions = np.minimum(np.divide(along, length, out=np.zeros_like(along), where=length > 0), 1.0)
+        if return_dist:
+            return edges, fractions, dist
+        return edges, fractions
+
+    # Position (0 at the start, 1 at the end) of the closest point on each piece to each point,
+    # and the distance to it
+    def _project(self, points, seg):
+        a = self.seg_start[seg]
+        ab = self.seg_end[seg] - a
+        squared = np.einsum('ij,ij->i', ab, ab)
+        t = np.clip(np.einsum('ij,ij->i', points - a, ab) / np.where(squared > 0, squared, 1.0), 0.0, 1.0)
+        return t, np.linalg.norm(points - (a + t[:, None] * ab), axis=1)
+
+    # The edge running the other way along the same road, -1 on one-way roads
+    def twin(self, edge):
+        compact = self.graph
+        u, v = int(compact.sources[edge]), int(compact.targets[edge])
+        candidates = compact.edges_between(v, u)
+        if len(candidates) == 0:
+            return -1
+        return int(candidates[np.argmin(np.abs(self.edge_length[candidates] - self.edge_length[edge]))])
+
+    # Seeds (node, cost) for a search leaving a point on edge at fraction: forward to the head of
+    # the edge, and back to its tail when the road is two-way. With reverse=True the seeds are
+    # for a backward search arriving at the point instead.
+    def seeds(self, edge, fraction, weight='length', reverse=False):
+        compact = self.graph
+        weights = compact.weight(weight)
+        u, v = int(compact.sources[edge]), int(compact.targets[edge])
+        twin = self.twin(edge)
+        ahead, behind = (u, v) if reverse else (v, u)
+        share = fraction if reverse else 1.0 - fraction
+        result = [(ahead, share * weights[edge])]
+        if twin >= 0:
+            result.append((behind, (1.0 - share) * weights[twin]))
+        return result
+
+
+def get_edge_snapper(compact, roadgraph=None):
+    entry = _edge_snappers.get(id(compact))
+    if entry is None or entry[0] is not compact:
+        entry = (compact, EdgeSnapper(compact, roadgraph))
+        _edge_snappers[id(compact)] = entry
+    return entry[1]
+
+
+def clear_snappers():
+    _snappers.clear()
+    _edge_snappers.clear()
+
+
+# Route between two (lat, lon) points snapped onto roads rather than nodes. The search starts
+# from both ends of the origin's edge with the partial costs to reach them and stops once both
+# ends of the target's edge are settled; the last partial edge is added on the way out. Returns
+# the node route as compact indices (the end nodes of the snapped edges included), the cost, and
+# for every hop its edge and the stretch of it travelled, as fractions from the hop's tail: the
+# first and last hops are only partly driven.
+def edge_route(engine, snapper, origin_point, target_point, weight='length'):
+    compact = snapper.graph
+    weights = compact.weight(weight)
+    (edge_s, edge_t), (frac_s, frac_t) = snapper.snap([origin_point[0], target_point[0]],
+                                                      [origin_point[1], target_point[1]])
+    twin = snapper.twin(edge_s)
+    if edge_t == twin and edge_t != edge_s:
+        # Both points on the same two-way road, measure the target along the origin's edge too
+        edge_t, frac_t = edge_s, 1.0 - frac_t
+    u, v = int(compact.sources[edge_s]), int(compact.targets[edge_s])
+
+    exits = snapper.seeds(edge_t, frac_t, weight, reverse=True)
+    dist = engine.search(snapper.seeds(edge_s, frac_s, weight), weight=weight, targets=[node for node, _ in exits])
+    cost, node = min((dist[node] + share, node) for node, share in exits)
+    # Staying on the origin's road without passing a node
+    if edge_s == edge_t:
+        if frac_s <= frac_t and (frac_t - frac_s) * weights[edge_s] <= cost:
+            return [u, v], float((frac_t - frac_s) * weights[edge_s]), \
+                np.array([edge_s]), np.array([frac_s]), np.array([frac_t])
+        if frac_s > frac_t and twin >= 0 and (frac_s - frac_t) * weights[twin] <= cost:
+            return [v, u], float((frac_s - frac_t) * weights[twin]), \
+                np.array([twin]), np.array([1.0 - frac_s]), np.array([1.0 - frac_t])
+    if cost == math.inf:
+        raise nx.NetworkXNoPath("No road route between the two points.")
+    path = engine.path_to(node)
+    middle = engine.pred[path[1:]]
+    # The search started part way along the origin edge and ends part way along the target edge,
+    # the far ends of those edges frame the route
+    if path[0] == u:
+        first, first_edge, start = [v], twin, 1.0 - frac_s
+    else:
+        first, first_edge, start = [u], edge_s, frac_s
+    if node == compact.sources[edge_t]:
+        last, last_edge, end = [int(compact.targets[edge_t])], edge_t, frac_t
+    else:
+        last, last_edge, end = [int(compact.sources[edge_t])], snapper.twin(edge_t), 1.0 - frac_t
+    edges = np.r_[first_edge, middle, last_edge].astype(np.int64)
+    starts = np.zeros(len(edges))
+    ends = np.ones(len(edges))
+    starts[0], ends[-1] = start, end
+    return first + path + last, float(cost), edges, starts, ends
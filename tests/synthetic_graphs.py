@@ -0,0 +1,58 @@
+import math
+import random
+import networkx as nx
+from heuristics import EARTH_RADIUS_M
+
+
+def _meters(graph, u, v):
+    lat1, lon1 = math.radians(graph.nodes[u]['y']), math.radians(graph.nodes[u]['x'])
+    lat2, lon2 = math.radians(graph.nodes[v]['y']), math.radians(graph.nodes[v]['x'])
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(a, 1.0)))
+
+
+# Small osmnx-like road graph: OSM-style sparse node ids with x/y, one-way and two-way streets
+# whose length is at least the great-circle distance (so geodesic bounds stay admissible),
+# parallel edges, zero-length edges between co-located nodes, a self-loop, a node nothing
+# leads to and an isolated node. Every edge also has a 'type_weight' of length times a road
+# class factor.
+def random_road_graph(seed=0, n=40, extra_edges=60):
+    rng = random.Random(seed)
+    graph = nx.MultiDiGraph()
+    ids = [1000 + 7 * i for i in range(n)]
+    for osm_id in ids:
+        graph.add_node(osm_id, x=-93.25 + rng.random() * 0.04, y=44.95 + rng.random() * 0.04)
+
+    def add(u, v, stretch=None):
+        length = _meters(graph, u, v) * (stretch if stretch is not None else rng.uniform(1.0, 1.5))
+        graph.add_edge(u, v, length=length, type_weight=length * rng.choice([1.0, 1.5, 2.0, 3.0]))
+
+    # A connected backbone of two-way streets, then random one-way streets
+    core = ids[:n - 4]
+    for u, v in zip(core, core[1:]):
+        add(u, v)
+        add(v, u)
+    for _ in range(extra_edges):
+        u, v = rng.sample(core, 2)
+        add(u, v)
+    # Parallel edges between some connected pairs
+    for u, v, _ in rng.sample(list(graph.edges(keys=True)), 8):
+        add(u, v)
+    # Co-located twin of a core node, joined by zero-length edges both ways
+    twin, anchor = ids[n - 4], core[len(core) // 2]
+    graph.nodes[twin].update(x=graph.nodes[anchor]['x'], y=graph.nodes[anchor]['y'])
+    add(anchor, twin, 1.0)
+    add(twin, anchor, 1.0)
+    add(twin, core[0])
+    # Self-loop, a dead end only reachable one way, a source nothing leads to, an isolated node
+    add(core[1], core[1], 1.0)
+    graph.edges[core[1], core[1], 0]['length'] = 25.0
+    graph.edges[core[1], core[1], 0]['type_weight'] = 25.0
+    add(core[2], ids[n - 3])
+    add(ids[n - 2], core[3])
+    return graph
+
+
+def path_cost(graph, path, weight='length'):
+    # Cost of a node path taking the cheapest parallel edge of every hop, like networkx does
+    return sum(min(d[weight] for d in graph[u][v].values()) for u, v in zip(path, path[1:]))
@@ -0,0 +1,76 @@
+import networkx as nx
+import pytest
+from alternatives import alternative_routes
+from compact_graph import build_compact_graph
+from synthetic_graphs import path_cost, random_road_graph
+
+METHODS = ['plateau', 'penalty']
+
+
+# Road graph keeping only the first of parallel edges, so a node route names its edges exactly
+# and the shared cost of two routes can be measured hop by hop
+def single_edge_graph(roadgraph):
+    graph = roadgraph.copy()
+    graph.remove_edges_from([(u, v, k) for u, v, k in roadgraph.edges(keys=True) if k > 0])
+    return graph
+
+
+def shared_cost(graph, route, other, weight):
+    hops = set(zip(other, other[1:]))
+    return sum(graph[u][v][0][weight] for u, v in zip(route, route[1:]) if (u, v) in hops)
+
+
+@pytest.mark.parametrize('method', METHODS)
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('weight', ['length', 'type_weight'])
+def test_routes_are_simple_short_and_diverse(method, seed, weight):
+    roadgraph = single_edge_graph(random_road_graph(seed=seed, n=60, extra_edges=120))
+    compact = build_compact_graph(roadgraph, weights=('length', 'type_weight'))
+    max_stretch, max_overlap = 1.3, 0.6
+    found = 0
+    for source in range(0, compact.node_count, 7):
+        for target in range(1, compact.node_count, 5):
+            origin, goal = int(compact.node_ids[source]), int(compact.node_ids[target])
+            if source == target:
+                continue
+            if not nx.has_path(roadgraph, origin, goal):
+                with pytest.raises(nx.NetworkXNoPath):
+                    alternative_routes(compact, origin, goal, 4, weight, method)
+                continue
+            best = nx.shortest_path_length(roadgraph, origin, goal, weight=weight)
+            routes = alternative_routes(compact, origin, goal, 4, weight, method, max_stretch, max_overlap)
+            assert 1 <= len(routes) <= 4
+            assert path_cost(roadgraph, routes[0], weight) == pytest.approx(best)
+            costs = [path_cost(roadgraph, route, weight) for route in routes]
+            for i, (route, cost) in enumerate(zip(routes, costs)):
+                assert route[0] == origin and route[-1] == goal
+                assert len(set(route)) == len(route)
+                assert all(roadgraph.has_edge(u, v) for u, v in zip(route, route[1:]))
+                assert cost <= max_stretch * best + 1e-6
+                for other in routes[:i]:
+                    assert shared_cost(roadgraph, route, other, weight) <= max_overlap * cost + 1e-6
+            found += len(routes) - 1
+    # Some pairs do have alternatives, or the limits above were never exercised
+    assert found > 0
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_parallel_edges_and_trivial_routes(method):
+    roadgraph = random_road_graph(seed=3)
+    compact = build_compact_graph(roadgraph)
+    for target in range(1, compact.node_count):
+        origin, goal = int(compact.node_ids[0]), int(compact.node_ids[target])
+        if not nx.has_path(roadgraph, origin, goal):
+            continue
+        routes = alternative_routes(compact, origin, goal, 3, method=method)
+        assert path_cost(roadgraph, routes[0]) == pytest.approx(nx.shortest_path_length(roadgraph, origin, goal,
+                                                                                         weight='length'))
+        assert all(len(set(route)) == len(route) for route in routes)
+    origin = int(compact.node_ids[0])
+    assert alternative_routes(compact, origin, origin, method=method) == [[origin]]
+
+
+def test_unknown_method_raises():
+    compact = build_compact_graph(random_road_graph())
+    with pytest.raises(ValueError):
+        alternative_routes(compact, int(compact.node_ids[0]), int(compact.node_ids[1]), method='via')
@@ -0,0 +1,71 @@
+import networkx as nx
+import numpy as np
+import pytest
+from bellman_ford_engine import bellman_ford, bellman_ford_path, spfa
+from compact_graph import build_compact_graph
+from synthetic_graphs import path_cost, random_road_graph
+
+METHODS = ['vectorized', 'spfa']
+
+
+# Road graph with a signed 'signed' profile: length reweighted by a node potential,
+# w(u, v) + p(u) - p(v), which makes many edges negative without creating a negative cycle
+def signed_road_graph(seed):
+    roadgraph = random_road_graph(seed=seed)
+    rng = np.random.default_rng(seed)
+    potential = {node: rng.uniform(0, 2000) for node in roadgraph.nodes}
+    for u, v, d in roadgraph.edges(data=True):
+        d['signed'] = d['length'] + potential[u] - potential[v]
+    return roadgraph
+
+
+@pytest.mark.parametrize('method', METHODS)
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('weight', ['length', 'signed'])
+def test_routes_match_networkx(method, seed, weight):
+    roadgraph = signed_road_graph(seed)
+    compact = build_compact_graph(roadgraph, weights=('length', 'signed'))
+    assert weight == 'length' or compact.weight(weight).min() < 0
+    for origin in roadgraph.nodes:
+        lengths, paths = nx.single_source_bellman_ford(roadgraph, origin, weight=weight)
+        for goal in roadgraph.nodes:
+            if goal not in paths:
+                with pytest.raises(nx.NetworkXNoPath):
+                    bellman_ford_path(compact, origin, goal, weight, method)
+                continue
+            route = bellman_ford_path(compact, origin, goal, weight, method)
+            assert route == nx.bellman_ford_path(roadgraph, origin, goal, weight=weight)
+            assert path_cost(roadgraph, route, weight) == pytest.approx(lengths[goal])
+
+
+@pytest.mark.parametrize('search', [bellman_ford, spfa])
+def test_distances_match_networkx(search):
+    roadgraph = signed_road_graph(3)
+    compact = build_compact_graph(roadgraph, weights=('signed',))
+    dist, pred = search(compact, 0, 'signed')
+    expected = nx.single_source_bellman_ford_path_length(roadgraph, int(compact.node_ids[0]), weight='signed')
+    for i, osm_id in enumerate(compact.node_ids.tolist()):
+        if osm_id in expected:
+            assert dist[i] == pytest.approx(expected[osm_id])
+        else:
+            assert dist[i] == np.inf and pred[i] == -1
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_negative_cycle_raises(method):
+    roadgraph = random_road_graph(seed=4)
+    compact = build_compact_graph(roadgraph)
+    # A two-way street that pays back more than it costs
+    u, v = int(compact.node_ids[10]), int(compact.node_ids[11])
+    weights = compact.weight('length').copy()
+    weights[compact.edge_index(u, v)] = -100.0
+    weights[compact.edge_index(v, u)] = 50.0
+    compact.add_weight('length', weights)
+    with pytest.raises(nx.NetworkXUnbounded):
+        bellman_ford_path(compact, int(compact.node_ids[0]), int(compact.node_ids[1]), method=method)
+
+
+def test_unknown_method_raises():
+    compact = build_compact_graph(random_road_graph())
+    with pytest.raises(ValueError):
+        bellman_ford_path(compact, int(compact.node_ids[0]), int(compact.node_ids[1]), method='dial')
@@ -0,0 +1,111 @@
+import networkx as nx
+import numpy as np
+import pytest
+import contraction_hierarchy
+from compact_graph import build_compact_graph
+from contraction_hierarchy import build_contraction_hierarchy, load_contraction_hierarchy
+from synthetic_graphs import path_cost, random_road_graph
+
+
+def assert_matches_networkx(roadgraph, compact, hierarchy, weight):
+    for source in range(compact.node_count):
+        origin = int(compact.node_ids[source])
+        lengths, paths = nx.single_source_dijkstra(roadgraph, origin, weight=weight)
+        for target in range(compact.node_count):
+            goal = int(compact.node_ids[target])
+            if goal not in lengths:
+                with pytest.raises(nx.NetworkXNoPath):
+                    hierarchy.query(source, target)
+                continue
+            best, arcs = hierarchy.query(source, target)
+            assert best == pytest.approx(lengths[goal])
+            route = hierarchy.route(origin, goal)
+            assert route == paths[goal]
+            assert path_cost(roadgraph, route, weight) == pytest.approx(lengths[goal])
+            # The unpacked arcs are original edges that chain from source to target
+            edges = hierarchy.unpack(arcs)
+            assert compact.to_osm([source] + compact.targets[edges].tolist()) == route
+            assert compact.weight(weight)[edges].sum() == pytest.approx(best)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2, 3])
+@pytest.mark.parametrize('weight', ['length', 'type_weight'])
+def test_queries_match_networkx(seed, weight):
+    roadgraph = random_road_graph(seed=seed, n=60, extra_edges=120)
+    compact = build_compact_graph(roadgraph, weights=('length', 'type_weight'))
+    hierarchy = build_contraction_hierarchy(compact, weight)
+    assert hierarchy.shortcut_count > 0
+    assert_matches_networkx(roadgraph, compact, hierarchy, weight)
+
+
+def test_witness_limits_keep_queries_exact(monkeypatch):
+    # Witness searches cut off almost at once add superfluous shortcuts, never wrong ones
+    monkeypatch.setattr(contraction_hierarchy, 'WITNESS_SETTLE_LIMIT', 2)
+    monkeypatch.setattr(contraction_hierarchy, 'PRIORITY_SETTLE_LIMIT', 1)
+    roadgraph = random_road_graph(seed=4, n=60, extra_edges=120)
+    compact = build_compact_graph(roadgraph)
+    limited = build_contraction_hierarchy(compact)
+    assert_matches_networkx(roadgraph, compact, limited, 'length')
+
+
+def test_arc_totals_sum_other_weight_over_shortcuts():
+    roadgraph = random_road_graph(seed=5, n=60, extra_edges=120)
+    compact = build_compact_graph(roadgraph, weights=('length', 'type_weight'))
+    hierarchy = build_contraction_hierarchy(compact)
+    totals = hierarchy.arc_totals(compact.weight('type_weight'))
+    for a in range(len(hierarchy.arc_edge)):
+        edges = hierarchy.unpack([a])
+        assert totals[a] == pytest.approx(compact.weight('type_weight')[edges].sum())
+
+
+def test_save_and_load_round_trip(tmp_path):
+    roadgraph = random_road_graph(seed=6)
+    compact = build_compact_graph(roadgraph)
+    hierarchy = build_contraction_hierarchy(compact)
+    path = tmp_path / 'graph_ch.npz'
+    hierarchy.save(path)
+    loaded = load_contraction_hierarchy(path)
+    assert loaded.weight == 'length'
+    assert loaded.fingerprint == compact.fingerprint('length')
+    for name in ('rank', 'arc_source', 'arc_target', 'arc_weight', 'arc_first', 'arc_second', 'arc_edge'):
+        assert np.array_equal(getattr(loaded, name), getattr(hierarchy, name))
+    assert_matches_networkx(roadgraph, compact, loaded, 'length')
+
+
+def test_region_hierarchy_is_rebuilt_when_the_fingerprint_changes(tmp_path, monkeypatch):
+    region_graph = pytest.importorskip('region_graph')
+    roadgraph = random_road_graph(seed=7)
+    compact = build_compact_graph(roadgraph)
+    monkeypatch.setattr(region_graph, 'load_region_compact_graph', lambda *args: compact)
+    builds = []
+
+    def counting_build(graph, weight):
+        builds.append(weight)
+        return build_contraction_hierarchy(graph, weight)
+
+    monkeypatch.setattr(region_graph, 'build_contraction_hierarchy', counting_build)
+    data_file = str(tmp_path / 'locations.csv')
+    region_graph.clear_region_graphs()
+
+    # First run preprocesses and saves next to the data file
+    first = region_graph.load_region_hierarchy(data_file=data_file)
+    saved = tmp_path / 'locations_drive_0.1_length_ch.npz'
+    assert saved.exists() and builds == ['length']
+
+    # A later run on the same graph loads the saved hierarchy
+    region_graph.clear_region_graphs()
+    loaded = region_graph.load_region_hierarchy(data_file=data_file)
+    assert builds == ['length']
+    assert loaded is not first and np.array_equal(loaded.arc_weight, first.arc_weight)
+
+    # Same nodes and edges but new weights: the saved hierarchy no longer fits and is rebuilt
+    region_graph.clear_region_graphs()
+    compact.add_weight('length', compact.weight('length') * 2.0)
+    for u, v, d in roadgraph.edges(data=True):
+        d['length'] *= 2.0
+    rebuilt = region_graph.load_region_hierarchy(data_file=data_file)
+    assert builds == ['length', 'length']
+    assert rebuilt.fingerprint == compact.fingerprint('length')
+    assert load_contraction_hierarchy(saved).fingerprint == compact.fingerprint('length')
+    assert_matches_networkx(roadgraph, compact, rebuilt, 'length')
+    region_graph.clear_region_graphs()
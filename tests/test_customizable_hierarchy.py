@@ -0,0 +1,76 @@
+import math
+import networkx as nx
+import numpy as np
+import pytest
+from compact_graph import build_compact_graph
+from customizable_hierarchy import build_customizable_hierarchy, load_customizable_hierarchy, nested_dissection_order
+from dijkstra_engine import DijkstraEngine
+from synthetic_graphs import random_road_graph
+
+
+def assert_matches_dijkstra(compact, hierarchy, weight):
+    engine = DijkstraEngine(compact)
+    weights = compact.weight(weight)
+    for source in range(compact.node_count):
+        dist = engine.search([(source, 0.0)], weight=weight).copy()
+        for target in range(compact.node_count):
+            if dist[target] == math.inf:
+                with pytest.raises(nx.NetworkXNoPath):
+                    hierarchy.query(source, target)
+                continue
+            best, arcs = hierarchy.query(source, target)
+            assert best == pytest.approx(dist[target])
+            edges = hierarchy.unpack(arcs)
+            assert np.isfinite(weights[edges]).all()
+            assert weights[edges].sum() == pytest.approx(dist[target])
+            path = hierarchy.shortest_path(source, target)
+            assert path == [source] + compact.targets[edges].tolist()
+            assert len(set(path)) == len(path)
+
+
+@pytest.fixture(params=[0, 1, 2])
+def compact(request):
+    roadgraph = random_road_graph(seed=request.param, n=60, extra_edges=120)
+    compact = build_compact_graph(roadgraph, weights=('length', 'type_weight'))
+    # A profile that closes some roads: inf edges must never be used, and the nodes only they
+    # reach become unreachable
+    closed = np.random.default_rng(request.param).random(compact.edge_count) < 0.2
+    compact.add_weight('closures', np.where(closed, np.inf, compact.weight('length')))
+    return compact
+
+
+@pytest.mark.parametrize('leaf_size', [64, 4])
+def test_one_hierarchy_customized_for_several_profiles(compact, leaf_size):
+    order = nested_dissection_order(compact, leaf_size=leaf_size)
+    assert np.array_equal(np.sort(order), np.arange(compact.node_count))
+    hierarchy = build_customizable_hierarchy(compact, order)
+    for weight in ('length', 'type_weight', 'closures'):
+        assert_matches_dijkstra(compact, hierarchy.customize(compact, weight), weight)
+
+
+def test_customized_routes_match_networkx():
+    roadgraph = random_road_graph(seed=3, n=60, extra_edges=120)
+    compact = build_compact_graph(roadgraph, weights=('length', 'type_weight'))
+    hierarchy = build_customizable_hierarchy(compact)
+    for weight in ('length', 'type_weight'):
+        customized = hierarchy.customize(compact, weight)
+        for origin in roadgraph.nodes:
+            paths = nx.single_source_dijkstra_path(roadgraph, origin, weight=weight)
+            for goal, path in paths.items():
+                assert customized.route(origin, goal) == path
+
+
+def test_customize_rejects_another_graph():
+    hierarchy = build_customizable_hierarchy(build_compact_graph(random_road_graph(seed=0)))
+    other = build_compact_graph(random_road_graph(seed=0, n=41))
+    with pytest.raises(ValueError):
+        hierarchy.customize(other, 'length')
+
+
+def test_save_and_load_round_trip(compact, tmp_path):
+    hierarchy = build_customizable_hierarchy(compact)
+    path = tmp_path / 'graph_cch.npz'
+    hierarchy.save(path)
+    loaded = load_customizable_hierarchy(path)
+    assert loaded.fingerprint == compact.fingerprint()
+    assert_matches_dijkstra(compact, loaded.customize(compact, 'closures'), 'closures')
@@ -0,0 +1,103 @@
+import networkx as nx
+import numpy as np
+import pytest
+from compact_graph import build_compact_graph
+from dijkstra_engine import DijkstraEngine, dijkstra_path, dijkstra_paths
+from heuristics import make_heuristic
+from synthetic_graphs import path_cost, random_road_graph
+
+
+@pytest.fixture(params=[0, 1, 2])
+def roadgraph(request):
+    return random_road_graph(seed=request.param)
+
+
+@pytest.mark.parametrize('weight', ['length', 'type_weight'])
+def test_routes_match_networkx(roadgraph, weight):
+    compact = build_compact_graph(roadgraph, weights=('length', 'type_weight'))
+    nodes = sorted(roadgraph.nodes)
+    # One engine for every query, so stale buffers from earlier searches would show up
+    for origin in nodes:
+        for target in nodes:
+            try:
+                expected = nx.shortest_path(roadgraph, origin, target, weight=weight, method='dijkstra')
+            except nx.NetworkXNoPath:
+                with pytest.raises(nx.NetworkXNoPath):
+                    dijkstra_path(compact, origin, target, weight)
+                continue
+            route = dijkstra_path(compact, origin, target, weight)
+            assert route == expected
+            assert path_cost(roadgraph, route, weight) == pytest.approx(
+                nx.shortest_path_length(roadgraph, origin, target, weight=weight))
+
+
+@pytest.mark.parametrize('mode', ['bidirectional', 'bidirectional_astar', 'astar'])
+@pytest.mark.parametrize('weight', ['length', 'type_weight'])
+def test_goal_directed_modes_match_networkx(roadgraph, mode, weight):
+    compact = build_compact_graph(roadgraph, weights=('length', 'type_weight'))
+    engine = DijkstraEngine(compact)
+    heuristic = make_heuristic(compact, weight) if mode != 'bidirectional' else None
+    search = engine.astar if mode == 'astar' else engine.bidirectional
+    for source in range(compact.node_count):
+        for target in range(compact.node_count):
+            origin, goal = int(compact.node_ids[source]), int(compact.node_ids[target])
+            try:
+                expected = nx.shortest_path_length(roadgraph, origin, goal, weight=weight)
+            except nx.NetworkXNoPath:
+                with pytest.raises(nx.NetworkXNoPath):
+                    search(source, target, weight=weight, heuristic=heuristic)
+                continue
+            route = compact.to_osm(search(source, target, weight=weight, heuristic=heuristic))
+            assert route == nx.shortest_path(roadgraph, origin, goal, weight=weight)
+            assert path_cost(roadgraph, route, weight) == pytest.approx(expected)
+
+
+def test_shortest_path_length(roadgraph):
+    compact = build_compact_graph(roadgraph)
+    engine = DijkstraEngine(compact)
+    expected = nx.single_source_dijkstra_path_length(roadgraph, compact.node_ids[0], weight='length')
+    for target in range(compact.node_count):
+        osm_id = int(compact.node_ids[target])
+        if osm_id in expected:
+            assert engine.shortest_path_length(0, target) == pytest.approx(expected[osm_id])
+        else:
+            with pytest.raises(nx.NetworkXNoPath):
+                engine.shortest_path_length(0, target)
+
+
+def test_one_to_many_leaves_out_unreachable_targets(roadgraph):
+    compact = build_compact_graph(roadgraph)
+    origin = int(compact.node_ids[0])
+    targets = compact.node_ids.tolist()
+    expected = nx.single_source_dijkstra_path(roadgraph, origin, weight='length')
+    assert dijkstra_paths(compact, origin, targets) == expected
+
+
+def test_path_totals_sum_other_weight_along_tree(roadgraph):
+    compact = build_compact_graph(roadgraph, weights=('length', 'type_weight'))
+    engine = DijkstraEngine(compact)
+    engine.search([(0, 0.0)], weight='length')
+    totals = engine.path_totals(compact.weight('type_weight'), np.arange(compact.node_count))
+    for target in range(compact.node_count):
+        if np.isinf(engine.dist[target]):
+            assert np.isnan(totals[target])
+            continue
+        edges = []
+        e = engine.pred[target]
+        while e >= 0:
+            edges.append(e)
+            e = engine.pred[compact.sources[e]]
+        assert totals[target] == pytest.approx(compact.weight('type_weight')[edges].sum())
+
+
+def test_source_equals_target():
+    roadgraph = random_road_graph()
+    compact = build_compact_graph(roadgraph)
+    origin = int(compact.node_ids[5])
+    assert dijkstra_path(compact, origin, origin) == [origin]
+
+
+def test_unknown_node_raises():
+    compact = build_compact_graph(random_road_graph())
+    with pytest.raises(KeyError):
+        dijkstra_path(compact, 1, int(compact.node_ids[0]))
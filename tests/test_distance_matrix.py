@@ -0,0 +1,67 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+pytest.importorskip('osmnx')  # distance_matrix loads the region graph through region_graph
+from compact_graph import build_compact_graph
+from contraction_hierarchy import build_contraction_hierarchy
+from distance_matrix import bucket_matrix, one_to_many_matrix
+from synthetic_graphs import random_road_graph
+
+
+# Both tables by one networkx Dijkstra per source, the secondary weight summed along its routes
+def networkx_matrix(roadgraph, compact, sources, targets, weight, other):
+    primary = np.full((len(sources), len(targets)), np.inf)
+    secondary = np.full((len(sources), len(targets)), np.inf)
+    for i, source in enumerate(sources):
+        lengths, paths = nx.single_source_dijkstra(roadgraph, int(compact.node_ids[source]), weight=weight)
+        for j, target in enumerate(targets):
+            goal = int(compact.node_ids[target])
+            if goal in lengths:
+                primary[i, j] = lengths[goal]
+                path = paths[goal]
+                secondary[i, j] = sum(min(roadgraph[u][v].values(), key=lambda d: d[weight])[other]
+                                      for u, v in zip(path, path[1:]))
+    return primary, secondary
+
+
+def assert_tables_equal(found, expected):
+    assert np.array_equal(np.isinf(found), np.isinf(expected))
+    finite = np.isfinite(expected)
+    assert found[finite] == pytest.approx(expected[finite])
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('weight, other', [('length', 'type_weight'), ('type_weight', 'length')])
+def test_bucket_matrix_matches_dijkstra(seed, weight, other):
+    roadgraph = random_road_graph(seed=seed, n=60, extra_edges=120)
+    compact = build_compact_graph(roadgraph, weights=('length', 'type_weight'))
+    hierarchy = build_contraction_hierarchy(compact, weight)
+    rng = np.random.default_rng(seed)
+    sources = rng.choice(compact.node_count, 15, replace=False)
+    targets = np.r_[rng.choice(compact.node_count, 20, replace=False), sources[:3]]
+    expected = networkx_matrix(roadgraph, compact, sources, targets, weight, other)
+    primary, secondary = bucket_matrix(hierarchy, sources, targets, hierarchy.arc_totals(compact.weight(other)))
+    assert_tables_equal(primary, expected[0])
+    assert_tables_equal(secondary, expected[1])
+    # The primary table does not depend on the arc values
+    assert_tables_equal(bucket_matrix(hierarchy, sources, targets)[0], expected[0])
+
+
+@pytest.mark.parametrize('processes', [None, 2])
+def test_one_to_many_matrix_matches_dijkstra(processes):
+    roadgraph = random_road_graph(seed=3, n=60, extra_edges=120)
+    compact = build_compact_graph(roadgraph, weights=('length', 'type_weight'))
+    sources = np.arange(0, compact.node_count, 4)
+    targets = np.arange(1, compact.node_count, 3)
+    expected = networkx_matrix(roadgraph, compact, sources, targets, 'length', 'type_weight')
+    primary, secondary = one_to_many_matrix(compact, sources, targets, 'length', 'type_weight', processes)
+    assert_tables_equal(primary, expected[0])
+    assert_tables_equal(secondary, expected[1])
+
+
+def test_empty_sides_give_empty_tables():
+    compact = build_compact_graph(random_road_graph())
+    hierarchy = build_contraction_hierarchy(compact)
+    primary, secondary = bucket_matrix(hierarchy, [], [0, 1])
+    assert primary.shape == secondary.shape == (0, 2)
@@ -0,0 +1,54 @@
+import networkx as nx
+import numpy as np
+import pytest
+from compact_graph import build_compact_graph
+from dynamic_sssp import DynamicShortestPaths, traffic_updates
+from synthetic_graphs import random_road_graph
+
+
+def assert_matches_networkx(roadgraph, tree, origin):
+    lengths, paths = nx.single_source_dijkstra(roadgraph, origin, weight='length')
+    for i, osm_id in enumerate(tree.graph.node_ids.tolist()):
+        # networkx walks closed (inf) roads at infinite cost, the tree leaves those nodes unreached
+        if lengths.get(osm_id, np.inf) < np.inf:
+            assert tree.dist[i] == pytest.approx(lengths[osm_id])
+            assert tree.route(osm_id) == paths[osm_id]
+        else:
+            assert tree.dist[i] == np.inf
+            with pytest.raises(nx.NetworkXNoPath):
+                tree.route(osm_id)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_repaired_tree_matches_a_fresh_search(seed):
+    roadgraph = random_road_graph(seed=seed)
+    compact = build_compact_graph(roadgraph)
+    rng = np.random.default_rng(seed)
+    tree = DynamicShortestPaths(compact, 0)
+    origin = int(compact.node_ids[0])
+    assert_matches_networkx(roadgraph, tree, origin)
+    # (u, v, key) of every edge in CSR order
+    edges = [(int(compact.node_ids[u]), int(compact.node_ids[v]), int(k))
+             for u, v, k in zip(compact.sources.tolist(), compact.targets.tolist(), compact.keys.tolist())]
+    for _ in range(15):
+        # Jams, cleared jams and closed roads in one batch, always hitting one edge of the tree
+        tree_edge = int(rng.choice(tree.pred[tree.pred >= 0]))
+        picked = set(rng.choice(len(edges), 5, replace=False).tolist()) | {tree_edge}
+        batch = [edges[i] for i in sorted(picked)]
+        factors = rng.choice([0.3, 0.8, 1.5, 4.0, np.inf], len(batch))
+        for (u, v, k), factor in zip(batch, factors):
+            data = roadgraph[u][v][k]
+            data['length'] = data['length'] * factor if factor < np.inf else np.inf
+        before = tree.dist.copy()
+        changed = tree.apply_traffic_updates(*traffic_updates(compact, roadgraph, batch, 'length'))
+        assert_matches_networkx(roadgraph, tree, origin)
+        assert set(changed.tolist()) == set(np.flatnonzero(before != tree.dist).tolist())
+    # The graph's own profile is left alone, updates go to the tree's copy
+    assert np.array_equal(compact.weight('length'), build_compact_graph(random_road_graph(seed=seed)).weight('length'))
+
+
+def test_negative_weights_are_rejected():
+    compact = build_compact_graph(random_road_graph())
+    tree = DynamicShortestPaths(compact, 0)
+    with pytest.raises(ValueError):
+        tree.apply_traffic_updates([0], [-1.0])
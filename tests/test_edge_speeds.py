@@ -0,0 +1,35 @@
+import math
+import numpy as np
+import pytest
+from compact_graph import build_compact_graph
+from edge_speeds import KPH_PER_MPH, METERS_PER_MILE, add_speed_weights, parse_maxspeed
+from synthetic_graphs import random_road_graph
+
+
+@pytest.mark.parametrize('value, mph', [('30 mph', 30.0), ('50', 50 / KPH_PER_MPH), (['25 mph', '35 mph'], 30.0),
+                                        ('20 mph;40 mph', 30.0), (80, 80 / KPH_PER_MPH)])
+def test_parse_maxspeed(value, mph):
+    assert parse_maxspeed(value) == pytest.approx(mph)
+
+
+@pytest.mark.parametrize('value', [None, 'none', 'signals', '0', -10, []])
+def test_unparsable_maxspeed_is_nan(value):
+    assert math.isnan(parse_maxspeed(value))
+
+
+def test_minutes_do_not_overwrite_the_osmnx_travel_time():
+    roadgraph = random_road_graph(seed=0)
+    for i, (u, v, d) in enumerate(roadgraph.edges(data=True)):
+        d['highway'] = 'primary' if i % 2 else 'residential'
+        if i % 3 == 0:
+            d['maxspeed'] = '45 mph' if i % 2 else '25 mph'
+        d['travel_time'] = 12.5  # seconds, as ox.add_edge_travel_times sets it
+    compact = build_compact_graph(roadgraph)
+    minutes = add_speed_weights(compact, roadgraph)
+    speeds = compact.weight('speed_mph')
+    assert np.allclose(minutes, compact.weight('length') / METERS_PER_MILE / speeds * 60)
+    # Unposted edges take the mean posted speed of their road type
+    assert set(np.round(speeds, 6).tolist()) == {25.0, 45.0}
+    for u, v, d in roadgraph.edges(data=True):
+        assert d['travel_time'] == 12.5
+        assert d['travel_time_min'] == pytest.approx(d['length'] / METERS_PER_MILE / d['speed_mph'] * 60)
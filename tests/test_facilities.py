@@ -0,0 +1,65 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+pytest.importorskip('osmnx')  # facilities loads the region graph through region_graph
+from compact_graph import build_compact_graph
+from facilities import facility_partition
+from snapping import get_snapper
+from synthetic_graphs import random_road_graph
+
+
+# Cost between every facility and every node, one networkx search per facility
+def per_facility_costs(roadgraph, compact, facilities, weight, direction):
+    graph = roadgraph if direction == 'from' else roadgraph.reverse()
+    costs = np.full((len(facilities), compact.node_count), np.inf)
+    for i, facility in enumerate(facilities):
+        lengths = nx.single_source_dijkstra_path_length(graph, int(compact.node_ids[facility]), weight=weight)
+        for j, osm_id in enumerate(compact.node_ids.tolist()):
+            costs[i, j] = lengths.get(osm_id, np.inf)
+    return costs
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('direction', ['from', 'to'])
+@pytest.mark.parametrize('weight', ['length', 'type_weight'])
+def test_partition_matches_per_facility_searches(seed, direction, weight):
+    roadgraph = random_road_graph(seed=seed, n=60, extra_edges=120)
+    compact = build_compact_graph(roadgraph, weights=('length', 'type_weight'))
+    facilities = np.random.default_rng(seed).choice(compact.node_count, 5, replace=False)
+    costs = per_facility_costs(roadgraph, compact, facilities, weight, direction)
+    partition = facility_partition(compact, facilities, weight, direction)
+    nodes = np.arange(compact.node_count)
+    best = costs.min(axis=0)
+    reached = np.isfinite(best)
+    assert np.array_equal(partition.cost[~reached], best[~reached])
+    assert partition.cost[reached] == pytest.approx(best[reached])
+    assert np.all(partition.owner[~reached] == -1)
+    # The owner is a facility at the minimum cost
+    owner = partition.owner[reached]
+    assert np.all(owner >= 0)
+    assert costs[owner, nodes[reached]] == pytest.approx(best[reached])
+    assert np.array_equal(partition.owner[facilities], np.arange(len(facilities)))
+    assert np.array_equal(partition.assign_nodes(facilities)[1], np.zeros(len(facilities)))
+
+
+def test_shared_node_belongs_to_the_first_facility():
+    compact = build_compact_graph(random_road_graph())
+    partition = facility_partition(compact, [4, 9, 4], 'length')
+    assert partition.owner[4] == 0 and partition.owner[9] == 1
+
+
+def test_assign_snaps_points():
+    compact = build_compact_graph(random_road_graph(seed=1))
+    facilities = [0, 12, 25]
+    with pytest.raises(ValueError):
+        facility_partition(compact, facilities, 'length').assign(compact.y[:3], compact.x[:3])
+    partition = facility_partition(compact, facilities, 'length', snap=get_snapper(compact).snap)
+    owner, cost = partition.assign(compact.y, compact.x)
+    assert np.array_equal(owner, partition.owner) and np.array_equal(cost, partition.cost)
+
+
+def test_unknown_direction_raises():
+    compact = build_compact_graph(random_road_graph())
+    with pytest.raises(ValueError):
+        facility_partition(compact, [0], 'length', direction='both')
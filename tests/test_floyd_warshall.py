@@ -0,0 +1,61 @@
+import networkx as nx
+import numpy as np
+import pytest
+from compact_graph import build_compact_graph
+from dijkstra_engine import DijkstraEngine
+from synthetic_graphs import random_road_graph
+
+pytest.importorskip('osmnx')  # floyd_warshall reads the data file's locations through region_graph
+from floyd_warshall import blocked_floyd_warshall, build_poi_subgraph  # noqa: E402
+
+
+@pytest.mark.parametrize('n, block', [(1, 64), (10, 3), (70, 64), (70, 16)])
+def test_blocked_kernel_matches_networkx(n, block):
+    rng = np.random.default_rng(n)
+    dist = np.where(rng.random((n, n)) < 0.3, rng.uniform(0, 100, (n, n)), np.inf)
+    np.fill_diagonal(dist, 0.0)
+    graph = nx.DiGraph()
+    graph.add_nodes_from(range(n))
+    graph.add_weighted_edges_from((i, j, dist[i, j]) for i, j in zip(*np.nonzero(np.isfinite(dist))) if i != j)
+    expected = nx.floyd_warshall_numpy(graph, nodelist=range(n))
+    assert np.allclose(blocked_floyd_warshall(dist, block), expected)
+
+
+def test_negative_cycle_raises():
+    dist = np.array([[0.0, 1.0, np.inf], [np.inf, 0.0, -3.0], [1.0, np.inf, 0.0]])
+    with pytest.raises(nx.NetworkXUnbounded):
+        blocked_floyd_warshall(dist, block=2)
+
+
+def dijkstra_matrix(compact, pois, weight):
+    engine = DijkstraEngine(compact)
+    return np.array([engine.search([(p, 0.0)], weight=weight)[pois] for p in pois])
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('extra_edges', [10, 100])
+def test_poi_matrix_is_exact_for_every_profile(seed, extra_edges):
+    compact = build_compact_graph(random_road_graph(seed=seed, n=80, extra_edges=extra_edges),
+                                  weights=('length', 'type_weight'))
+    pois = np.random.default_rng(seed).choice(compact.node_count, 8, replace=False)
+    subgraph = build_poi_subgraph(compact, pois)
+    # One reduced graph, built without a search, serves every profile
+    for weight in ('length', 'type_weight'):
+        assert np.allclose(subgraph.poi_matrix(compact, weight, block=5), dijkstra_matrix(compact, pois, weight))
+    compact.add_weight('length', compact.weight('length') * np.random.default_rng(seed).uniform(1, 3, compact.edge_count))
+    assert np.allclose(subgraph.poi_matrix(compact, 'length'), dijkstra_matrix(compact, pois, 'length'))
+
+
+def test_sparse_graph_shrinks_to_junctions_and_pois():
+    compact = build_compact_graph(random_road_graph(seed=4, n=80, extra_edges=5))
+    pois = np.array([0, 40, 70])
+    subgraph = build_poi_subgraph(compact, pois)
+    assert subgraph.node_count < compact.node_count // 2
+    assert np.array_equal(subgraph.nodes[subgraph.pois], pois)
+    assert np.allclose(subgraph.poi_matrix(compact), dijkstra_matrix(compact, pois, 'length'))
+
+
+def test_too_large_reduction_raises():
+    compact = build_compact_graph(random_road_graph(seed=5, n=80, extra_edges=100))
+    with pytest.raises(ValueError):
+        build_poi_subgraph(compact, [0, 1, 2], max_nodes=5)
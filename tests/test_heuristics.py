@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+from compact_graph import build_compact_graph
+from dijkstra_engine import DijkstraEngine
+from heuristics import BoundHeuristic, make_heuristic
+from landmarks import LandmarkHeuristic
+from synthetic_graphs import random_road_graph
+
+
+def test_incomplete_bound_heuristic_fails_at_construction():
+    class TargetOnly(BoundHeuristic):
+        def bounds_to(self, target):
+            return np.zeros(self.graph.node_count)
+
+    compact = build_compact_graph(random_road_graph())
+    with pytest.raises(TypeError):
+        TargetOnly(compact)
+
+
+@pytest.mark.parametrize('kind', ['geodesic', 'landmarks'])
+@pytest.mark.parametrize('weight', ['length', 'type_weight'])
+def test_bounds_never_exceed_distances(kind, weight):
+    compact = build_compact_graph(random_road_graph(seed=1), weights=('length', 'type_weight'))
+    if kind == 'geodesic':
+        heuristic = make_heuristic(compact, weight)
+    else:
+        heuristic = LandmarkHeuristic(compact, weight=weight, count=4)
+    engine = DijkstraEngine(compact)
+    for source in range(compact.node_count):
+        dist = engine.search([(source, 0.0)], weight=weight)
+        reached = np.isfinite(dist)
+        assert np.all(heuristic.bounds_from(source)[reached] <= dist[reached] + 1e-6)
+        assert np.all([heuristic(source, v) <= dist[v] + 1e-6 for v in np.flatnonzero(reached).tolist()])
@@ -0,0 +1,41 @@
+import networkx as nx
+import numpy as np
+import pytest
+import shapely
+
+pytest.importorskip('osmnx')  # isochrones loads the region graph through region_graph
+from compact_graph import build_compact_graph
+from isochrones import isochrone_polygon, isochrones, reachable_nodes
+from synthetic_graphs import random_road_graph
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('weight', ['length', 'type_weight'])
+@pytest.mark.parametrize('source_count', [1, 3])
+def test_bands_match_plain_dijkstra(seed, weight, source_count):
+    roadgraph = random_road_graph(seed=seed, n=60, extra_edges=120)
+    compact = build_compact_graph(roadgraph, weights=('length', 'type_weight'))
+    sources = np.random.default_rng(seed).choice(compact.node_count, source_count, replace=False)
+    lengths = nx.multi_source_dijkstra_path_length(roadgraph, set(compact.node_ids[sources].tolist()),
+                                                   weight=weight)
+    bands = [1500.0, 500.0, 3000.0]
+    areas = isochrones(compact, sources if source_count > 1 else int(sources[0]), bands, weight)
+    assert list(areas) == sorted(bands)
+    for band, nodes in areas.items():
+        expected = {osm_id for osm_id, cost in lengths.items() if cost <= band}
+        assert set(compact.to_osm(nodes)) == expected
+        assert len(nodes) == len(expected)
+
+    nodes, times = reachable_nodes(compact, sources, 3000.0, weight)
+    assert np.all(np.diff(times) >= 0)
+    assert times == pytest.approx([lengths[osm_id] for osm_id in compact.to_osm(nodes)])
+
+
+def test_polygons_cover_their_nodes():
+    compact = build_compact_graph(random_road_graph(seed=3))
+    nodes = isochrones(compact, 0, [2000.0], 'length')[2000.0]
+    points = shapely.points(compact.x[nodes], compact.y[nodes])
+    for concavity in (None, 0.3):
+        polygon = isochrone_polygon(compact, nodes, concavity)
+        assert np.all(shapely.intersects(polygon, points))
+    assert isochrone_polygon(compact, nodes, 0.3).area <= isochrone_polygon(compact, nodes).area + 1e-12
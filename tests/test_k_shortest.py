@@ -0,0 +1,55 @@
+from itertools import islice
+import networkx as nx
+import pytest
+from compact_graph import build_compact_graph
+from k_shortest import k_shortest_paths, k_shortest_routes
+from synthetic_graphs import path_cost, random_road_graph
+
+
+# nx.shortest_simple_paths does not take multigraphs: keep the cheapest of parallel edges
+def simple_digraph(roadgraph, weight):
+    graph = nx.DiGraph()
+    for u, v, d in roadgraph.edges(data=True):
+        if u != v and (not graph.has_edge(u, v) or d[weight] < graph[u][v][weight]):
+            graph.add_edge(u, v, **{weight: d[weight]})
+    return graph
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('weight', ['length', 'type_weight'])
+def test_costs_match_networkx(seed, weight):
+    roadgraph = random_road_graph(seed=seed)
+    compact = build_compact_graph(roadgraph, weights=('length', 'type_weight'))
+    graph = simple_digraph(roadgraph, weight)
+    k = 6
+    for source in range(0, compact.node_count, 5):
+        for target in range(1, compact.node_count, 3):
+            origin, goal = int(compact.node_ids[source]), int(compact.node_ids[target])
+            if source == target:
+                continue
+            if not nx.has_path(graph, origin, goal):
+                with pytest.raises(nx.NetworkXNoPath):
+                    k_shortest_paths(compact, source, target, k, weight)
+                continue
+            expected = [path_cost(roadgraph, path, weight)
+                        for path in islice(nx.shortest_simple_paths(graph, origin, goal, weight=weight), k)]
+            found = k_shortest_paths(compact, source, target, k, weight)
+            assert [cost for cost, _ in found] == pytest.approx(expected)
+            routes = [compact.to_osm(path) for _, path in found]
+            assert len(set(map(tuple, routes))) == len(routes)
+            for (cost, _), route in zip(found, routes):
+                assert route[0] == origin and route[-1] == goal
+                assert len(set(route)) == len(route)
+                assert path_cost(roadgraph, route, weight) == pytest.approx(cost)
+            assert routes[0] == nx.shortest_path(roadgraph, origin, goal, weight=weight)
+
+
+def test_routes_on_osm_ids():
+    roadgraph = random_road_graph(seed=3)
+    compact = build_compact_graph(roadgraph)
+    origin, goal = int(compact.node_ids[0]), int(compact.node_ids[20])
+    routes = k_shortest_routes(compact, origin, goal, k=4)
+    expected = list(islice(nx.shortest_simple_paths(simple_digraph(roadgraph, 'length'), origin, goal,
+                                                    weight='length'), 4))
+    assert [path_cost(roadgraph, r) for r in routes] == pytest.approx([path_cost(roadgraph, p) for p in expected])
+    assert k_shortest_routes(compact, origin, origin) == [[origin]]
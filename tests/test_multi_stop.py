@@ -0,0 +1,73 @@
+from itertools import permutations
+import numpy as np
+import pytest
+
+pytest.importorskip('osmnx')  # multi_stop builds its matrices on the region graph through region_graph
+from multi_stop import nearest_neighbour_order, or_opt, sequence_cost, solve_tour, stitch_route, two_opt
+
+
+# Asymmetric stop-to-stop matrix: distances between random points plus a one-way detour per pair
+def random_costs(seed, n):
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(0, 1000, (n, 2))
+    cost = np.linalg.norm(points[:, None] - points[None, :], axis=2) + rng.uniform(0, 300, (n, n))
+    np.fill_diagonal(cost, 0.0)
+    return cost
+
+
+def closed_cost(cost, order):
+    return sequence_cost(cost, order + [order[0]])
+
+
+@pytest.mark.parametrize('seed', range(6))
+@pytest.mark.parametrize('improve', [two_opt, or_opt])
+def test_moves_keep_the_ends_and_never_cost_more(seed, improve):
+    cost = random_costs(seed, 12)
+    # A random closed tour from 0 and a random open one from 0 to 11
+    middle = (np.random.default_rng(seed).permutation(10) + 1).tolist()
+    for seq in ([0] + middle + [11, 0], [0] + middle + [11]):
+        result = improve(cost, seq)
+        assert result[0] == seq[0] and result[-1] == seq[-1]
+        assert sorted(result[1:-1]) == sorted(seq[1:-1])
+        assert sequence_cost(cost, result) <= sequence_cost(cost, seq) + 1e-9
+
+
+@pytest.mark.parametrize('seed', range(6))
+@pytest.mark.parametrize('closed', [True, False])
+@pytest.mark.parametrize('start', [0, 3])
+def test_tour_is_a_permutation_with_its_cost(seed, closed, start):
+    n = 15
+    cost = random_costs(seed, n)
+    order, total = solve_tour(cost, start, closed)
+    assert order[0] == start
+    assert sorted(order) == list(range(n))
+    assert total == pytest.approx(closed_cost(cost, order) if closed else sequence_cost(cost, order))
+    greedy = nearest_neighbour_order(cost, start)
+    assert total <= (closed_cost(cost, greedy) if closed else sequence_cost(cost, greedy)) + 1e-9
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_small_tours_are_close_to_optimal(seed):
+    n = 7
+    cost = random_costs(seed, n)
+    best = min(closed_cost(cost, [0] + list(rest)) for rest in permutations(range(1, n)))
+    order, total = solve_tour(cost, 0)
+    assert total == pytest.approx(closed_cost(cost, order))
+    assert total <= 1.1 * best
+
+
+def test_unreachable_pairs_are_avoided():
+    cost = random_costs(7, 10)
+    # Stop 4 can only be left towards stop 5
+    cost[4, :] = np.inf
+    cost[4, 4], cost[4, 5] = 0.0, 100.0
+    order, total = solve_tour(cost, 0)
+    assert sorted(order) == list(range(10))
+    assert order[order.index(4) + 1] == 5
+    assert total == pytest.approx(closed_cost(cost, order))
+
+
+def test_trivial_tours_and_stitching():
+    assert solve_tour(np.zeros((1, 1))) == ([0], 0.0)
+    assert solve_tour(np.zeros((0, 0))) == ([], 0.0)
+    assert stitch_route([[1, 2, 3], [3, 4], [4, 1]]) == [1, 2, 3, 4, 1]
@@ -0,0 +1,95 @@
+import networkx as nx
+import numpy as np
+import pytest
+import shapely
+from compact_graph import build_compact_graph
+from edge_speeds import DEFAULT_SPEED_MPH, METERS_PER_MILE, add_speed_weights
+from route_metrics import route_edges, route_metrics, summarize_edges, summarize_route
+from synthetic_graphs import random_road_graph
+
+
+# Road graph with posted speeds on some edges and the speed_mph and travel_time_min profiles
+def timed_road_graph(seed=0):
+    roadgraph = random_road_graph(seed=seed)
+    for i, (u, v, d) in enumerate(roadgraph.edges(data=True)):
+        d['highway'] = 'primary' if i % 2 else 'residential'
+        if i % 3 == 0:
+            d['maxspeed'] = ['25 mph', '35 mph', '45 mph', '60 mph'][i % 4]
+    compact = build_compact_graph(roadgraph, weights=('length', 'type_weight'))
+    add_speed_weights(compact, roadgraph)
+    return roadgraph, compact
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('weight', ['length', 'type_weight', 'travel_time_min'])
+def test_route_edges_take_the_cheapest_parallel_edge(seed, weight):
+    roadgraph, compact = timed_road_graph(seed)
+    weights = compact.weight(weight)
+    origin = int(compact.node_ids[0])
+    for route in nx.single_source_dijkstra_path(roadgraph, origin, weight=weight).values():
+        if len(route) < 2:
+            continue
+        path = compact.indices_of(route)
+        edges = route_edges(compact, path, weight)
+        assert compact.sources[edges].tolist() == path[:-1].tolist()
+        assert compact.targets[edges].tolist() == path[1:].tolist()
+        cheapest = [min(d[weight] for d in roadgraph[u][v].values()) for u, v in zip(route, route[1:])]
+        assert weights[edges] == pytest.approx(cheapest)
+
+
+def test_hop_without_an_edge_raises():
+    roadgraph, compact = timed_road_graph()
+    u = int(compact.node_ids[0])
+    v = next(node for node in roadgraph.nodes if node != u and not roadgraph.has_edge(u, node))
+    with pytest.raises(ValueError):
+        route_edges(compact, compact.indices_of([u, v]))
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_summary_matches_the_edge_attributes(seed):
+    roadgraph, compact = timed_road_graph(seed)
+    origin = int(compact.node_ids[0])
+    for route in nx.single_source_dijkstra_path(roadgraph, origin, weight='length').values():
+        if len(route) < 2:
+            continue
+        data = [min(roadgraph[u][v].values(), key=lambda d: d['length']) for u, v in zip(route, route[1:])]
+        lengths = np.array([d['length'] for d in data])
+        summary = summarize_route(compact, route, 'length')
+        assert summary.distance_mi == pytest.approx(lengths.sum() / METERS_PER_MILE)
+        assert summary.travel_time_min == pytest.approx(sum(d['travel_time_min'] for d in data))
+        if lengths.sum() > 0:
+            speeds = np.array([d['speed_mph'] for d in data])
+            assert summary.average_speed_mph == pytest.approx(np.dot(lengths, speeds) / lengths.sum())
+        long, lat, distance, minutes, speed = route_metrics(compact, route)
+        assert long == [roadgraph.nodes[n]['x'] for n in route] and lat == [roadgraph.nodes[n]['y'] for n in route]
+        assert (distance, minutes, speed) == (summary.distance_mi, summary.travel_time_min, summary.average_speed_mph)
+
+
+def test_partly_driven_edges_count_their_share():
+    roadgraph, compact = timed_road_graph(3)
+    route = nx.shortest_path(roadgraph, int(compact.node_ids[0]), int(compact.node_ids[20]), weight='length')
+    path = compact.indices_of(route)
+    edges = route_edges(compact, path)
+    starts = np.zeros(len(edges))
+    ends = np.ones(len(edges))
+    starts[0], ends[-1] = 0.25, 0.6
+    shares = ends - starts
+    whole = summarize_edges(compact, path, edges)
+    partial = summarize_edges(compact, path, edges, starts, ends, geometry=True)
+    lengths = compact.weight('length')[edges]
+    assert partial.distance_mi == pytest.approx(np.dot(lengths, shares) / METERS_PER_MILE)
+    assert partial.travel_time_min == pytest.approx(np.dot(compact.weight('travel_time_min')[edges], shares))
+    assert partial.distance_mi < whole.distance_mi
+    # The line starts and ends part way along the first and last straight edges
+    xy = np.column_stack([compact.x[path], compact.y[path]])
+    coords = shapely.get_coordinates(partial.geometry)
+    assert coords[0] == pytest.approx(xy[0] + 0.25 * (xy[1] - xy[0]))
+    assert coords[-1] == pytest.approx(xy[-2] + 0.6 * (xy[-1] - xy[-2]))
+    assert len(coords) == len(path)
+
+
+def test_single_node_route():
+    _, compact = timed_road_graph()
+    summary = summarize_route(compact, [int(compact.node_ids[5])], geometry=True)
+    assert (summary.distance_mi, summary.travel_time_min, summary.average_speed_mph) == (0.0, 0.0, DEFAULT_SPEED_MPH)
+    assert len(summary.edges) == 0 and summary.geometry.geom_type == 'Point'
@@ -0,0 +1,134 @@
+import networkx as nx
+import numpy as np
+import pytest
+from compact_graph import build_compact_graph
+from dijkstra_engine import DijkstraEngine
+from snapping import EdgeSnapper, NodeSnapper, edge_route, get_snapper
+from synthetic_graphs import random_road_graph
+
+
+# (lat, lon) of the point at fraction along the straight line of edge e
+def point_on(compact, e, fraction):
+    u, v = int(compact.sources[e]), int(compact.targets[e])
+    return (compact.y[u] + fraction * (compact.y[v] - compact.y[u]),
+            compact.x[u] + fraction * (compact.x[v] - compact.x[u]))
+
+
+# Edges with a proper line to snap onto: no self-loops and no zero-length edges
+def road_edges(compact):
+    sources, targets = compact.sources, compact.targets
+    moved = (compact.x[sources] != compact.x[targets]) | (compact.y[sources] != compact.y[targets])
+    return np.flatnonzero(moved)
+
+
+# Cheapest cost between two snapped points by plain Dijkstra on the road graph with the two
+# points added as nodes: the origin leaves forward along its edge and back along the twin, the
+# target is reached from the tail of its edge or from the head over the twin
+def expected_cost(roadgraph, compact, snapper, snapped_s, snapped_t, weight):
+    weights = compact.weight(weight)
+    (edge_s, frac_s), (edge_t, frac_t) = snapped_s, snapped_t
+    osm = compact.node_ids
+    graph = nx.DiGraph()
+    for u, v, d in roadgraph.edges(data=True):
+        if not graph.has_edge(u, v) or d[weight] < graph[u][v]['w']:
+            graph.add_edge(u, v, w=d[weight])
+    u, v = osm[compact.sources[edge_s]], osm[compact.targets[edge_s]]
+    graph.add_edge('s', v, w=(1.0 - frac_s) * weights[edge_s])
+    twin = snapper.twin(edge_s)
+    if twin >= 0:
+        graph.add_edge('s', u, w=frac_s * weights[twin])
+    u, v = osm[compact.sources[edge_t]], osm[compact.targets[edge_t]]
+    graph.add_edge(u, 't', w=frac_t * weights[edge_t])
+    twin_t = snapper.twin(edge_t)
+    if twin_t >= 0:
+        graph.add_edge(v, 't', w=(1.0 - frac_t) * weights[twin_t])
+    try:
+        best = nx.shortest_path_length(graph, 's', 't', weight='w')
+    except nx.NetworkXNoPath:
+        best = np.inf
+    # Driving straight along the origin's own road
+    if edge_t == twin and edge_t != edge_s:
+        edge_t, frac_t = edge_s, 1.0 - frac_t
+    if edge_t == edge_s:
+        if frac_s <= frac_t:
+            best = min(best, (frac_t - frac_s) * weights[edge_s])
+        elif twin >= 0:
+            best = min(best, (frac_s - frac_t) * weights[twin])
+    return best
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_points_on_an_edge_snap_onto_it(seed):
+    compact = build_compact_graph(random_road_graph(seed=seed))
+    snapper = EdgeSnapper(compact)
+    rng = np.random.default_rng(seed)
+    edges = rng.choice(road_edges(compact), 50)
+    fractions = rng.uniform(0, 1, 50)
+    lats, lons = zip(*[point_on(compact, e, f) for e, f in zip(edges, fractions)])
+    snapped, snapped_fractions, dist = snapper.snap(lats, lons, return_dist=True)
+    assert dist.max() < 1e-3
+    for e, f, s, sf in zip(edges, fractions, snapped, snapped_fractions):
+        ends = (compact.sources[e], compact.targets[e])
+        # The same road: the edge, a parallel edge or one running the other way
+        if (compact.sources[s], compact.targets[s]) == ends:
+            assert sf == pytest.approx(f, abs=1e-6)
+        else:
+            assert (compact.targets[s], compact.sources[s]) == ends
+            assert sf == pytest.approx(1.0 - f, abs=1e-6)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('weight', ['length', 'type_weight'])
+def test_edge_route_costs_partial_edges(seed, weight):
+    roadgraph = random_road_graph(seed=seed)
+    compact = build_compact_graph(roadgraph, weights=('length', 'type_weight'))
+    weights = compact.weight(weight)
+    snapper = EdgeSnapper(compact)
+    engine = DijkstraEngine(compact)
+    rng = np.random.default_rng(seed)
+    candidates = road_edges(compact)
+    # Pairs on random edges, plus pairs on one road both ways round
+    pairs = [tuple(rng.choice(candidates, 2)) for _ in range(60)]
+    pairs += [(e, e) for e in rng.choice(candidates, 20)]
+    for edge_s, edge_t in pairs:
+        origin = point_on(compact, edge_s, rng.uniform(0, 1))
+        target = point_on(compact, edge_t, rng.uniform(0, 1))
+        snapped = snapper.snap([origin[0], target[0]], [origin[1], target[1]])
+        expected = expected_cost(roadgraph, compact, snapper, (snapped[0][0], snapped[1][0]),
+                                 (snapped[0][1], snapped[1][1]), weight)
+        if expected == np.inf:
+            with pytest.raises(nx.NetworkXNoPath):
+                edge_route(engine, snapper, origin, target, weight)
+            continue
+        path, cost, edges, starts, ends = edge_route(engine, snapper, origin, target, weight)
+        assert cost == pytest.approx(expected)
+        # Every hop is driven over its edge, whole except for the first and last stretches
+        assert compact.sources[edges].tolist() == path[:-1]
+        assert compact.targets[edges].tolist() == path[1:]
+        assert np.all(starts[1:] == 0.0) and np.all(ends[:-1] == 1.0)
+        assert np.all((0.0 <= starts) & (starts <= ends) & (ends <= 1.0))
+        assert np.dot(weights[edges], ends - starts) == pytest.approx(cost)
+
+
+
+def test_node_snapper_finds_the_nearest_node():
+    compact = build_compact_graph(random_road_graph())
+    snapper = NodeSnapper(compact)
+    rng = np.random.default_rng(0)
+    lats = rng.uniform(compact.y.min(), compact.y.max(), 100)
+    lons = rng.uniform(compact.x.min(), compact.x.max(), 100)
+    nodes, dist = snapper.snap(lats, lons, return_dist=True)
+    # Nearest by squared degrees, scaled for longitude, agrees away from near ties
+    scale = np.cos(np.radians(compact.y.mean()))
+    squared = (compact.y[None, :] - lats[:, None]) ** 2 + ((compact.x[None, :] - lons[:, None]) * scale) ** 2
+    ordered = np.sort(squared, axis=1)
+    clear = ordered[:, 1] > 1.01 * ordered[:, 0]
+    assert np.array_equal(nodes[clear], np.argmin(squared, axis=1)[clear])
+    with pytest.raises(ValueError):
+        snapper.snap(compact.y.mean() + 1.0, compact.x.mean())
+
+
+def test_snapper_is_kept_per_graph():
+    compact = build_compact_graph(random_road_graph())
+    assert get_snapper(compact) is get_snapper(compact)
+    assert get_snapper(build_compact_graph(random_road_graph())) is not get_snapper(compact)
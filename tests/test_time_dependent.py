@@ -0,0 +1,119 @@
+import math
+import networkx as nx
+import numpy as np
+import pytest
+from compact_graph import build_compact_graph
+from dijkstra_engine import DijkstraEngine
+from synthetic_graphs import random_road_graph
+from time_dependent import departure_profile, hourly_factors, profile_search, time_dependent_heuristic, \
+    time_dependent_path
+
+METERS_PER_MINUTE = 500.0  # 30 km/h
+
+
+def rush_hour(hour):
+    return 1.8 if 7 <= hour < 9 or 16 <= hour < 19 else 1.0
+
+
+# (24, edge_count) travel time table: minutes at free flow times a rush hour factor and a random
+# per-edge, per-hour jitter, small enough that no edge lets a later departure arrive earlier
+def random_table(compact, seed):
+    minutes = compact.weight('length') / METERS_PER_MINUTE
+    jitter = np.random.default_rng(seed).uniform(1.0, 1.5, (24, compact.edge_count))
+    return (hourly_factors(rush_hour)[:, None] * jitter * minutes[None, :]).astype(np.float32)
+
+
+def arrive(table, e, t):
+    hours = len(table)
+    clock = (t / 60.0) % hours
+    hour = int(clock)
+    share = clock - hour
+    return t + (1.0 - share) * float(table[hour][e]) + share * float(table[(hour + 1) % hours][e])
+
+
+# Earliest arrivals by label correcting until nothing improves, which is exact whenever edges
+# are FIFO, whatever order the edges are relaxed in
+def earliest_arrivals(compact, table, source, departure):
+    arrival = np.full(compact.node_count, np.inf)
+    arrival[source] = departure
+    sources = compact.sources.tolist()
+    targets = compact.targets.tolist()
+    changed = True
+    while changed:
+        changed = False
+        for e, (u, v) in enumerate(zip(sources, targets)):
+            if arrival[u] < math.inf:
+                t = arrive(table, e, arrival[u])
+                if t < arrival[v] - 1e-9:
+                    arrival[v] = t
+                    changed = True
+    return arrival
+
+
+def route_arrival(compact, table, path, departure):
+    # Arrival along a node path taking, at every hop, the parallel edge that arrives first
+    t = departure
+    for u, v in zip(path, path[1:]):
+        t = min(arrive(table, e, t) for e in compact.edges_between(u, v).tolist())
+    return t
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('departure', [6.5 * 60, 8 * 60 + 50, 23.9 * 60])
+@pytest.mark.parametrize('use_heuristic', [False, True])
+def test_arrivals_match_label_correcting(seed, departure, use_heuristic):
+    compact = build_compact_graph(random_road_graph(seed=seed))
+    table = random_table(compact, seed)
+    heuristic = time_dependent_heuristic(compact, table) if use_heuristic else None
+    engine = DijkstraEngine(compact)
+    for source in range(0, compact.node_count, 3):
+        expected = earliest_arrivals(compact, table, source, departure)
+        for target in range(compact.node_count):
+            if expected[target] == math.inf:
+                with pytest.raises(nx.NetworkXNoPath):
+                    engine.time_dependent(source, target, table, departure, heuristic)
+                continue
+            path = engine.time_dependent(source, target, table, departure, heuristic)
+            assert path[0] == source and path[-1] == target
+            assert engine.dist[target] == pytest.approx(expected[target])
+            assert route_arrival(compact, table, path, departure) == pytest.approx(expected[target])
+
+
+def test_flat_table_gives_the_static_route():
+    roadgraph = random_road_graph(seed=3)
+    compact = build_compact_graph(roadgraph)
+    table = np.tile(compact.weight('length') / METERS_PER_MINUTE, (24, 1))
+    for u, v, d in roadgraph.edges(data=True):
+        d['minutes'] = d['length'] / METERS_PER_MINUTE
+    origin = int(compact.node_ids[0])
+    for goal, path in nx.single_source_dijkstra_path(roadgraph, origin, weight='minutes').items():
+        route, arrival = time_dependent_path(compact, table, origin, goal, 600.0)
+        assert route == path
+        assert arrival == pytest.approx(600.0 + nx.path_weight(roadgraph, path, 'minutes'), rel=1e-5)
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+@pytest.mark.parametrize('use_heuristic', [False, True])
+def test_profile_matches_one_search_per_departure(seed, use_heuristic):
+    compact = build_compact_graph(random_road_graph(seed=seed))
+    table = random_table(compact, seed)
+    heuristic = time_dependent_heuristic(compact, table) if use_heuristic else None
+    source = 0
+    for target in range(1, compact.node_count, 4):
+        departures, arrivals = profile_search(compact, table, source, target, 6 * 60, 10 * 60, 20.0, heuristic)
+        assert np.array_equal(departures, np.arange(6 * 60, 10 * 60 + 1, 20.0))
+        for departure, arrival in zip(departures, arrivals):
+            assert arrival == pytest.approx(earliest_arrivals(compact, table, source, departure)[target])
+
+
+def test_departure_profile_picks_the_shortest_trip():
+    compact = build_compact_graph(random_road_graph(seed=2))
+    table = random_table(compact, 2)
+    origin, goal = int(compact.node_ids[0]), int(compact.node_ids[20])
+    departures, arrivals, best, route = departure_profile(compact, table, origin, goal, 6, 10, step=10.0)
+    trips = arrivals - departures
+    assert best == departures[np.argmin(trips)]
+    _, arrival = time_dependent_path(compact, table, origin, goal, best)
+    assert route[0] == origin and route[-1] == goal
+    assert arrival - best == pytest.approx(trips.min())
+    assert route_arrival(compact, table, compact.indices_of(route).tolist(), best) == pytest.approx(arrival)
@@ -0,0 +1,130 @@
+import random
+import numpy as np
+import pytest
+from compact_graph import build_compact_graph
+from weight_profiles import apply_profile, clear_profiles, compile_profile
+from synthetic_graphs import random_road_graph
+
+ROAD_CLASSES = {'motorway': 1.0, 'primary': 1.5, 'residential': 3.0, ('primary', 'residential'): 2.2}
+
+
+# Road graph whose edges carry single, list-valued and missing highway tags
+def tagged_road_graph(seed=0):
+    roadgraph = random_road_graph(seed=seed)
+    rng = random.Random(seed)
+    tags = ['motorway', 'primary', 'residential', 'service', None,
+            ['primary', 'residential'], ['residential', 'primary', 'primary'], ['motorway', 'service']]
+    for u, v, d in roadgraph.edges(data=True):
+        tag = rng.choice(tags)
+        if tag is not None:
+            d['highway'] = list(tag) if isinstance(tag, list) else tag
+    return roadgraph
+
+
+# The per-edge dict loop the scripts used to run
+def loop_profile(roadgraph, spec):
+    classes = spec.get('road_classes')
+    values = {}
+    for u, v, k, d in roadgraph.edges(keys=True, data=True):
+        value = float(spec.get('weather', 1.0)) * float(spec.get('hour', 1.0))
+        if spec.get('base') is not None:
+            value *= d.get(spec['base'], 1.0)
+        if classes is not None:
+            road_type = d.get('highway', spec.get('missing', 'unclassified'))
+            if isinstance(road_type, list):
+                road_type = tuple(sorted(set(road_type)))
+            if road_type in classes:
+                value *= classes[road_type]
+            elif isinstance(road_type, tuple):
+                value *= min(classes.get(t, spec.get('default', 1.0)) for t in road_type)
+            else:
+                value *= spec.get('default', 1.0)
+        values[u, v, k] = value
+    return values
+
+
+def compiled_by_edge(compact, values):
+    return {(int(compact.node_ids[u]), int(compact.node_ids[v]), int(k)): value
+            for u, v, k, value in zip(compact.sources.tolist(), compact.targets.tolist(),
+                                      compact.keys.tolist(), values.tolist())}
+
+
+@pytest.mark.parametrize('spec', [
+    {'road_classes': ROAD_CLASSES, 'default': 4.0},
+    {'road_classes': ROAD_CLASSES, 'missing': 'residential'},
+    {'base': 'length', 'road_classes': ROAD_CLASSES, 'default': 1.2, 'hour': 1.8},
+    {'base': 'length', 'weather': 2.5},
+    {'base': 'type_weight', 'hour': 3.0, 'weather': 1.4},
+])
+def test_compile_matches_the_edge_loop(spec):
+    clear_profiles()
+    roadgraph = tagged_road_graph()
+    compact = build_compact_graph(roadgraph)
+    compiled = compiled_by_edge(compact, compile_profile(compact, roadgraph, spec))
+    expected = loop_profile(roadgraph, spec)
+    assert compiled.keys() == expected.keys()
+    assert np.allclose([compiled[e] for e in expected], list(expected.values()))
+
+
+def test_incidents_scale_their_edges_only():
+    clear_profiles()
+    roadgraph = tagged_road_graph(1)
+    compact = build_compact_graph(roadgraph)
+    plain = compile_profile(compact, roadgraph, {'base': 'length'})
+    jammed = compile_profile(compact, roadgraph, {'base': 'length', 'incidents': {3: 3.0, 7: 9.0}})
+    expected = plain.copy()
+    expected[[3, 7]] *= [3.0, 9.0]
+    assert np.allclose(jammed, expected)
+
+
+def test_unknown_spec_keys_are_rejected():
+    roadgraph = tagged_road_graph()
+    with pytest.raises(ValueError):
+        compile_profile(build_compact_graph(roadgraph), roadgraph, {'base': 'length', 'rain': 2.0})
+
+
+def test_apply_profile_reuses_and_recompiles():
+    clear_profiles()
+    roadgraph = tagged_road_graph(2)
+    compact = build_compact_graph(roadgraph)
+    spec = {'base': 'length', 'road_classes': ROAD_CLASSES, 'hour': 1.8}
+    first = apply_profile(compact, roadgraph, 'traffic_weight', spec)
+    u, v, k = next(iter(roadgraph.edges(keys=True)))
+    assert roadgraph[u][v][k]['traffic_weight'] == pytest.approx(first[compact.edge_index(u, v, k)])
+
+    # Same spec, equal but freshly built: served from the cache, the edges are not written again
+    roadgraph[u][v][k]['traffic_weight'] = -1.0
+    assert apply_profile(compact, roadgraph, 'traffic_weight', dict(spec, road_classes=dict(ROAD_CLASSES))) is first
+    assert roadgraph[u][v][k]['traffic_weight'] == -1.0
+
+    # Another hour recompiles from the base instead of stacking on the old factor
+    evening = apply_profile(compact, roadgraph, 'traffic_weight', dict(spec, hour=1.0))
+    assert evening is not first
+    assert np.allclose(evening * 1.8, first)
+    assert roadgraph[u][v][k]['traffic_weight'] == pytest.approx(evening[compact.edge_index(u, v, k)])
+
+    # A new jam recompiles as well
+    jammed = apply_profile(compact, roadgraph, 'traffic_weight', dict(spec, hour=1.0, incidents={0: 2.0}))
+    assert jammed is not evening and jammed[0] == pytest.approx(2.0 * evening[0])
+
+    # Replacing the base array recompiles even with the same spec
+    base_spec = dict(spec, hour=1.0, incidents={0: 2.0})
+    assert apply_profile(compact, roadgraph, 'traffic_weight', base_spec) is jammed
+    compact.add_weight('length', compact.weight('length') * 2.0)
+    doubled = apply_profile(compact, roadgraph, 'traffic_weight', base_spec)
+    assert doubled is not jammed and np.allclose(doubled, 2.0 * jammed)
+
+    # So does overwriting the compiled profile itself
+    compact.add_weight('traffic_weight', np.ones(compact.edge_count))
+    assert np.allclose(apply_profile(compact, roadgraph, 'traffic_weight', base_spec), doubled)
+
+
+def test_store_false_leaves_the_edges_alone():
+    clear_profiles()
+    roadgraph = tagged_road_graph(3)
+    compact = build_compact_graph(roadgraph)
+    apply_profile(compact, roadgraph, 'weight', {'base': 'length', 'weather': 2.0}, store=False)
+    assert all('weight' not in d for _, _, d in roadgraph.edges(data=True))
+    # Asked again with store=True, the cached profile is written out once
+    values = apply_profile(compact, roadgraph, 'weight', {'base': 'length', 'weather': 2.0})
+    assert np.allclose(compact.edge_values(roadgraph, 'weight'), values)
@@ -0,0 +1,108 @@
+import heapq
+import numpy as np
+from dijkstra_engine import get_engine
+from heuristics import GeodesicHeuristic
+from weight_profiles import category_factors, highway_codes
+
+HOURS = 24
+
+
+# Factor of every hour of the day from a function of the hour, e.g. add_road_type_weights
+def hourly_factors(hour_factor):
+    return np.array([hour_factor(hour) for hour in range(HOURS)], dtype=np.float64)
+
+
+# Congestion factor of every edge from its highway tag. Edges tagged with several road types
+# take the smallest factor among them, untagged or unknown types the default.
+def road_class_factors(compact, roadgraph, factors, default=1.0):
+    codes, categories = highway_codes(compact, roadgraph)
+    return category_factors(categories, factors, default)[codes]
+
+
+# Travel time of every edge (minutes) at every full hour as one (24, edge_count) float32 array:
+# the base travel time times the road class factor times the factor of that hour. A time slice
+# is just a row of the table, so queries at different departure times share it.
+def build_time_table(compact, roadgraph, hour_factor, class_factors, base='travel_time_min'):
+    edge_times = compact.weight(base) * road_class_factors(compact, roadgraph, class_factors)
+    return (hourly_factors(hour_factor)[:, None] * edge_times[None, :]).astype(np.float32)
+
+
+# Geodesic lower bound on the remaining travel time, valid at any hour of the day
+def time_dependent_heuristic(compact, table, length='length'):
+    lengths = compact.weight(length)
+    roads = lengths > 0
+    fastest = table.min(axis=0)
+    scale = max(float(np.min(fastest[roads] / lengths[roads])), 0.0) if roads.any() else 0.0
+    return GeodesicHeuristic(compact, scale=scale)
+
+
+# Route between two OSM nodes leaving at departure (minutes after midnight). Returns the route
+# as OSM ids and the arrival time in minutes after midnight (past 1440 on the next day).
+def time_dependent_path(compact, table, origin_node, target_node, departure, heuristic=None):
+    engine = get_engine(compact)
+    target = compact.index_of(target_node)
+    path = engine.time_dependent(compact.index_of(origin_node), target, table, departure, heuristic)
+    return compact.to_osm(path), float(engine.dist[target])
+
+
+# Travel times over a whole departure window in one search. Every node carries a vector of
+# arrival times, one per departure on a grid from start to end (minutes after midnight, every
+# step minutes), and each relaxation updates all of them with one NumPy expression. A node is
+# rescanned whenever any of its arrivals improves. Its key is the smallest trip duration so
+# far plus the heuristic, and departures that can no longer beat the target's arrival are not
+# propagated. Returns the departure grid and the arrival time at target for each departure.
+def profile_search(compact, table, source, target, start, end, step=5.0, heuristic=None):
+    departures = np.arange(start, end + step / 2, step, dtype=np.float64)
+    hours = len(table)
+    offsets = compact.offsets
+    heads = compact.targets
+    arrival = np.full((compact.node_count, len(departures)), np.inf)
+    arrival[source] = departures
+    pending = np.zeros(compact.node_count, dtype=bool)
+    pending[source] = True
+
+    def bound(v):
+        return heuristic(v, target) if heuristic else 0.0
+
+    heap = [(bound(source), source)]
+    while heap:
+        key, u = heapq.heappop(heap)
+        if not pending[u]:
+            continue
+        # Every trip still to be found takes at least key, stop once none can improve the target
+        if key >= np.max(arrival[target] - departures):
+            break
+        pending[u] = False
+        times = arrival[u]
+        live = times + bound(u) < arrival[target]
+        if not live.any():
+            continue
+        edges = np.arange(offsets[u], offsets[u + 1])
+        if len(edges) == 0:
+            continue
+        clock = (np.where(live, times, 0.0) / 60.0) % hours
+        hour = clock.astype(np.int64)
+        share = clock - hour
+        later = (hour + 1) % hours
+        spent = (1.0 - share) * table[hour[None, :], edges[:, None]] + share * table[later[None, :], edges[:, None]]
+        reached = np.where(live, times, np.inf) + spent
+        for v, cand in zip(heads[edges].tolist(), reached):
+            improved = cand < arrival[v]
+            if improved.any():
+                arrival[v] = np.where(improved, cand, arrival[v])
+                pending[v] = True
+                heapq.heappush(heap, (float(np.min(arrival[v] - departures)) + bound(v), v))
+    return departures, arrival[target].copy()
+
+
+# When to leave: arrival curve from origin to target over the window [start_hour, end_hour],
+# the departure (minutes after midnight) with the shortest trip and the route taken then
+def departure_profile(compact, table, origin_node, target_node, start_hour, end_hour, step=5.0, heuristic=None):
+    if heuristic is None:
+        heuristic = time_dependent_heuristic(compact, table)
+    source = compact.index_of(origin_node)
+    target = compact.index_of(target_node)
+    departures, arrivals = profile_search(compact, table, source, target, start_hour * 60, end_hour * 60, step, heuristic)
+    best = int(np.argmin(arrivals - departures))
+    route, _ = time_dependent_path(compact, table, origin_node, target_node, departures[best], heuristic)
+    return departures, arrivals, float(departures[best]), route
@@ -0,0 +1,98 @@
+import numpy as np
+
+# Highway categories that have already been extracted, keyed by id() of their CompactGraph
+_highway_codes = {}
+# Profiles that have already been compiled, keyed by (id() of their CompactGraph, profile name)
+_compiled = {}
+
+PROFILE_KEYS = ('base', 'road_classes', 'default', 'missing', 'weather', 'hour', 'incidents')
+
+
+# Categorical code of every edge's highway tag. Each distinct tag is one category and an edge
+# tagged with several road types gets a category of its own for that sorted combination, so the
+# tags are read from the road graph once and every profile after that is an array lookup.
+# Returns the codes in CSR edge order and the category of every code (a string or a tuple).
+def highway_codes(compact, roadgraph, missing='unclassified'):
+    entry = _highway_codes.get((id(compact), missing))
+    if entry is None or entry[0] is not compact:
+        index = {}
+        codes = np.empty(compact.edge_count, dtype=np.int32)
+        for e, highway in enumerate(compact.edge_values(roadgraph, 'highway', missing)):
+            category = tuple(sorted(set(highway))) if isinstance(highway, list) else highway
+            codes[e] = index.setdefault(category, len(index))
+        entry = (compact, codes, list(index))
+        _highway_codes[(id(compact), missing)] = entry
+    return entry[1], entry[2]
+
+
+def clear_profiles():
+    _highway_codes.clear()
+    _compiled.clear()
+
+
+# Factor of every category from a road class table. A combination of road types uses its own
+# entry when the table has one (keyed by the sorted tuple) and otherwise the smallest factor of
+# its road types; anything not in the table gets the default.
+def category_factors(categories, road_classes, default=1.0):
+    factors = []
+    for category in categories:
+        if category in road_classes:
+            factors.append(road_classes[category])
+        elif isinstance(category, tuple):
+            factors.append(min(road_classes.get(road_type, default) for road_type in category))
+        else:
+            factors.append(default)
+    return np.array(factors, dtype=np.float64)
+
+
+# One weight array from a declarative spec, a dict with any of
+#   base          weight profile (or edge attribute) the factors multiply, None for 1 per edge
+#   road_classes  factor per highway type, see category_factors
+#   default       factor of highway types missing from road_classes (1.0)
+#   missing       highway type assumed for untagged edges ('unclassified')
+#   weather       factor for the whole graph, e.g. weather_impact_factors['snow']
+#   hour          factor for the whole graph, e.g. the rush hour factor of the hour
+#   incidents     factor per edge for the few edges hit by a jam, {CSR edge index: factor}
+# weight = base * road_classes[highway] * weather * hour * incidents, computed in one NumPy pass.
+def compile_profile(compact, roadgraph, spec):
+    unknown = set(spec) - set(PROFILE_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown profile keys: {sorted(unknown)}")
+    values = np.full(compact.edge_count, float(spec.get('weather', 1.0)) * float(spec.get('hour', 1.0)))
+    base = spec.get('base')
+    if base is not None:
+        values *= compact.weights[base] if base in compact.weights else compact.load_weight(roadgraph, base)
+    if spec.get('road_classes') is not None:
+        codes, categories = highway_codes(compact, roadgraph, spec.get('missing', 'unclassified'))
+        values *= category_factors(categories, spec['road_classes'], spec.get('default', 1.0))[codes]
+    if spec.get('incidents'):
+        edges = np.fromiter(spec['incidents'].keys(), dtype=np.int64, count=len(spec['incidents']))
+        values[edges] *= np.fromiter(spec['incidents'].values(), dtype=np.float64, count=len(edges))
+    return values
+
+
+# Hashable form of a spec, road class tables included
+def _spec_key(spec):
+    return tuple(sorted((key, tuple(sorted(value.items(), key=lambda item: str(item[0]))) if isinstance(value, dict)
+                         else value) for key, value in spec.items()))
+
+
+# Compile a spec into the compact graph's weight profile name and, with store=True, onto the
+# road graph edges as well so the networkx searches see the same weights. A spec is compiled
+# once per graph: asking again for the same spec (on the same base weights) is a dict lookup,
+# and the edges are only written the first time a road graph needs them. Any change to the spec,
+# a new incident included, compiles the profile from its base again and rewrites the edges, so
+# factors never pile up on weights that already carry them.
+def apply_profile(compact, roadgraph, name, spec, store=True):
+    key = _spec_key(spec)
+    base = compact.weights.get(spec.get('base'))
+    entry = _compiled.get((id(compact), name))
+    if (entry is None or entry[0] is not compact or entry[1] != key or entry[2] is not base
+            or compact.weights.get(name) is not entry[3]):
+        compact.add_weight(name, compile_profile(compact, roadgraph, spec))
+        entry = (compact, key, compact.weights.get(spec.get('base')), compact.weights[name], set())
+        _compiled[(id(compact), name)] = entry
+    if store and id(roadgraph) not in entry[4]:
+        compact.store_weight(roadgraph, name)
+        entry[4].add(id(roadgraph))
+    return compact.weights[name]